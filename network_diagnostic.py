@@ -1,33 +1,511 @@
+import os
+import sys
+
+# Mode profilage commun aux scripts (--profile)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'scripts'))
+if __name__ == "__main__":
+    # Seulement en point d'entrée : un import ne profile jamais le
+    # processus appelant
+    import profiling
+    profiling.enable_from_argv()
+
+import argparse
+import asyncio
+import errno
+import json
+import resource
+import selectors
 import socket
-import requests
+import ssl
 import time
-import docker
 import logging
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Any, List, Optional, Tuple
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Seuil d'alerte sur l'expiration des certificats (jours)
+CERT_WARN_DAYS = 14
+
+
+# Drapeau de setns pour l'espace de noms réseau (os.CLONE_NEWNET en 3.12)
+CLONE_NEWNET = 0x40000000
+
+# États d'un port sondé
+OPEN, REFUSED, FILTERED, ERROR = 'open', 'refused', 'filtered', 'error'
+
+
+@dataclass
+class PortScan:
+    """État d'un couple (hôte, port) ; filtered : aucune réponse avant le délai"""
+    host: str
+    port: int
+    state: Optional[str] = None
+    address: Optional[str] = None
+    latency_ms: Optional[float] = None
+    error: Optional[str] = None
+    service: Optional[str] = None
+
+
+@dataclass
+class LinkLatency:
+    """Latences d'un lien entre deux conteneurs (millisecondes)"""
+    source: str
+    target: str
+    network: Optional[str] = None
+    address: Optional[str] = None
+    port: Optional[int] = None
+    samples: int = 0
+    errors: int = 0
+    connect_p50_ms: Optional[float] = None
+    connect_p95_ms: Optional[float] = None
+    connect_p99_ms: Optional[float] = None
+    rtt_p50_ms: Optional[float] = None
+    rtt_p95_ms: Optional[float] = None
+    rtt_p99_ms: Optional[float] = None
+    outlier: bool = False
+    error: Optional[str] = None
+
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Percentile par rang le plus proche (None si aucune valeur)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def enter_network_namespace(pid: int) -> None:
+    """
+    Place le thread courant dans l'espace de noms réseau d'un processus.
+
+    Seul le thread appelant change d'espace de noms : les sockets qu'il
+    crée ensuite partent de l'interface du conteneur. Nécessite les droits
+    root (CAP_SYS_ADMIN) sur l'hôte Docker.
+    """
+    with open(f'/proc/{pid}/ns/net') as namespace:
+        if hasattr(os, 'setns'):
+            os.setns(namespace.fileno(), CLONE_NEWNET)
+            return
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.setns(namespace.fileno(), CLONE_NEWNET) != 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+
+
+def flag_outliers(links: List[LinkLatency],
+                  factor: float = 4.0,
+                  floor_ms: float = 1.0) -> List[LinkLatency]:
+    """
+    Marque les liens nettement plus lents que les autres.
+
+    Un lien est aberrant si sa latence de connexion médiane dépasse la
+    médiane des liens de plus de factor écarts absolus médians (MAD
+    normalisé), et d'au moins floor_ms.
+
+    Returns:
+        List[LinkLatency]: Liens aberrants
+    """
+    measured = [link for link in links if link.connect_p50_ms is not None]
+    if len(measured) < 3:
+        return []
+    values = sorted(link.connect_p50_ms for link in measured)
+    median = values[len(values) // 2]
+    deviations = sorted(abs(value - median) for value in values)
+    mad = 1.4826 * deviations[len(deviations) // 2]
+    threshold = median + max(floor_ms, factor * mad)
+    outliers = []
+    for link in measured:
+        link.outlier = link.connect_p50_ms > threshold
+        if link.outlier:
+            outliers.append(link)
+    return outliers
+
+
+# Bornes de l'histogramme des sondes de charge (millisecondes)
+HISTOGRAM_BOUNDS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+
+@dataclass
+class LoadReport:
+    """
+    Résultat d'une sonde de charge (durées en millisecondes).
+
+    En mode débit, la latence part de la date prévue d'envoi : l'attente
+    d'une connexion libre quand le service ralentit est comptée (pas
+    d'omission coordonnée) ; service_* ne mesure que l'échange lui-même.
+    """
+    url: str
+    mode: str
+    rate: Optional[float]
+    concurrency: int
+    duration_s: float = 0.0
+    requests: int = 0
+    errors: int = 0
+    throughput_rps: float = 0.0
+    error_rate: float = 0.0
+    latency_p50_ms: Optional[float] = None
+    latency_p90_ms: Optional[float] = None
+    latency_p99_ms: Optional[float] = None
+    latency_p999_ms: Optional[float] = None
+    latency_max_ms: Optional[float] = None
+    service_p50_ms: Optional[float] = None
+    service_p99_ms: Optional[float] = None
+    connections: int = 0
+    retries: int = 0
+    error_classes: Dict[str, int] = field(default_factory=dict)
+    histogram: List[Tuple[Optional[float], int]] = field(default_factory=list)
+
+
+@dataclass
+class TLSProbe:
+    """Mesures TLS d'un hôte (durées en millisecondes)"""
+    host: str
+    address: Optional[str] = None
+    dns_ms: Optional[float] = None
+    connect_ms: Optional[float] = None
+    handshake_ms: Optional[float] = None
+    first_byte_ms: Optional[float] = None
+    resumed_handshake_ms: Optional[float] = None
+    session_reused: Optional[bool] = None
+    protocol: Optional[str] = None
+    cipher: Optional[str] = None
+    expires: Optional[str] = None
+    days_left: Optional[float] = None
+    error: Optional[str] = None
+
 
 class ServiceDiagnostic:
 
-    def __init__(self):
-        self.docker_client = docker.from_env()
+    def __init__(self, store=None):
+        """store : historique des tests de santé (health_store.HealthStore)"""
+        self._docker_client = None
+        self.store = store
+
+    @property
+    def docker_client(self):
+        """Client Docker, créé au premier usage (import de docker différé)"""
+        if self._docker_client is None:
+            import docker
+            self._docker_client = docker.from_env()
+        return self._docker_client
+
+    def scan_ports(self,
+                   endpoints: List[Tuple[str, int]],
+                   timeout: float = 0.5,
+                   concurrency: int = 512) -> List[PortScan]:
+        """
+        Sonde des couples (hôte, port) par connexions TCP non bloquantes.
+
+        Toutes les connexions sont menées en parallèle dans un seul thread
+        (au plus concurrency à la fois, dans la limite des descripteurs) :
+        la durée totale est de l'ordre du délai, pas du nombre de ports.
+        Chaque hôte n'est résolu qu'une fois.
+
+        Args:
+            endpoints: Couples (hôte, port)
+            timeout: Délai d'une connexion (secondes)
+            concurrency: Connexions simultanées au plus
+
+        Returns:
+            List[PortScan]: États (open, refused, filtered, error), dans
+                l'ordre des couples
+        """
+        results = [PortScan(host, port) for host, port in endpoints]
+        addresses: Dict[str, Any] = {}
+        for result in results:
+            if result.host not in addresses:
+                try:
+                    addresses[result.host] = socket.getaddrinfo(
+                        result.host, None, type=socket.SOCK_STREAM)[0]
+                except socket.gaierror as e:
+                    addresses[result.host] = e
+        soft_limit = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+        concurrency = max(1, min(concurrency, soft_limit - 64))
+
+        selector = selectors.DefaultSelector()
+        queue = iter(results)
+        deadlines: Dict[socket.socket, float] = {}
+
+        def finish(sock: socket.socket, result: PortScan, code: int) -> None:
+            selector.unregister(sock)
+            started = deadlines.pop(sock) - timeout
+            sock.close()
+            result.latency_ms = (time.perf_counter() - started) * 1000
+            if code == 0:
+                result.state = OPEN
+            elif code == errno.ECONNREFUSED:
+                result.state = REFUSED
+            else:
+                result.state = FILTERED
+                result.error = os.strerror(code)
+
+        def start() -> bool:
+            result = next(queue, None)
+            if result is None:
+                return False
+            info = addresses[result.host]
+            if isinstance(info, Exception):
+                result.state, result.error = ERROR, str(info)
+                return True
+            family, kind, proto, _, sockaddr = info
+            result.address = sockaddr[0]
+            sock = socket.socket(family, kind, proto)
+            sock.setblocking(False)
+            deadlines[sock] = time.perf_counter() + timeout
+            selector.register(sock, selectors.EVENT_WRITE, result)
+            code = sock.connect_ex((sockaddr[0], result.port) +
+                                   tuple(sockaddr[2:]))
+            if code not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+                finish(sock, result, code)
+            return True
 
-    def check_port_availability(self, port: int) -> bool:
-        """Vérifie si un port est disponible"""
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         try:
-            sock.bind(('localhost', port))
-            available = True
-        except:
-            available = False
+            while True:
+                while len(deadlines) < concurrency and start():
+                    pass
+                if not deadlines:
+                    break
+                now = time.perf_counter()
+                wait = max(0.0, min(deadlines.values()) - now)
+                for key, _ in selector.select(wait):
+                    finish(key.fileobj, key.data,
+                           key.fileobj.getsockopt(socket.SOL_SOCKET,
+                                                  socket.SO_ERROR))
+                now = time.perf_counter()
+                for sock, deadline in list(deadlines.items()):
+                    if deadline <= now:
+                        finish(sock,
+                               selector.get_key(sock).data, errno.ETIMEDOUT)
         finally:
-            sock.close()
-        return available
+            for sock in list(deadlines):
+                sock.close()
+            selector.close()
+        return results
+
+    def scan_published_ports(self,
+                             hosts: List[str],
+                             compose_files: Optional[List] = None,
+                             extra_ports: Optional[List[int]] = None,
+                             containers: bool = False,
+                             timeout: float = 0.5) -> List[PortScan]:
+        """
+        Sonde les ports publiés par docker-compose sur plusieurs hôtes.
+
+        Les ports publiés sont sondés sur chaque hôte (sur leur host_ip s'il
+        est imposé) ; avec containers, les ports cibles le sont aussi sur
+        l'adresse de chaque conteneur dans ses réseaux Docker. Les ports
+        supplémentaires ouverts sans être déclarés gardent service=None.
+
+        Args:
+            hosts: Hôtes (ex: localhost, adresse publique, passerelle Docker)
+            compose_files: Fichiers docker-compose (par défaut ceux du dépôt)
+            extra_ports: Ports sondés en plus sur chaque hôte
+            containers: Sonde aussi les conteneurs dans leurs réseaux
+            timeout: Délai d'une connexion (secondes)
+
+        Returns:
+            List[PortScan]: États, avec le service déclarant chaque port
+        """
+        from compose_config import load_services, COMPOSE_FILES
+        from pathlib import Path
+        services = [
+            service for path in compose_files or COMPOSE_FILES
+            if Path(path).exists() for service in load_services(path)
+        ]
+        declared: Dict[Tuple[str, int], str] = {}
+        for service in services:
+            for port in service.ports:
+                if port.protocol != 'tcp':
+                    continue
+                for host in [port.host_ip] if port.host_ip else hosts:
+                    declared.setdefault((host, port.published), service.name)
+            if containers and service.ports:
+                name = service.container_name or service.name
+                status = self.get_container_status(name)
+                for network in (status.get('network_settings') or {}).get(
+                        'Networks', {}).values():
+                    if network.get('IPAddress'):
+                        for port in service.ports:
+                            declared.setdefault(
+                                (network['IPAddress'], port.target),
+                                service.name)
+        endpoints = list(declared)
+        for host in hosts:
+            endpoints += [(host, port) for port in extra_ports or []
+                          if (host, port) not in declared]
+        results = self.scan_ports(endpoints, timeout)
+        for result in results:
+            result.service = declared.get((result.host, result.port))
+        return results
+
+    @staticmethod
+    def measure_link(link: LinkLatency,
+                     samples: int = 20,
+                     timeout: float = 1.0,
+                     interval: float = 0.02) -> LinkLatency:
+        """
+        Mesure connexion TCP et aller-retour d'une petite requête sur un lien.
+
+        Chaque échantillon ouvre une connexion, envoie une requête HEAD et
+        attend le premier octet de réponse. Si le service ne répond pas au
+        premier échantillon (protocole autre que HTTP), seules les
+        connexions sont mesurées ensuite. Les mesures partent de l'espace de
+        noms réseau du thread appelant.
+
+        Returns:
+            LinkLatency: Le lien, complété
+        """
+        connects, rtts = [], []
+        request = (f"HEAD / HTTP/1.1\r\nHost: {link.address}\r\n"
+                   f"Connection: close\r\n\r\n").encode()
+        send_requests = True
+        for _ in range(samples):
+            started = time.perf_counter()
+            try:
+                with socket.create_connection((link.address, link.port),
+                                              timeout) as sock:
+                    connected = time.perf_counter()
+                    connects.append((connected - started) * 1000)
+                    if send_requests:
+                        # Pas de réponse : le lien n'est mesuré qu'en connexion
+                        try:
+                            sock.sendall(request)
+                            if sock.recv(1):
+                                rtts.append(
+                                    (time.perf_counter() - connected) * 1000)
+                        except OSError:
+                            pass
+                        send_requests = bool(rtts)
+            except OSError as e:
+                link.errors += 1
+                link.error = str(e) or e.__class__.__name__
+            time.sleep(interval)
+        link.samples = samples
+        link.connect_p50_ms = _percentile(connects, 0.5)
+        link.connect_p95_ms = _percentile(connects, 0.95)
+        link.connect_p99_ms = _percentile(connects, 0.99)
+        link.rtt_p50_ms = _percentile(rtts, 0.5)
+        link.rtt_p95_ms = _percentile(rtts, 0.95)
+        link.rtt_p99_ms = _percentile(rtts, 0.99)
+        return link
+
+    def measure_links(self,
+                      plan: List[Tuple[Optional[int], List[LinkLatency]]],
+                      samples: int = 20,
+                      timeout: float = 1.0,
+                      concurrency: int = 8) -> List[LinkLatency]:
+        """
+        Mesure des liens en parallèle, depuis l'espace de noms de leur source.
+
+        Args:
+            plan: (pid du processus source, liens) par source
+                (pid None : espace de noms courant)
+            samples: Échantillons par lien
+            timeout: Délai d'une connexion (secondes)
+            concurrency: Sources mesurées simultanément
+
+        Returns:
+            List[LinkLatency]: Tous les liens du plan
+        """
+
+        def run(pid: Optional[int], links: List[LinkLatency]) -> None:
+            if pid is not None:
+                try:
+                    enter_network_namespace(pid)
+                except OSError as e:
+                    for link in links:
+                        link.error = f"network namespace: {e}"
+                    return
+            # Les cibles d'une même source sont mesurées l'une après l'autre
+            for link in links:
+                if link.error is None:
+                    self.measure_link(link, samples, timeout)
+
+        # Un pool dédié : ses threads changent d'espace de noms
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            for future in [
+                    executor.submit(run, pid, links)
+                    for pid, links in plan
+            ]:
+                future.result()
+        return [link for _, links in plan for link in links]
+
+    def latency_matrix(self,
+                       containers: Optional[List[str]] = None,
+                       ports: Optional[Dict[str, int]] = None,
+                       samples: int = 20,
+                       timeout: float = 1.0,
+                       concurrency: int = 8) -> List[LinkLatency]:
+        """
+        Latences entre conteneurs, mesurées depuis l'intérieur de chacun.
+
+        Pour chaque couple (source, cible), la cible est jointe par son
+        adresse sur le premier réseau Docker qu'elles partagent, sur le port
+        donné par ports ou, à défaut, son premier port TCP exposé. Les
+        couples sans réseau commun ou sans port sont signalés en erreur.
+
+        Args:
+            containers: Noms des conteneurs (par défaut : ceux en cours)
+            ports: Port à joindre par conteneur
+            samples: Échantillons par lien
+            timeout: Délai d'une connexion (secondes)
+            concurrency: Sources mesurées simultanément
+
+        Returns:
+            List[LinkLatency]: Liens mesurés, aberrants marqués
+        """
+        ports = ports or {}
+        if containers:
+            found = [self.docker_client.containers.get(name)
+                     for name in containers]
+        else:
+            found = self.docker_client.containers.list()
+        nodes = []
+        for container in found:
+            attrs = container.attrs
+            networks = {
+                name: settings.get('IPAddress')
+                for name, settings in attrs['NetworkSettings'].get(
+                    'Networks', {}).items() if settings.get('IPAddress')
+            }
+            port = ports.get(container.name)
+            if port is None:
+                exposed = sorted(
+                    int(spec.split('/')[0])
+                    for spec in (attrs['Config'].get('ExposedPorts') or {})
+                    if spec.endswith('/tcp'))
+                port = exposed[0] if exposed else None
+            nodes.append((container.name, attrs['State'].get('Pid'), networks,
+                          port))
+
+        plan: List[Tuple[Optional[int], List[LinkLatency]]] = []
+        for source, pid, source_networks, _ in nodes:
+            links = []
+            plan.append((pid, links))
+            for target, _, target_networks, port in nodes:
+                if target == source:
+                    continue
+                link = LinkLatency(source, target, port=port)
+                shared = sorted(set(source_networks) & set(target_networks))
+                if not shared:
+                    link.error = "no shared network"
+                elif port is None:
+                    link.error = "no exposed TCP port"
+                else:
+                    link.network = shared[0]
+                    link.address = target_networks[shared[0]]
+                links.append(link)
+        links = self.measure_links(plan, samples, timeout, concurrency)
+        flag_outliers(links)
+        return links
 
     def get_container_status(self, container_name: str) -> Dict[str, Any]:
         """Obtient le statut détaillé d'un conteneur"""
+        import docker
         try:
             container = self.docker_client.containers.get(container_name)
             return {
@@ -44,29 +522,287 @@ class ServiceDiagnostic:
                             max_retries: int = 30,
                             delay: int = 2) -> bool:
         """Teste la santé d'un service avec retry"""
+        import requests
         logger.info(f"Testing health for {url}")
         for i in range(max_retries):
+            started = time.perf_counter()
             try:
                 response = requests.get(url)
-                if response.status_code == 200:
+                status = response.status_code
+                self._record_health(
+                    url, time.perf_counter() - started, status,
+                    None if status == 200 else f"http_{status // 100}xx")
+                if status == 200:
                     logger.info(f"Service {url} is healthy")
                     return True
                 logger.warning(
                     f"Attempt {i+1}: Service returned {response.status_code}")
-            except requests.exceptions.ConnectionError:
+            except requests.exceptions.ConnectionError as e:
+                self._record_health(
+                    url, None, None, 'timeout' if isinstance(
+                        e, requests.exceptions.Timeout) else 'connection')
                 logger.warning(f"Attempt {i+1}: Connection failed")
             time.sleep(delay)
         logger.error(
             f"Service {url} is not healthy after {max_retries} attempts")
         return False
 
+    def _record_health(self, url: str, latency: Optional[float],
+                       status: Optional[int], error: Optional[str]) -> None:
+        """Enregistre une tentative dans l'historique (sans bloquer le test)"""
+        if self.store is None:
+            return
+        try:
+            self.store.record(url, latency, status, error)
+        except Exception as e:
+            logger.warning(f"Health history unavailable: {e}")
+
+    @staticmethod
+    def tls_context(cafile: Optional[str] = None,
+                    insecure: bool = False) -> ssl.SSLContext:
+        """Contexte client TLS (cafile : CA de test, ex. certificat auto-signé)"""
+        context = ssl.create_default_context(cafile=cafile)
+        if insecure:
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+        context.set_alpn_protocols(['http/1.1'])
+        return context
+
+    def probe_tls_host(self,
+                       host: str,
+                       port: int = 443,
+                       context: Optional[ssl.SSLContext] = None,
+                       timeout: float = 5.0,
+                       address: Optional[str] = None) -> TLSProbe:
+        """
+        Mesure connexion TCP, handshake TLS, premier octet et reprise de session.
+
+        Une première connexion complète envoie une requête HEAD et lit le
+        premier octet de la réponse (les tickets de session TLS 1.3 sont
+        reçus à ce moment) ; une seconde connexion présente la session
+        obtenue et mesure le handshake abrégé.
+
+        Args:
+            host: Nom d'hôte (SNI, vérification du certificat, en-tête Host)
+            port: Port TLS
+            context: Contexte TLS (par défaut : vérification système)
+            timeout: Délai maximal de chaque opération (secondes)
+            address: Adresse à joindre à la place de la résolution de host
+
+        Returns:
+            TLSProbe: Mesures ; error renseigné en cas d'échec
+        """
+        context = context or self.tls_context()
+        probe = TLSProbe(host)
+        try:
+            started = time.perf_counter()
+            family, kind, proto, _, sockaddr = socket.getaddrinfo(
+                address or host, port, type=socket.SOCK_STREAM)[0]
+            probe.dns_ms = (time.perf_counter() - started) * 1000
+            probe.address = sockaddr[0]
+
+            def connect(session=None):
+                sock = socket.socket(family, kind, proto)
+                sock.settimeout(timeout)
+                try:
+                    started = time.perf_counter()
+                    sock.connect(sockaddr)
+                    connected = time.perf_counter()
+                    tls = context.wrap_socket(sock,
+                                              server_hostname=host,
+                                              do_handshake_on_connect=False,
+                                              session=session)
+                    tls.do_handshake()
+                except BaseException:
+                    sock.close()
+                    raise
+                return tls, (connected - started) * 1000, (
+                    time.perf_counter() - connected) * 1000
+
+            tls, probe.connect_ms, probe.handshake_ms = connect()
+            with tls:
+                probe.protocol = tls.version()
+                probe.cipher = tls.cipher()[0]
+                not_after = tls.getpeercert().get('notAfter')
+                if not_after:
+                    expires = ssl.cert_time_to_seconds(not_after)
+                    probe.expires = time.strftime('%Y-%m-%dT%H:%M:%SZ',
+                                                  time.gmtime(expires))
+                    probe.days_left = round((expires - time.time()) / 86400, 1)
+                started = time.perf_counter()
+                tls.sendall(f"HEAD / HTTP/1.1\r\nHost: {host}\r\n"
+                            f"Connection: close\r\n\r\n".encode())
+                tls.recv(1)
+                probe.first_byte_ms = (time.perf_counter() - started) * 1000
+                session = tls.session
+
+            resumed, _, probe.resumed_handshake_ms = connect(session)
+            with resumed:
+                probe.session_reused = resumed.session_reused
+        except (OSError, ssl.SSLError) as e:
+            probe.error = str(e) or e.__class__.__name__
+        return probe
+
+    def probe_tls(self,
+                  hosts: List[str],
+                  port: int = 443,
+                  concurrency: int = 16,
+                  timeout: float = 5.0,
+                  cafile: Optional[str] = None,
+                  insecure: bool = False,
+                  address: Optional[str] = None) -> List[TLSProbe]:
+        """
+        Sonde plusieurs hôtes TLS en parallèle (au plus concurrency à la fois).
+
+        Returns:
+            List[TLSProbe]: Mesures, dans l'ordre des hôtes
+        """
+        if not hosts:
+            return []
+        context = self.tls_context(cafile, insecure)
+        with ThreadPoolExecutor(max_workers=min(concurrency,
+                                                len(hosts))) as executor:
+            return list(
+                executor.map(
+                    lambda host: self.probe_tls_host(host, port, context,
+                                                     timeout, address),
+                    hosts))
+
+    async def _load(self, url: str, rate: Optional[float], concurrency: int,
+                    duration: float, timeout: float, method: str):
+        """Génère la charge ; retourne (sketch latence, sketch service, rapport)"""
+        from urllib.parse import urlsplit
+        from async_http import HTTPClientConnection
+        from latency_sketch import LatencySketch
+
+        parts = urlsplit(url)
+        secure = parts.scheme == 'https'
+        path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        context = self.tls_context() if secure else None
+        report = LoadReport(url, 'rate' if rate else 'concurrency', rate,
+                            concurrency)
+        latencies, services = LatencySketch(), LatencySketch()
+        connections = [
+            HTTPClientConnection(parts.hostname,
+                                 parts.port or (443 if secure else 80),
+                                 context, timeout) for _ in range(concurrency)
+        ]
+        queue: asyncio.Queue = asyncio.Queue()
+        started = time.perf_counter()
+        deadline = started + duration
+
+        async def send(connection, intended: float) -> None:
+            sent = time.perf_counter()
+            try:
+                status, _ = await connection.request(method, path)
+                error = None if status < 400 else f"http_{status // 100}xx"
+            except asyncio.TimeoutError:
+                error = 'timeout'
+            except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                error = e.__class__.__name__
+            done = time.perf_counter()
+            report.requests += 1
+            if error:
+                report.errors += 1
+                report.error_classes[error] = report.error_classes.get(
+                    error, 0) + 1
+            else:
+                latencies.add(done - intended)
+                services.add(done - sent)
+
+        async def worker(connection) -> None:
+            if rate:
+                # Boucle ouverte : envois aux dates prévues par le planificateur
+                while True:
+                    intended = await queue.get()
+                    if intended is None:
+                        return
+                    await send(connection, intended)
+            # Boucle fermée : une requête dès la précédente terminée
+            while time.perf_counter() < deadline:
+                await send(connection, time.perf_counter())
+
+        async def schedule() -> None:
+            index = 0
+            while True:
+                intended = started + index / rate
+                if intended >= deadline:
+                    break
+                delay = intended - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                queue.put_nowait(intended)
+                index += 1
+            for _ in connections:
+                queue.put_nowait(None)
+
+        tasks = [worker(connection) for connection in connections]
+        if rate:
+            tasks.append(schedule())
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for connection in connections:
+                await connection.close()
+        report.duration_s = time.perf_counter() - started
+        report.connections = sum(c.connects for c in connections)
+        report.retries = sum(c.retries for c in connections)
+        return latencies, services, report
+
+    def load_probe(self,
+                   url: str,
+                   rate: Optional[float] = None,
+                   concurrency: int = 10,
+                   duration: float = 10.0,
+                   timeout: float = 5.0,
+                   method: str = 'GET') -> LoadReport:
+        """
+        Soumet un service à une charge à débit fixe ou à concurrence fixe.
+
+        Chaque connexion est persistante (keep-alive). À débit fixe, les
+        requêtes sont planifiées à intervalle régulier et confiées à la
+        première des concurrency connexions libre ; leur latence est
+        mesurée depuis leur date prévue, si bien que la file d'attente créée
+        par un service trop lent est comptée. Sans débit, concurrency
+        connexions envoient leurs requêtes en continu.
+
+        Args:
+            url: URL cible (http ou https)
+            rate: Requêtes par seconde (None : concurrence fixe)
+            concurrency: Connexions simultanées
+            duration: Durée de la charge (secondes)
+            timeout: Délai maximal d'une requête (secondes)
+            method: Méthode HTTP
+
+        Returns:
+            LoadReport: Débit, taux d'erreur, percentiles et histogramme
+        """
+        latencies, services, report = asyncio.run(
+            self._load(url, rate, concurrency, duration, timeout, method))
+
+        def ms(value):
+            return round(value * 1000, 3) if value is not None else None
+
+        report.throughput_rps = round(report.requests / report.duration_s, 1)
+        report.error_rate = round(report.errors / report.requests,
+                                  4) if report.requests else 0.0
+        report.latency_p50_ms = ms(latencies.quantile(0.5))
+        report.latency_p90_ms = ms(latencies.quantile(0.9))
+        report.latency_p99_ms = ms(latencies.quantile(0.99))
+        report.latency_p999_ms = ms(latencies.quantile(0.999))
+        report.latency_max_ms = ms(latencies.max if latencies.count else None)
+        report.service_p50_ms = ms(services.quantile(0.5))
+        report.service_p99_ms = ms(services.quantile(0.99))
+        counts = latencies.histogram([b / 1000 for b in HISTOGRAM_BOUNDS_MS])
+        report.histogram = list(zip(HISTOGRAM_BOUNDS_MS + [None], counts))
+        return report
+
     def run_diagnostics(self):
         """Exécute tous les diagnostics"""
         # 1. Vérification des ports
         ports = [8092, 8093]
-        for port in ports:
-            available = self.check_port_availability(port)
-            logger.info(f"Port {port} availability: {available}")
+        for result in self.scan_ports([('localhost', port) for port in ports]):
+            logger.info(f"Port {result.port} state: {result.state}")
 
         # 2. Vérification des conteneurs
         containers = ['api_modelisation', 'api_ihm']
@@ -83,6 +819,239 @@ class ServiceDiagnostic:
             logger.info(f"Service {service} health check: {healthy}")
 
 
-if __name__ == "__main__":
+def log_tls_probes(probes: List[TLSProbe],
+                   warn_days: float = CERT_WARN_DAYS) -> bool:
+    """Journalise les mesures TLS ; False si un hôte échoue ou expire bientôt"""
+    ok = True
+    for probe in probes:
+        if probe.error:
+            logger.error(f"{probe.host}: {probe.error}")
+            ok = False
+            continue
+        logger.info(
+            f"{probe.host} ({probe.address}): connect {probe.connect_ms:.1f}ms, "
+            f"handshake {probe.handshake_ms:.1f}ms, "
+            f"first byte {probe.first_byte_ms:.1f}ms, "
+            f"resumed {probe.resumed_handshake_ms:.1f}ms "
+            f"({'reused' if probe.session_reused else 'not reused'}), "
+            f"{probe.protocol}, expires {probe.expires or '?'}")
+        if probe.days_left is not None and probe.days_left < warn_days:
+            logger.warning(f"{probe.host}: certificate expires in "
+                           f"{probe.days_left} days")
+            ok = False
+    return ok
+
+
+def log_latency_matrix(links: List[LinkLatency]) -> bool:
+    """Journalise la matrice (connexion médiane) ; False si un lien est aberrant ou en erreur"""
+    names = sorted({link.source for link in links} |
+                   {link.target for link in links})
+    cells = {(link.source, link.target): link for link in links}
+    width = max([len(name) for name in names] + [8])
+    logger.info(" " * width + " " + " ".join(f"{name[:width]:>{width}}"
+                                             for name in names))
+    for source in names:
+        row = []
+        for target in names:
+            link = cells.get((source, target))
+            if link is None:
+                cell = "-"
+            elif link.connect_p50_ms is None:
+                cell = "x"
+            else:
+                cell = f"{link.connect_p50_ms:.2f}{'*' if link.outlier else ''}"
+            row.append(f"{cell:>{width}}")
+        logger.info(f"{source:<{width}} " + " ".join(row))
+    ok = True
+    for link in links:
+        if link.outlier:
+            logger.warning(
+                f"{link.source} -> {link.target} ({link.network}): outlier, "
+                f"connect p50/p95/p99 {link.connect_p50_ms:.2f}/"
+                f"{link.connect_p95_ms:.2f}/{link.connect_p99_ms:.2f}ms"
+                + (f", request p50 {link.rtt_p50_ms:.2f}ms"
+                   if link.rtt_p50_ms is not None else ""))
+            ok = False
+        if link.error:
+            failed = (f" ({link.errors}/{link.samples} failed)"
+                      if link.samples else "")
+            logger.error(f"{link.source} -> {link.target}: {link.error}{failed}")
+            ok = False
+    return ok
+
+
+def log_load_report(report: LoadReport) -> None:
+    """Journalise le résultat d'une sonde de charge et son histogramme"""
+    target = f"{report.rate:g} req/s" if report.rate else \
+        f"{report.concurrency} connections"
+    logger.info(f"{report.url} ({report.mode}, {target}): {report.requests} "
+                f"requests in {report.duration_s:.1f}s, "
+                f"{report.throughput_rps} req/s, "
+                f"{report.error_rate:.2%} errors, "
+                f"{report.connections} connections opened, "
+                f"{report.retries} retried on a stale connection")
+    if report.latency_p50_ms is not None:
+        logger.info(f"latency p50 {report.latency_p50_ms:.2f}ms, "
+                    f"p90 {report.latency_p90_ms:.2f}ms, "
+                    f"p99 {report.latency_p99_ms:.2f}ms, "
+                    f"p99.9 {report.latency_p999_ms:.2f}ms, "
+                    f"max {report.latency_max_ms:.2f}ms "
+                    f"(service p50 {report.service_p50_ms:.2f}ms, "
+                    f"p99 {report.service_p99_ms:.2f}ms)")
+    total = max(1, sum(count for _, count in report.histogram))
+    previous = 0
+    for bound, count in report.histogram:
+        label = f"{previous}-{bound}ms" if bound else f">{previous}ms"
+        logger.info(f"{label:>12} {count:8d} {'#' * round(40 * count / total)}")
+        previous = bound
+    for error, count in sorted(report.error_classes.items()):
+        logger.warning(f"{error}: {count}")
+
+
+def _container_port(text: str) -> Tuple[str, int]:
+    """« conteneur=port » -> (conteneur, port)"""
+    name, _, port = text.partition('=')
+    return name, int(port)
+
+
+def log_port_scans(results: List[PortScan]) -> bool:
+    """Journalise les ports sondés ; False si un port déclaré n'écoute pas"""
+    ok = True
+    counts: Dict[str, int] = {}
+    for result in results:
+        counts[result.state] = counts.get(result.state, 0) + 1
+        if result.service and result.state != OPEN:
+            logger.error(f"{result.host}:{result.port} ({result.service}): "
+                         f"{result.state}{f' - {result.error}' if result.error else ''}")
+            ok = False
+        elif result.service:
+            logger.info(f"{result.host}:{result.port} ({result.service}): "
+                        f"open in {result.latency_ms:.1f}ms")
+        elif result.state == OPEN:
+            logger.warning(f"{result.host}:{result.port}: open but not "
+                           f"declared in docker-compose")
+    logger.info(", ".join(f"{count} {state}"
+                          for state, count in sorted(counts.items())))
+    return ok
+
+
+def _port_list(text: str) -> List[int]:
+    """« 22,80,8000-8100 » -> liste de ports"""
+    ports = []
+    for part in text.split(','):
+        first, _, last = part.partition('-')
+        ports.extend(range(int(first), int(last or first) + 1))
+    return ports
+
+
+def main():
+    """Point d'entrée : diagnostic complet, ports publiés ou sonde TLS"""
+    parser = argparse.ArgumentParser(description="Diagnostic réseau des services")
+    parser.add_argument('--no-history', action='store_true',
+                        help="N'enregistre pas les tests de santé "
+                        "(health_store.py)")
+    subparsers = parser.add_subparsers(dest='command')
+    ports = subparsers.add_parser(
+        'ports', help="Ports publiés par docker-compose et ports ouverts")
+    ports.add_argument('hosts', nargs='*', default=['localhost'],
+                       help="Hôtes sondés (par défaut : localhost)")
+    ports.add_argument('--compose', action='append',
+                       help="Fichier docker-compose (répétable)")
+    ports.add_argument('--ports', type=_port_list,
+                       help="Ports sondés en plus (ex: 22,8000-8100)")
+    ports.add_argument('--containers', action='store_true',
+                       help="Sonde aussi les conteneurs dans leurs réseaux")
+    ports.add_argument('--timeout', type=float, default=0.5)
+    ports.add_argument('--json', action='store_true')
+    matrix = subparsers.add_parser(
+        'matrix', help="Latences entre conteneurs (réseaux Docker)")
+    matrix.add_argument('containers', nargs='*',
+                        help="Conteneurs (par défaut : tous ceux en cours)")
+    matrix.add_argument('--port', type=_container_port, action='append',
+                        default=[], help="Port d'un conteneur (nom=port)")
+    matrix.add_argument('--samples', type=int, default=20)
+    matrix.add_argument('--timeout', type=float, default=1.0)
+    matrix.add_argument('--concurrency', type=int, default=8)
+    matrix.add_argument('--json', action='store_true')
+    load = subparsers.add_parser('load', help="Sonde de charge d'une URL")
+    load.add_argument('url', help="URL cible (ex: http://localhost:8092/health)")
+    load.add_argument('--rate', type=float,
+                      help="Débit fixe en requêtes/s (sinon concurrence fixe)")
+    load.add_argument('--concurrency', type=int, default=10,
+                      help="Connexions simultanées")
+    load.add_argument('--duration', type=float, default=10.0)
+    load.add_argument('--timeout', type=float, default=5.0)
+    load.add_argument('--method', default='GET')
+    load.add_argument('--json', action='store_true')
+    tls = subparsers.add_parser('tls', help="Sonde TLS des hôtes publiés")
+    tls.add_argument('hosts', nargs='*',
+                     help="Hôtes (par défaut : règles Host de Traefik)")
+    tls.add_argument('--zone', help="Filtre les hôtes Traefik sur une zone")
+    tls.add_argument('--port', type=int, default=443)
+    tls.add_argument('--concurrency', type=int, default=16)
+    tls.add_argument('--timeout', type=float, default=5.0)
+    tls.add_argument('--connect', help="Adresse à joindre pour tous les hôtes")
+    tls.add_argument('--cafile', help="CA de confiance (serveurs de test)")
+    tls.add_argument('--insecure', action='store_true',
+                     help="Sans vérification (pas de date d'expiration)")
+    tls.add_argument('--warn-days', type=float, default=CERT_WARN_DAYS)
+    tls.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.command is None else
+                        logging.INFO)
     diagnostic = ServiceDiagnostic()
-    diagnostic.run_diagnostics()
+    if args.command is None:
+        if not args.no_history:
+            # Historique des tests de santé, comme l'ordonnanceur
+            try:
+                from health_store import HealthStore
+                diagnostic.store = HealthStore()
+            except Exception as e:
+                logger.warning(f"Health history disabled: {e}")
+        diagnostic.run_diagnostics()
+        return
+    if args.command == 'load':
+        report = diagnostic.load_probe(args.url, args.rate, args.concurrency,
+                                       args.duration, args.timeout,
+                                       args.method)
+        if args.json:
+            print(json.dumps(asdict(report), indent=2))
+        log_load_report(report)
+        return
+    if args.command == 'matrix':
+        links = diagnostic.latency_matrix(args.containers, dict(args.port),
+                                          args.samples, args.timeout,
+                                          args.concurrency)
+        if args.json:
+            print(json.dumps([asdict(link) for link in links], indent=2))
+        if not log_latency_matrix(links):
+            sys.exit(1)
+        return
+    if args.command == 'ports':
+        started = time.perf_counter()
+        results = diagnostic.scan_published_ports(args.hosts, args.compose,
+                                                  args.ports, args.containers,
+                                                  args.timeout)
+        logger.info(f"{len(results)} endpoints scanned in "
+                    f"{time.perf_counter() - started:.2f}s")
+        if args.json:
+            print(json.dumps([asdict(result) for result in results], indent=2))
+        if not log_port_scans(results):
+            sys.exit(1)
+        return
+    hosts = args.hosts
+    if not hosts:
+        from traefik_config import all_hosts
+        hosts = all_hosts(zone=args.zone)
+    probes = diagnostic.probe_tls(hosts, args.port, args.concurrency,
+                                  args.timeout, args.cafile, args.insecure,
+                                  args.connect)
+    if args.json:
+        print(json.dumps([asdict(probe) for probe in probes], indent=2))
+    if not log_tls_probes(probes, args.warn_days):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
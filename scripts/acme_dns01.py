@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Provisionnement groupé des enregistrements TXT ACME DNS-01 chez OVH.
+
+Pour chaque hôte Traefik (reverse-proxy/dynamic/*.yml), un challenge
+DNS-01 demande un enregistrement TXT _acme-challenge.<hôte>. Traités un par
+un, ces challenges coûtent chacun une écriture, un rafraîchissement de zone
+et une attente de propagation. Ce module :
+- crée tous les TXT en attente en un lot (appels parallèles)
+- rafraîchit la zone une seule fois
+- attend la propagation de tous les TXT en parallèle
+- supprime les TXT en un lot, avec un seul rafraîchissement
+
+Les identifiants créés sont conservés dans acme_<zone>.json (répertoire
+d'état) afin que le nettoyage puisse se faire dans un autre processus.
+
+Le script est aussi compatible avec le fournisseur « exec » de lego utilisé
+par Traefik (dnsChallenge: provider: exec, EXEC_PATH=.../acme_dns01.py) :
+chaque appel « present <fqdn> <valeur> » crée son TXT et confie le
+rafraîchissement au coordinateur de zone_refresh.py, qui regroupe les
+appels successifs de lego en un seul rafraîchissement.
+
+Utilisation:
+    python3 acme_dns01.py hosts
+    python3 acme_dns01.py batch-present challenges.json
+    python3 acme_dns01.py batch-cleanup
+    python3 acme_dns01.py present _acme-challenge.grafana.iaproject.fr. <valeur>
+    python3 acme_dns01.py cleanup _acme-challenge.grafana.iaproject.fr. <valeur>
+
+Auteur: Franck DESMEDT
+Date: 2024
+Version: 1.0
+"""
+
+import argparse
+import asyncio
+import fcntl
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from config import config
+from logger import setup_logger
+from zone_refresh import ZoneRefreshCoordinator
+from dns_propagation import PropagationChecker, log_report
+from traefik_config import all_hosts
+from credentials import CredentialError, precheck
+
+# Configuration du logger
+logger = setup_logger(__name__)
+
+CHALLENGE_PREFIX = '_acme-challenge'
+CHALLENGE_TTL = 60
+
+# Un challenge : (nom complet du TXT, valeur)
+Challenge = Tuple[str, str]
+
+
+def challenge_name(name: str) -> str:
+    """
+    Normalise un nom d'hôte ou de challenge en nom complet du TXT.
+
+    Args:
+        name (str): « grafana.iaproject.fr » ou « _acme-challenge.grafana.iaproject.fr. »
+
+    Returns:
+        str: Nom complet sans point final (_acme-challenge.grafana.iaproject.fr)
+    """
+    name = name.strip().rstrip('.').lower()
+    if name.startswith('*.'):
+        name = name[2:]
+    if not name.startswith(f'{CHALLENGE_PREFIX}.'):
+        name = f'{CHALLENGE_PREFIX}.{name}'
+    return name
+
+
+class AcmeDNS01Batch:
+    """
+    Crée, vérifie et supprime des TXT ACME par lots dans une zone OVH.
+
+    Attributes:
+        client: Client OVH
+        zone (str): Zone DNS
+        state_file (Path): Suivi des TXT créés
+        max_workers (int): Appels API simultanés
+        created (List[Dict]): TXT créés par le dernier appel à present
+    """
+
+    def __init__(self,
+                 client,
+                 zone: str,
+                 state_file: Optional[Path] = None,
+                 max_workers: int = 8):
+        self.client = client
+        self.zone = zone
+        self.state_file = Path(state_file
+                               or config.get_state_dir() / f'acme_{zone}.json')
+        self.max_workers = max_workers
+        self.created: List[Dict] = []
+
+    def subdomain(self, fqdn: str) -> str:
+        """
+        Calcule le sous-domaine relatif à la zone.
+
+        Raises:
+            ValueError: Si le nom n'appartient pas à la zone
+        """
+        if not fqdn.endswith(f'.{self.zone}'):
+            raise ValueError(f"{fqdn} n'appartient pas à la zone {self.zone}")
+        return fqdn[:-len(self.zone) - 1]
+
+    @contextmanager
+    def _tracked(self) -> Iterator[Dict[str, List[Dict]]]:
+        """Verrouille et fournit le suivi des TXT créés (réécrit en sortie)"""
+        with open(f"{self.state_file}.lock", 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(self.state_file, 'r') as f:
+                    tracked = json.load(f)
+            except (OSError, ValueError):
+                tracked = {}
+            yield tracked
+            tmp_file = f"{self.state_file}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(tracked, f, indent=2)
+            os.replace(tmp_file, self.state_file)
+
+    def _create(self, challenge: Challenge) -> Dict:
+        """Crée un TXT et retourne son suivi"""
+        fqdn, value = challenge
+        record = self.client.post(f'/domain/zone/{self.zone}/record',
+                                  fieldType='TXT',
+                                  subDomain=self.subdomain(fqdn),
+                                  target=value,
+                                  ttl=CHALLENGE_TTL)
+        return {'fqdn': fqdn, 'id': record['id'], 'value': value}
+
+    def _delete(self, entry: Dict) -> Optional[Dict]:
+        """Supprime un TXT ; retourne l'entrée si la suppression a échoué"""
+        from ovh.exceptions import ResourceNotFoundError
+        try:
+            self.client.delete(f"/domain/zone/{self.zone}/record/{entry['id']}")
+            return None
+        except ResourceNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Suppression du TXT {entry['fqdn']} impossible : {e}")
+            return entry
+
+    def _rollback(self, created: List[Dict]) -> None:
+        """
+        Supprime les TXT d'un lot interrompu.
+
+        Les TXT dont la suppression échoue restent suivis : batch-cleanup
+        les supprimera plus tard.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            failed = [
+                entry for entry in executor.map(self._delete, created) if entry
+            ]
+        if failed:
+            with self._tracked() as tracked:
+                for entry in failed:
+                    tracked.setdefault(entry['fqdn'], []).append(entry)
+        logger.warning(f"Lot interrompu : {len(created) - len(failed)} TXT "
+                       f"supprimé(s), {len(failed)} conservé(s) dans le suivi")
+
+    def _precheck(self, operations: List[Tuple[str, str]]) -> None:
+        """
+        Vérifie les droits avant le lot plutôt qu'au milieu.
+
+        Raises:
+            CredentialError: Si la consumer key ne permet pas le lot
+        """
+        if not precheck(self.client, operations):
+            raise CredentialError(
+                f"Consumer key inutilisable pour la zone {self.zone}")
+
+    def _refresh(self, wait: bool = True) -> bool:
+        """Notifie le coordinateur ; rafraîchit immédiatement si wait"""
+        coordinator = ZoneRefreshCoordinator(self.client, self.zone)
+        since = coordinator.notify()
+        if wait:
+            return coordinator.flush(since, force=True)
+        # Un processus détaché rafraîchira à l'échéance de la fenêtre
+        subprocess.Popen([
+            sys.executable,
+            str(Path(__file__).parent / 'zone_refresh.py'), '--wait', '--zone',
+            self.zone
+        ],
+                         stdout=subprocess.DEVNULL,
+                         stderr=subprocess.DEVNULL,
+                         start_new_session=True)
+        return True
+
+    def present(self,
+                challenges: Sequence[Challenge],
+                wait_refresh: bool = True) -> List[Dict]:
+        """
+        Crée tous les TXT en un lot puis rafraîchit la zone une fois.
+
+        Args:
+            challenges (Sequence[Challenge]): (nom, valeur) à créer
+            wait_refresh (bool, optional): Rafraîchit la zone avant de rendre
+                la main. Sinon, le rafraîchissement est confié au coordinateur.
+
+        Returns:
+            List[Dict]: TXT créés
+
+        Raises:
+            Exception: Première erreur de création ; les TXT déjà créés par le
+                lot sont alors supprimés
+        """
+        challenges = [(challenge_name(name), value)
+                      for name, value in challenges]
+        self._precheck([('POST', f'/domain/zone/{self.zone}/record'),
+                        ('POST', f'/domain/zone/{self.zone}/refresh')])
+        self.created = created = []
+        errors = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                executor.submit(self._create, challenge)
+                for challenge in challenges
+            ]
+            for future in futures:
+                try:
+                    created.append(future.result())
+                except Exception as e:
+                    errors.append(e)
+        if errors:
+            logger.error(f"{len(errors)} TXT ACME non créé(s) dans "
+                         f"{self.zone} : {errors[0]}")
+            self._rollback(created)
+            raise errors[0]
+        with self._tracked() as tracked:
+            for entry in created:
+                tracked.setdefault(entry['fqdn'], []).append(entry)
+        logger.info(f"{len(created)} TXT ACME créé(s) dans {self.zone}")
+        if created:
+            self._refresh(wait_refresh)
+        return created
+
+    def wait(self, challenges: Sequence[Challenge],
+             timeout: Optional[float] = None) -> bool:
+        """
+        Attend la propagation de tous les TXT en parallèle.
+
+        Args:
+            challenges (Sequence[Challenge]): (nom, valeur) attendus
+            timeout (float, optional): Délai maximal (OVH_PROPAGATION_TIMEOUT)
+
+        Returns:
+            bool: True si tous les TXT sont visibles partout
+        """
+        expected: Dict[str, List[str]] = {}
+        for name, value in challenges:
+            expected.setdefault(challenge_name(name), []).append(value)
+        checker = PropagationChecker(timeout=timeout)
+
+        async def _check_all():
+            return await asyncio.gather(*[
+                checker.check(fqdn,
+                              'TXT',
+                              values,
+                              zone=self.zone,
+                              require_all=True)
+                for fqdn, values in expected.items()
+            ])
+
+        ok = True
+        for fqdn, results in zip(expected, asyncio.run(_check_all())):
+            logger.info(f"Propagation de {fqdn} :")
+            ok = log_report(results) and ok
+        return ok
+
+    def cleanup(self,
+                challenges: Optional[Sequence[Challenge]] = None,
+                wait_refresh: bool = True) -> int:
+        """
+        Supprime les TXT suivis en un lot puis rafraîchit la zone une fois.
+
+        Args:
+            challenges (Sequence[Challenge], optional): TXT à supprimer. Par
+                défaut tous les TXT suivis.
+            wait_refresh (bool, optional): Rafraîchit avant de rendre la main
+
+        Returns:
+            int: Nombre de TXT supprimés
+        """
+        wanted = None
+        if challenges is not None:
+            wanted = {(challenge_name(name), value)
+                      for name, value in challenges}
+        with self._tracked() as tracked:
+            entries = [
+                entry for fqdn_entries in tracked.values()
+                for entry in fqdn_entries
+                if wanted is None or (entry['fqdn'], entry['value']) in wanted
+            ]
+            if entries:
+                self._precheck([
+                    ('DELETE', f"/domain/zone/{self.zone}/record/{entry['id']}")
+                    for entry in entries
+                ] + [('POST', f'/domain/zone/{self.zone}/refresh')])
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                failed = [
+                    entry for entry in executor.map(self._delete, entries)
+                    if entry
+                ]
+            removed = [entry for entry in entries if entry not in failed]
+            for entry in removed:
+                tracked[entry['fqdn']].remove(entry)
+                if not tracked[entry['fqdn']]:
+                    del tracked[entry['fqdn']]
+        logger.info(f"{len(removed)} TXT ACME supprimé(s) dans {self.zone}")
+        if removed:
+            self._refresh(wait_refresh)
+        return len(removed)
+
+
+def load_challenges(path: str) -> List[Challenge]:
+    """
+    Charge une liste de challenges.
+
+    Formats acceptés : liste JSON [{"domain": ..., "value": ...}] ou une
+    ligne « domaine valeur » par challenge.
+
+    Args:
+        path (str): Chemin du fichier
+
+    Returns:
+        List[Challenge]: Challenges (nom, valeur)
+    """
+    with open(path, 'r') as f:
+        content = f.read()
+    if content.lstrip().startswith('['):
+        return [(item['domain'], item['value']) for item in json.loads(content)]
+    return [
+        tuple(line.split()[:2]) for line in content.splitlines()
+        if line.strip() and not line.startswith('#')
+    ]
+
+
+def main():
+    """Point d'entrée : commandes par lot et compatibilité lego « exec »"""
+    parser = argparse.ArgumentParser(
+        description="Challenges ACME DNS-01 groupés chez OVH")
+    parser.add_argument('--zone', help="Zone DNS (par défaut OVH_DNS_ZONE)")
+    parser.add_argument('--timeout',
+                        type=float,
+                        help="Délai maximal de propagation (s)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('hosts', help="Hôtes Traefik de la zone")
+    batch_present = subparsers.add_parser('batch-present',
+                                          help="Crée un lot de TXT et attend")
+    batch_present.add_argument('file', help="Fichier de challenges")
+    batch_cleanup = subparsers.add_parser('batch-cleanup',
+                                          help="Supprime les TXT suivis")
+    batch_cleanup.add_argument('file',
+                               nargs='?',
+                               help="Fichier de challenges (tous par défaut)")
+    for command in ('present', 'cleanup'):
+        exec_parser = subparsers.add_parser(command,
+                                            help="Mode lego « exec »")
+        exec_parser.add_argument('fqdn')
+        exec_parser.add_argument('value')
+    args = parser.parse_args()
+
+    zone = args.zone or config.get_required('OVH_DNS_ZONE')
+    if args.command == 'hosts':
+        for host in all_hosts(zone=zone):
+            logger.info(f"{host} -> {challenge_name(host)}")
+        return
+
+    batch = AcmeDNS01Batch(config.get_ovh_client(), zone)
+    if args.command == 'batch-present':
+        challenges = load_challenges(args.file)
+        batch.present(challenges)
+        ok = batch.wait(challenges, args.timeout)
+        raise SystemExit(0 if ok else 1)
+    if args.command == 'batch-cleanup':
+        batch.cleanup(load_challenges(args.file) if args.file else None)
+    elif args.command == 'present':
+        batch.present([(args.fqdn, args.value)], wait_refresh=False)
+    elif args.command == 'cleanup':
+        batch.cleanup([(args.fqdn, args.value)], wait_refresh=False)
+
+
+if __name__ == "__main__":
+    main()
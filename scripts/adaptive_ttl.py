@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gestion adaptative du TTL des enregistrements DNS dynamiques.
+
+Plutôt que d'écrire systématiquement ttl=60, ce module déduit le TTL de
+l'historique des changements d'IP :
+- juste après un changement, le TTL reste au minimum (un autre changement
+  peut suivre, la bascule doit rester rapide)
+- pendant une longue période stable, le TTL augmente par paliers (puissances
+  de deux du minimum) jusqu'au maximum configuré
+- si les changements passés sont réguliers (renouvellement d'IP du
+  fournisseur d'accès), le TTL est réduit à l'approche du prochain
+  changement prévu afin que les caches aient expiré à ce moment-là
+
+L'historique est conservé dans le répertoire d'état (ip_history.jsonl).
+Un simulateur rejoue un historique de changements pour comparer des
+politiques (requêtes résolveurs, appels API, durée d'obsolescence).
+
+Utilisation:
+    python3 adaptive_ttl.py show www.iaproject.fr
+    python3 adaptive_ttl.py simulate historique.jsonl --max-ttl 86400
+
+Configuration (.env):
+    OVH_TTL_MIN: TTL minimal en secondes (60 par défaut)
+    OVH_TTL_MAX: TTL maximal en secondes (3600 par défaut)
+
+Auteur: Franck DESMEDT
+Date: 2024
+Version: 1.0
+"""
+
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config import config
+from logger import setup_logger
+
+# Configuration du logger
+logger = setup_logger(__name__)
+
+DEFAULT_MIN_TTL = 60
+DEFAULT_MAX_TTL = 3600
+
+# Une observation de l'historique : (horodatage, ip)
+Change = Tuple[float, str]
+
+
+# =====================================================
+# Historique des changements d'IP
+# =====================================================
+class IPHistory:
+    """
+    Historique des changements d'IP par nom DNS (fichier JSON lines).
+
+    Attributes:
+        path (Path): Chemin du fichier d'historique
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        """
+        Initialise l'historique.
+
+        Args:
+            path (Path, optional): Fichier d'historique. Par défaut
+                ip_history.jsonl dans le répertoire d'état.
+        """
+        self.path = Path(path or config.get_state_dir() / 'ip_history.jsonl')
+
+    def load(self, name: str) -> List[Change]:
+        """
+        Charge les changements d'IP d'un nom.
+
+        Args:
+            name (str): Nom DNS complet
+
+        Returns:
+            List[Change]: Changements triés par date
+        """
+        changes = []
+        try:
+            with open(self.path, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry.get('name') == name:
+                        changes.append((float(entry['ts']), entry['ip']))
+        except OSError:
+            pass
+        return sorted(changes)
+
+    def record(self, name: str, ip: str, ts: Optional[float] = None) -> bool:
+        """
+        Enregistre l'IP observée si elle diffère de la dernière connue.
+
+        Args:
+            name (str): Nom DNS complet
+            ip (str): IP observée
+            ts (float, optional): Horodatage. Par défaut maintenant.
+
+        Returns:
+            bool: True si un changement a été enregistré
+        """
+        changes = self.load(name)
+        if changes and changes[-1][1] == ip:
+            return False
+        with open(self.path, 'a') as f:
+            f.write(
+                json.dumps({
+                    'ts': ts if ts is not None else time.time(),
+                    'name': name,
+                    'ip': ip
+                }) + '\n')
+        return True
+
+
+def load_change_log(path: str) -> List[Change]:
+    """
+    Charge un journal de changements pour le simulateur.
+
+    Formats acceptés, une entrée par ligne :
+    - JSON : {"ts": 1700000000, "ip": "1.2.3.4"} (ts en epoch ou ISO 8601)
+    - Texte : « 2024-01-01T12:00:00 1.2.3.4 »
+
+    Args:
+        path (str): Chemin du journal
+
+    Returns:
+        List[Change]: Changements triés par date (IP répétées ignorées)
+    """
+
+    def _parse_ts(value) -> float:
+        if isinstance(value, (int, float)):
+            return float(value)
+        try:
+            return float(value)
+        except ValueError:
+            return datetime.fromisoformat(value).timestamp()
+
+    entries = []
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('{'):
+                entry = json.loads(line)
+                entries.append((_parse_ts(entry['ts']), entry['ip']))
+            else:
+                ts, ip = line.split()[:2]
+                entries.append((_parse_ts(ts), ip))
+    changes: List[Change] = []
+    for ts, ip in sorted(entries):
+        if not changes or changes[-1][1] != ip:
+            changes.append((ts, ip))
+    return changes
+
+
+# =====================================================
+# Politiques de TTL
+# =====================================================
+class FixedTTLPolicy:
+    """Politique de référence : TTL constant (comportement historique)"""
+
+    def __init__(self, ttl: int = DEFAULT_MIN_TTL):
+        self.ttl = ttl
+
+    def __repr__(self) -> str:
+        return f"FixedTTLPolicy(ttl={self.ttl})"
+
+    def compute(self, changes: List[Change], now: float) -> int:
+        """Retourne toujours le même TTL"""
+        return self.ttl
+
+
+class AdaptiveTTLPolicy:
+    """
+    Politique de TTL fondée sur la stabilité de l'IP.
+
+    Attributes:
+        min_ttl (int): TTL minimal (après un changement)
+        max_ttl (int): TTL maximal (période stable)
+        settle (float): Durée de stabilité avant d'augmenter le TTL
+        ratio (float): Part maximale de la durée de stabilité utilisée comme TTL
+        regularity (float): Coefficient de variation maximal des intervalles
+            pour considérer les changements comme prévisibles
+    """
+
+    def __init__(self,
+                 min_ttl: int = DEFAULT_MIN_TTL,
+                 max_ttl: int = DEFAULT_MAX_TTL,
+                 settle: float = 3600.0,
+                 ratio: float = 0.1,
+                 regularity: float = 0.25):
+        self.min_ttl = min_ttl
+        self.max_ttl = max(max_ttl, min_ttl)
+        self.settle = settle
+        self.ratio = ratio
+        self.regularity = regularity
+
+    def __repr__(self) -> str:
+        return (f"AdaptiveTTLPolicy(min_ttl={self.min_ttl}, "
+                f"max_ttl={self.max_ttl}, settle={self.settle:g})")
+
+    @classmethod
+    def from_config(cls) -> 'AdaptiveTTLPolicy':
+        """Crée la politique à partir des bornes OVH_TTL_MIN / OVH_TTL_MAX"""
+        return cls(min_ttl=int(config.get_float('OVH_TTL_MIN',
+                                                DEFAULT_MIN_TTL)),
+                   max_ttl=int(config.get_float('OVH_TTL_MAX',
+                                                DEFAULT_MAX_TTL)))
+
+    def _quantize(self, ttl: float) -> int:
+        """
+        Arrondit au palier inférieur pour limiter les écritures.
+
+        Les paliers sont min_ttl * 2^n, complétés par max_ttl : un TTL
+        atteignant max_ttl est écrit tel quel.
+        """
+        if ttl >= self.max_ttl:
+            return int(self.max_ttl)
+        step = self.min_ttl
+        while step * 2 <= ttl:
+            step *= 2
+        return int(min(max(step, self.min_ttl), self.max_ttl))
+
+    def predict_next_change(self, changes: List[Change]) -> Optional[float]:
+        """
+        Prévoit la date au plus tôt du prochain changement si l'historique
+        est régulier (médiane des intervalles moins deux écarts-types).
+
+        Args:
+            changes (List[Change]): Changements passés
+
+        Returns:
+            Optional[float]: Horodatage prévu, ou None si imprévisible
+        """
+        if len(changes) < 3:
+            return None
+        intervals = [b[0] - a[0] for a, b in zip(changes, changes[1:])]
+        mean = statistics.mean(intervals)
+        spread = statistics.pstdev(intervals)
+        if mean <= 0 or spread / mean > self.regularity:
+            return None
+        return changes[-1][0] + statistics.median(intervals) - 2 * spread
+
+    def compute(self, changes: List[Change], now: float) -> int:
+        """
+        Calcule le TTL à appliquer.
+
+        Args:
+            changes (List[Change]): Changements passés (jusqu'à now)
+            now (float): Instant courant
+
+        Returns:
+            int: TTL en secondes, compris entre min_ttl et max_ttl
+        """
+        if not changes:
+            return self.min_ttl
+        stable = now - changes[-1][0]
+        if stable < self.settle:
+            return self.min_ttl
+        ttl = stable * self.ratio
+        predicted = self.predict_next_change(changes)
+        if predicted is not None:
+            # Les caches doivent avoir expiré au moment du changement prévu
+            margin = max(self.settle / 2, self.min_ttl)
+            ttl = min(ttl, predicted - margin - now)
+        return self._quantize(max(ttl, self.min_ttl))
+
+
+def adaptive_ttl(name: str, ip: str) -> int:
+    """
+    Retourne le TTL à écrire pour ce nom, si l'IP y est publiée maintenant.
+
+    L'historique n'est pas modifié : l'appelant y inscrit l'IP avec
+    record_ip une fois l'écriture réussie, pour qu'un échec ne compte pas
+    comme un changement.
+
+    Args:
+        name (str): Nom DNS complet
+        ip (str): IP publique actuelle
+
+    Returns:
+        int: TTL recommandé
+    """
+    now = time.time()
+    changes = IPHistory().load(name)
+    if not changes or changes[-1][1] != ip:
+        changes.append((now, ip))
+    ttl = AdaptiveTTLPolicy.from_config().compute(changes, now)
+    logger.debug(f"TTL adaptatif pour {name} : {ttl}s")
+    return ttl
+
+
+def record_ip(name: str, ip: str) -> None:
+    """
+    Inscrit l'IP publiée dans l'historique (après une écriture réussie).
+
+    Args:
+        name (str): Nom DNS complet
+        ip (str): IP publiée
+    """
+    if IPHistory().record(name, ip):
+        logger.info(f"Changement d'IP enregistré pour {name}")
+
+
+# =====================================================
+# Simulateur
+# =====================================================
+def simulate(changes: List[Change],
+             policy,
+             interval: float = 300.0,
+             start: Optional[float] = None,
+             end: Optional[float] = None) -> Dict[str, float]:
+    """
+    Rejoue un historique de changements avec une politique de TTL.
+
+    Le script de mise à jour est supposé tourner toutes les `interval`
+    secondes : un changement d'IP n'est détecté qu'au passage suivant, et
+    les résolveurs conservent l'ancienne valeur jusqu'à l'expiration du TTL
+    publié avant la détection.
+
+    Args:
+        changes (List[Change]): Changements d'IP triés
+        policy: Politique (méthode compute(changes, now))
+        interval (float, optional): Période du script de mise à jour
+        start (float, optional): Début de la simulation (premier changement)
+        end (float, optional): Fin de la simulation (dernier changement + 1 jour)
+
+    Returns:
+        Dict[str, float]: Indicateurs : requêtes par résolveur, écritures API,
+            obsolescence moyenne et maximale en secondes
+    """
+    if not changes:
+        raise ValueError("Historique vide")
+    start = changes[0][0] if start is None else start
+    end = changes[-1][0] + 86400 if end is None else end
+    queries = 0.0
+    writes = 0
+    staleness: List[float] = []
+    published_ttl = None
+    known = 0  # Nombre de changements déjà détectés
+    now = start
+    while now < end:
+        # Changements survenus depuis le dernier passage
+        detected = False
+        while known < len(changes) and changes[known][0] <= now:
+            if known > 0 and published_ttl is not None:
+                staleness.append(now - changes[known][0] + published_ttl)
+            known += 1
+            detected = True
+        ttl = policy.compute(changes[:known], now)
+        if detected or ttl != published_ttl:
+            writes += 1
+            published_ttl = ttl
+        step = min(interval, end - now)
+        queries += step / ttl
+        now += step
+    return {
+        'queries': round(queries),
+        'writes': writes,
+        'changes': len(changes),
+        'stale_mean': statistics.mean(staleness) if staleness else 0.0,
+        'stale_max': max(staleness) if staleness else 0.0,
+    }
+
+
+def main():
+    """Point d'entrée : affichage du TTL courant ou simulation"""
+    parser = argparse.ArgumentParser(description="Gestion adaptative du TTL")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    show = subparsers.add_parser('show', help="TTL recommandé pour un nom")
+    show.add_argument('name', help="Nom DNS complet")
+
+    sim = subparsers.add_parser('simulate',
+                                help="Rejoue un journal de changements")
+    sim.add_argument('log', help="Journal (JSON lines ou « date ip »)")
+    sim.add_argument('--min-ttl', type=int, default=DEFAULT_MIN_TTL)
+    sim.add_argument('--max-ttl', type=int, default=DEFAULT_MAX_TTL)
+    sim.add_argument('--settle', type=float, default=3600.0)
+    sim.add_argument('--interval',
+                     type=float,
+                     default=300.0,
+                     help="Période du script de mise à jour (s)")
+    args = parser.parse_args()
+
+    if args.command == 'show':
+        changes = IPHistory().load(args.name)
+        ttl = AdaptiveTTLPolicy.from_config().compute(changes, time.time())
+        logger.info(f"{args.name} : {len(changes)} changement(s), TTL {ttl}s")
+        return
+
+    changes = load_change_log(args.log)
+    policies = [
+        FixedTTLPolicy(args.min_ttl),
+        AdaptiveTTLPolicy(args.min_ttl, args.max_ttl, args.settle)
+    ]
+    for policy in policies:
+        result = simulate(changes, policy, args.interval)
+        logger.info(
+            f"{policy!r} : {result['queries']} requêtes/résolveur, "
+            f"{result['writes']} écriture(s), obsolescence moyenne "
+            f"{result['stale_mean']:.0f}s, max {result['stale_max']:.0f}s")
+
+
+if __name__ == "__main__":
+    main()
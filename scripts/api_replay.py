@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Enregistrement et rejeu du trafic de l'API OVH.
+
+Les mesures contre l'API réelle sont bruitées et demandent des
+credentials. Ce module intercepte raw_call du client créé par
+Config.get_ovh_client :
+- OVH_RECORD=fichier : chaque requête et sa réponse sont ajoutées au
+  fichier (JSON lines) avec leur durée ; les secrets (consumerKey,
+  applicationSecret...) sont masqués avec mask_sensitive
+- OVH_REPLAY=fichier : les réponses sont servies depuis le fichier, sans
+  réseau ni credentials. OVH_REPLAY_SPEED règle la vitesse : 1 (défaut)
+  reproduit la latence enregistrée, 2 la divise par deux, 0 répond
+  immédiatement
+
+Une requête est reconnue à sa méthode, son chemin et son corps ; les
+requêtes identiques reçoivent les réponses enregistrées dans l'ordre (la
+dernière est répétée ensuite). Les optimisations (regroupement, cache,
+parallélisme) peuvent ainsi être comparées hors ligne sur un trafic réel.
+
+Utilisation:
+    OVH_RECORD=/tmp/update.jsonl python3 dns_web.py
+    OVH_REPLAY=/tmp/update.jsonl OVH_REPLAY_SPEED=0 python3 dns_web.py
+    python3 api_replay.py show /tmp/update.jsonl
+
+Auteur: Franck DESMEDT
+Date: 2024
+Version: 1.0
+"""
+
+import argparse
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from logger import setup_logger, mask_sensitive
+
+# Configuration du logger
+logger = setup_logger(__name__)
+
+# Champs masqués dans les corps enregistrés
+SENSITIVE_FIELDS = {
+    'applicationKey', 'applicationSecret', 'consumerKey', 'password'
+}
+
+# En-têtes de réponse conservés
+KEPT_HEADERS = ('Content-Type', )
+
+# Clé d'une requête : (méthode, chemin, corps JSON)
+RequestKey = Tuple[str, str, str]
+
+
+class ReplayMiss(LookupError):
+    """Requête absente de l'enregistrement rejoué"""
+
+
+def _body(data: Any) -> str:
+    """Corps tel qu'envoyé par le client OVH"""
+    return json.dumps(data, separators=(',', ':')) if data is not None else ''
+
+
+def mask_fields(value: Any) -> Any:
+    """
+    Masque récursivement les champs sensibles d'un document JSON.
+
+    Args:
+        value (Any): Document décodé
+
+    Returns:
+        Any: Copie avec les valeurs sensibles masquées
+    """
+    if isinstance(value, dict):
+        return {
+            key: mask_sensitive(str(item)) if key in SENSITIVE_FIELDS
+            and item is not None else mask_fields(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [mask_fields(item) for item in value]
+    return value
+
+
+def _mask_text(text: str) -> str:
+    """Masque les champs sensibles d'un corps JSON (texte inchangé sinon)"""
+    try:
+        document = json.loads(text)
+    except ValueError:
+        return text
+    return json.dumps(mask_fields(document), separators=(',', ':'))
+
+
+class APIRecorder:
+    """
+    Enregistre les échanges d'un client OVH dans un fichier JSON lines.
+
+    Attributes:
+        path (str): Fichier d'enregistrement (complété, jamais tronqué)
+        origin (float): Instant de référence (perf_counter)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record(self, method: str, path: str, data: Any, need_auth: bool,
+               response, started: float) -> None:
+        """Ajoute un échange commencé à l'instant perf_counter started"""
+        entry = {
+            'method': method.upper(),
+            'path': path,
+            'body': _mask_text(_body(data)),
+            'need_auth': need_auth,
+            'status': response.status_code,
+            'headers': {
+                name: response.headers[name]
+                for name in KEPT_HEADERS if name in response.headers
+            },
+            'response': _mask_text(response.text),
+            'start': round(started - self.origin, 6),
+            'duration': round(time.perf_counter() - started, 6),
+        }
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+    def install(self, client):
+        """
+        Enregistre les appels réels d'un client (raw_call).
+
+        Args:
+            client: ovh.Client
+
+        Returns:
+            Le même client
+        """
+        raw_call = client.raw_call
+
+        def recorded_raw_call(method, path, data=None, need_auth=True,
+                              headers=None):
+            started = time.perf_counter()
+            response = raw_call(method, path, data, need_auth, headers)
+            self.record(method, path, data, need_auth, response, started)
+            return response
+
+        client.raw_call = recorded_raw_call
+        logger.info(f"Enregistrement des appels OVH dans {self.path}")
+        return client
+
+
+def load(path: str) -> List[Dict]:
+    """
+    Lit un enregistrement.
+
+    Args:
+        path (str): Fichier JSON lines
+
+    Returns:
+        List[Dict]: Échanges, dans l'ordre d'enregistrement
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class APIReplayer:
+    """
+    Sert les réponses d'un enregistrement à la place de l'API.
+
+    Attributes:
+        speed (float): Facteur de vitesse (0 : sans attente)
+        served (int): Réponses servies
+        misses (int): Requêtes absentes de l'enregistrement
+    """
+
+    def __init__(self, entries: List[Dict], speed: float = 1.0):
+        self.speed = speed
+        self.served = 0
+        self.misses = 0
+        self._queues: Dict[RequestKey, Deque[Dict]] = {}
+        self._last: Dict[RequestKey, Dict] = {}
+        self._lock = threading.Lock()
+        for entry in entries:
+            key = (entry['method'], entry['path'], entry['body'])
+            self._queues.setdefault(key, deque()).append(entry)
+
+    def next_entry(self, method: str, path: str, data: Any) -> Dict:
+        """
+        Retourne l'échange enregistré correspondant à une requête.
+
+        Raises:
+            ReplayMiss: Si la requête n'a pas été enregistrée
+        """
+        key = (method.upper(), path, _mask_text(_body(data)))
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue:
+                self._last[key] = queue.popleft()
+            entry = self._last.get(key)
+            if entry is None:
+                self.misses += 1
+                raise ReplayMiss(f"Requête non enregistrée : {method} {path}")
+            self.served += 1
+            return entry
+
+    def respond(self, method: str, path: str, data: Any = None):
+        """
+        Construit la réponse HTTP d'une requête rejouée.
+
+        Returns:
+            requests.Response: Réponse enregistrée
+        """
+        import requests
+        entry = self.next_entry(method, path, data)
+        if self.speed > 0:
+            time.sleep(entry['duration'] / self.speed)
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.headers.update(entry['headers'])
+        response._content = entry['response'].encode('utf-8')
+        response.encoding = 'utf-8'
+        response.url = path
+        return response
+
+    def install(self, client):
+        """
+        Remplace les appels réels d'un client (raw_call) par le rejeu.
+
+        Args:
+            client: ovh.Client
+
+        Returns:
+            Le même client
+        """
+
+        def replayed_raw_call(method, path, data=None, need_auth=True,
+                              headers=None):
+            return self.respond(method, path, data)
+
+        client.raw_call = replayed_raw_call
+        return client
+
+
+def install(client,
+            record: Optional[str] = None,
+            replay: Optional[str] = None,
+            speed: float = 1.0):
+    """
+    Active l'enregistrement ou le rejeu sur un client OVH.
+
+    Args:
+        client: ovh.Client
+        record (str, optional): Fichier d'enregistrement (OVH_RECORD)
+        replay (str, optional): Fichier rejoué (OVH_REPLAY), prioritaire
+        speed (float, optional): Vitesse du rejeu (OVH_REPLAY_SPEED)
+
+    Returns:
+        Le même client
+    """
+    if replay:
+        entries = load(replay)
+        logger.info(f"Rejeu de {len(entries)} appel(s) OVH depuis {replay} "
+                    f"(vitesse {speed or 'maximale'})")
+        return APIReplayer(entries, speed).install(client)
+    if record:
+        return APIRecorder(record).install(client)
+    return client
+
+
+def main():
+    """Point d'entrée : résumé d'un enregistrement"""
+    parser = argparse.ArgumentParser(
+        description="Enregistrement et rejeu des appels OVH")
+    parser.add_argument('command', choices=['show'])
+    parser.add_argument('file', help="Enregistrement (OVH_RECORD=...)")
+    args = parser.parse_args()
+
+    from api_trace import path_template
+    entries = load(args.file)
+    endpoints: Dict[str, List[float]] = {}
+    for entry in entries:
+        key = f"{entry['method']} {path_template(entry['path'])}"
+        endpoints.setdefault(key, []).append(entry['duration'] * 1000)
+    span = max((e['start'] + e['duration'] for e in entries), default=0.0)
+    logger.info(f"{len(entries)} appel(s) enregistré(s) sur {span:.2f} s, "
+                f"{sum(e['duration'] for e in entries) * 1000:.0f} ms d'API")
+    for key, durations in sorted(endpoints.items(),
+                                 key=lambda item: -sum(item[1])):
+        logger.info(f"  {len(durations):4d} x {key} : "
+                    f"moy {sum(durations) / len(durations):.1f} ms, "
+                    f"max {max(durations):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
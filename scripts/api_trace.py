@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Traçage des appels à l'API OVH et rapport de coût par exécution.
+
+Activé par OVH_TRACE, ce module instrumente le client créé par
+Config.get_ovh_client (donc tous les scripts) et enregistre pour chaque
+appel : méthode, modèle de chemin, statut, octets envoyés et reçus, latence.
+En fin d'exécution, il journalise un résumé par endpoint, signale les GET
+identiques répétés sans écriture intermédiaire, et peut exporter la
+chronologie au format Chrome trace (chrome://tracing, Perfetto).
+
+Utilisation:
+    OVH_TRACE=1 python3 dns_web.py                   # Résumé en fin d'exécution
+    OVH_TRACE=/tmp/trace.json python3 dns_web.py     # Résumé et export
+    python3 api_trace.py report /tmp/trace.json      # Résumé d'un export
+
+Auteur: Franck DESMEDT
+Date: 2024
+Version: 1.0
+"""
+
+import argparse
+import atexit
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+
+from logger import setup_logger
+from ovh_cache import invalidation_prefix
+
+# Configuration du logger
+logger = setup_logger(__name__)
+
+# Segments variables remplacés dans les modèles de chemin
+_ZONE_SEGMENT = re.compile(r'^(/domain/zone/)[^/]+')
+_ID_SEGMENT = re.compile(r'/\d+(?=/|$)')
+
+
+def path_template(path: str) -> str:
+    """
+    Calcule le modèle d'un chemin (zone et identifiants anonymisés).
+
+    Args:
+        path (str): Chemin appelé (ex: /domain/zone/a.fr/record/12?subDomain=www)
+
+    Returns:
+        str: Modèle (ex: /domain/zone/{zone}/record/{id}?subDomain)
+    """
+    bare, _, query = path.partition('?')
+    template = _ID_SEGMENT.sub('/{id}', _ZONE_SEGMENT.sub(r'\1{zone}', bare))
+    if query:
+        keys = sorted({item.split('=', 1)[0] for item in query.split('&')})
+        template += '?' + '&'.join(keys)
+    return template
+
+
+@dataclass
+class TraceEvent:
+    """
+    Appel à l'API OVH.
+
+    Attributes:
+        method (str): Méthode HTTP
+        path (str): Chemin complet (avec query string)
+        template (str): Modèle de chemin
+        status (int): Code HTTP (0 si erreur réseau)
+        sent (int): Octets envoyés (corps)
+        received (int): Octets reçus (corps)
+        start (float): Début (secondes depuis le début de la trace)
+        duration (float): Durée (secondes)
+        thread (int): Identifiant du thread appelant
+        source (str): « api » ou « cache » (réponse du démon ovh_cache)
+    """
+    method: str
+    path: str
+    template: str
+    status: int
+    sent: int
+    received: int
+    start: float
+    duration: float
+    thread: int
+    source: str = 'api'
+
+
+class APITracer:
+    """
+    Collecte des appels d'une exécution.
+
+    Attributes:
+        events (List[TraceEvent]): Appels enregistrés, dans l'ordre
+        origin (float): Instant de référence (perf_counter)
+    """
+
+    def __init__(self):
+        self.events: List[TraceEvent] = []
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record(self, method: str, path: str, status: int, sent: int,
+               received: int, started: float, source: str = 'api') -> None:
+        """Enregistre un appel commencé à l'instant perf_counter started"""
+        event = TraceEvent(method.upper(), path, path_template(path), status,
+                           sent, received, started - self.origin,
+                           time.perf_counter() - started,
+                           threading.get_ident(), source)
+        with self._lock:
+            self.events.append(event)
+
+    def summary(self) -> Dict:
+        """
+        Regroupe les appels par endpoint et repère les GET redondants.
+
+        Un GET est redondant s'il répète un GET identique envoyé à OVH
+        sans écriture intermédiaire sur la même collection.
+
+        Returns:
+            Dict: {'calls', 'errors', 'api_ms', 'duration', 'endpoints',
+                'duplicates'}
+        """
+        endpoints: Dict[str, Dict] = {}
+        duplicates: Dict[str, int] = {}
+        seen = set()
+        for event in sorted(self.events, key=lambda e: e.start):
+            key = f"{event.method} {event.template}"
+            stats = endpoints.setdefault(key, {
+                'count': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                'sent': 0, 'received': 0, 'cached': 0
+            })
+            stats['count'] += 1
+            stats['errors'] += not 200 <= event.status < 300
+            stats['total_ms'] += event.duration * 1000
+            stats['max_ms'] = max(stats['max_ms'], event.duration * 1000)
+            stats['sent'] += event.sent
+            stats['received'] += event.received
+            stats['cached'] += event.source == 'cache'
+            if event.method == 'GET':
+                if event.source == 'cache':
+                    continue
+                if event.path in seen:
+                    duplicates[event.path] = duplicates.get(event.path, 0) + 1
+                seen.add(event.path)
+            else:
+                prefix = invalidation_prefix(event.path)
+                seen = {path for path in seen if not path.startswith(prefix)}
+        for stats in endpoints.values():
+            stats['avg_ms'] = stats['total_ms'] / stats['count']
+        end = max((e.start + e.duration for e in self.events), default=0.0)
+        return {
+            'calls': len(self.events),
+            'errors': sum(s['errors'] for s in endpoints.values()),
+            'api_ms': sum(s['total_ms'] for s in endpoints.values()),
+            'duration': end,
+            'endpoints': endpoints,
+            'duplicates': duplicates,
+        }
+
+    def log_summary(self) -> None:
+        """Journalise le résumé de l'exécution"""
+        summary = self.summary()
+        if not summary['calls']:
+            return
+        logger.info(f"Appels OVH : {summary['calls']} "
+                    f"({summary['errors']} erreur(s)), "
+                    f"{summary['api_ms']:.0f} ms cumulés")
+        for key, stats in sorted(summary['endpoints'].items(),
+                                 key=lambda item: -item[1]['total_ms']):
+            cached = f", {stats['cached']} depuis le cache" \
+                if stats['cached'] else ''
+            logger.info(f"  {stats['count']:4d} x {key} : "
+                        f"moy {stats['avg_ms']:.1f} ms, "
+                        f"max {stats['max_ms']:.1f} ms, "
+                        f"{stats['received']} o reçus{cached}")
+        for path, count in summary['duplicates'].items():
+            logger.warning(f"  GET redondant x{count} : {path}")
+
+    def chrome_trace(self) -> Dict:
+        """
+        Exporte la chronologie au format Chrome trace (événements « X »).
+
+        Returns:
+            Dict: Document JSON (le résumé est dans otherData)
+        """
+        pid = os.getpid()
+        return {
+            'traceEvents': [{
+                'name': f"{event.method} {event.template}",
+                'cat': f"ovh,{event.source}",
+                'ph': 'X',
+                'ts': round(event.start * 1e6, 1),
+                'dur': round(event.duration * 1e6, 1),
+                'pid': pid,
+                'tid': event.thread,
+                'args': asdict(event),
+            } for event in self.events],
+            'displayTimeUnit': 'ms',
+            'otherData': self.summary(),
+        }
+
+    def export(self, path: str) -> None:
+        """Écrit la trace Chrome dans un fichier"""
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+        logger.info(f"Trace des appels OVH écrite dans {path}")
+
+
+_tracer: Optional[APITracer] = None
+
+
+def get_tracer(target: Optional[str] = None) -> APITracer:
+    """
+    Retourne le traceur de l'exécution courante.
+
+    Au premier appel, le résumé (et l'export si OVH_TRACE contient un
+    chemin) est programmé pour la fin du processus.
+
+    Args:
+        target (str, optional): Valeur de OVH_TRACE (environnement par défaut)
+    """
+    global _tracer
+    if _tracer is None:
+        _tracer = APITracer()
+        target = target or os.environ.get('OVH_TRACE', '')
+
+        def _report():
+            _tracer.log_summary()
+            if target and target.lower() not in ('1', 'true', 'yes'):
+                _tracer.export(target)
+
+        atexit.register(_report)
+    return _tracer
+
+
+def instrument(client, tracer: Optional[APITracer] = None):
+    """
+    Instrumente un client OVH (ou le client de substitution du cache).
+
+    Les appels réels sont interceptés au niveau de raw_call ; pour le
+    client de substitution, les GET servis par le démon sont aussi
+    enregistrés (source « cache »).
+
+    Args:
+        client: ovh.Client ou ovh_cache.CachedOVHClient
+        tracer (APITracer, optional): Traceur (celui de l'exécution par défaut)
+
+    Returns:
+        Le même client, instrumenté
+    """
+    tracer = tracer or get_tracer()
+    inner = client.__dict__.get('client', client)
+    raw_call = inner.raw_call
+    local = threading.local()
+
+    def traced_raw_call(method, path, data=None, need_auth=True, headers=None):
+        local.direct = True
+        started = time.perf_counter()
+        sent = len(json.dumps(data, separators=(',', ':'))) \
+            if data is not None else 0
+        try:
+            response = raw_call(method, path, data, need_auth, headers)
+        except Exception:
+            tracer.record(method, path, 0, sent, 0, started)
+            raise
+        tracer.record(method, path, response.status_code, sent,
+                      len(response.content), started)
+        return response
+
+    inner.raw_call = traced_raw_call
+
+    if inner is not client:
+        cached_get = client.get
+
+        def traced_get(_target, _need_auth=True, **kwargs):
+            started = time.perf_counter()
+            path = client._target(_target, kwargs)
+            local.direct = False
+            status = 200
+            try:
+                return cached_get(_target, _need_auth, **kwargs)
+            except Exception as e:
+                status = getattr(getattr(e, 'response', None), 'status_code',
+                                 0) or 502
+                raise
+            finally:
+                # Repli direct : l'appel est déjà tracé par raw_call
+                if not local.direct:
+                    tracer.record('GET', path, status, 0, 0, started, 'cache')
+
+        client.get = traced_get
+    return client
+
+
+def main():
+    """Point d'entrée : résumé d'une trace exportée"""
+    parser = argparse.ArgumentParser(
+        description="Rapport des appels OVH d'une trace exportée")
+    parser.add_argument('command', choices=['report'])
+    parser.add_argument('file', help="Fichier de trace (OVH_TRACE=...)")
+    args = parser.parse_args()
+
+    with open(args.file, 'r') as f:
+        document = json.load(f)
+    tracer = APITracer()
+    tracer.origin = 0.0
+    tracer.events = [
+        TraceEvent(**event['args']) for event in document['traceEvents']
+    ]
+    tracer.log_summary()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Serveur HTTP/1.1 asyncio minimal pour les services des scripts.
+
+Ce module fournit juste ce dont les services internes ont besoin
+(interface DNS, endpoints de métriques) sans dépendance externe :
+- routage par (méthode, chemin)
+- connexions persistantes (keep-alive)
+- réponses en flux pour les Server-Sent Events
+- écoute TCP ou socket Unix
+- connexion cliente persistante (sonde de charge du diagnostic réseau)
+
+Auteur: Franck DESMEDT
+Date: 2024
+Version: 1.0
+"""
+
+import asyncio
+import base64
+import json
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+from logger import setup_logger
+
+# Configuration du logger
+logger = setup_logger(__name__)
+
+MAX_HEADER_SIZE = 16 * 1024
+MAX_BODY_SIZE = 1024 * 1024
+KEEP_ALIVE_TIMEOUT = 30.0
+
+
+@dataclass
+class Request:
+    """
+    Requête HTTP décodée.
+
+    Attributes:
+        method (str): Méthode HTTP
+        path (str): Chemin sans la query string
+        query (Dict[str, str]): Paramètres de la query string
+        headers (Dict[str, str]): En-têtes (noms en minuscules)
+        body (bytes): Corps de la requête
+        peer (str): Adresse IP du client (« unix » sur socket Unix)
+    """
+    method: str
+    path: str
+    query: Dict[str, str]
+    headers: Dict[str, str]
+    body: bytes = b''
+    peer: str = ''
+
+    def json(self):
+        """Décode le corps JSON (dictionnaire vide si absent)"""
+        return json.loads(self.body) if self.body else {}
+
+    def basic_auth(self) -> Optional[Tuple[str, str]]:
+        """
+        Décode l'en-tête Authorization: Basic.
+
+        Returns:
+            Optional[Tuple[str, str]]: (utilisateur, mot de passe) ou None
+        """
+        value = self.headers.get('authorization', '')
+        if not value.lower().startswith('basic '):
+            return None
+        try:
+            user, _, password = base64.b64decode(
+                value[6:].strip()).decode('utf-8').partition(':')
+        except (ValueError, UnicodeDecodeError):
+            return None
+        return user, password
+
+
+@dataclass
+class Response:
+    """
+    Réponse HTTP complète.
+
+    Attributes:
+        status (int): Code HTTP
+        body (bytes): Corps
+        content_type (str): Type du contenu
+        headers (Dict[str, str]): En-têtes supplémentaires
+    """
+    status: int = 200
+    body: bytes = b''
+    content_type: str = 'text/plain; charset=utf-8'
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def json(cls, payload, status: int = 200) -> 'Response':
+        """Crée une réponse JSON"""
+        return cls(status, json.dumps(payload).encode('utf-8'),
+                   'application/json')
+
+    @classmethod
+    def text(cls, text: str, status: int = 200) -> 'Response':
+        """Crée une réponse texte"""
+        return cls(status, text.encode('utf-8'))
+
+    def encode(self, keep_alive: bool) -> bytes:
+        """Sérialise la réponse (ligne de statut, en-têtes et corps)"""
+        reason = HTTPStatus(self.status).phrase
+        lines = [
+            f"HTTP/1.1 {self.status} {reason}",
+            f"Content-Type: {self.content_type}",
+            f"Content-Length: {len(self.body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        lines += [f"{name}: {value}" for name, value in self.headers.items()]
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + self.body
+
+
+@dataclass
+class StreamResponse:
+    """
+    Réponse envoyée en flux (Server-Sent Events par défaut).
+
+    Attributes:
+        chunks (AsyncIterator[bytes]): Morceaux à envoyer
+        content_type (str): Type du contenu
+    """
+    chunks: AsyncIterator[bytes]
+    content_type: str = 'text/event-stream'
+
+
+Handler = Callable[[Request], Awaitable[Union[Response, StreamResponse]]]
+
+
+def sse_event(data, event: Optional[str] = None) -> bytes:
+    """
+    Formate un message Server-Sent Events.
+
+    Args:
+        data: Données (sérialisées en JSON si ce n'est pas une chaîne)
+        event (str, optional): Type d'événement
+
+    Returns:
+        bytes: Message prêt à être envoyé
+    """
+    if not isinstance(data, str):
+        data = json.dumps(data)
+    message = f"event: {event}\n" if event else ""
+    message += ''.join(f"data: {line}\n" for line in data.splitlines() or [''])
+    return (message + '\n').encode('utf-8')
+
+
+class AsyncHTTPServer:
+    """
+    Serveur HTTP asyncio avec routage statique.
+
+    Attributes:
+        routes (Dict[Tuple[str, str], Handler]): Traitements par (méthode, chemin)
+    """
+
+    def __init__(self):
+        self.routes: Dict[Tuple[str, str], Handler] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def route(self, method: str, path: str) -> Callable[[Handler], Handler]:
+        """Décorateur d'enregistrement d'un traitement"""
+
+        def _register(handler: Handler) -> Handler:
+            self.routes[(method.upper(), path)] = handler
+            return handler
+
+        return _register
+
+    async def _read_request(self, reader: asyncio.StreamReader,
+                            peer: str) -> Optional[Request]:
+        """Lit une requête ; None si la connexion est fermée"""
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'),
+                                          KEEP_ALIVE_TIMEOUT)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError,
+                ConnectionError):
+            return None
+        except asyncio.LimitOverrunError:
+            raise ValueError("En-têtes trop volumineux")
+        lines = head.decode('latin-1').split('\r\n')
+        method, target, _ = lines[0].split(' ', 2)
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length') or 0)
+        if length > MAX_BODY_SIZE:
+            raise ValueError("Corps trop volumineux")
+        body = await reader.readexactly(length) if length else b''
+        url = urlsplit(target)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        return Request(method.upper(), url.path, query, headers, body, peer)
+
+    async def _handle(self, reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter) -> None:
+        """Traite les requêtes successives d'une connexion"""
+        peername = writer.get_extra_info('peername')
+        peer = peername[0] if isinstance(peername, tuple) else 'unix'
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader, peer)
+                except ValueError as e:
+                    writer.write(Response.text(str(e), 400).encode(False))
+                    break
+                if request is None:
+                    break
+                keep_alive = request.headers.get('connection',
+                                                 '').lower() != 'close'
+                handler = self.routes.get((request.method, request.path))
+                if handler is None:
+                    known = any(path == request.path for _, path in self.routes)
+                    response = Response.text('Not Found', 404) if not known \
+                        else Response.text('Method Not Allowed', 405)
+                else:
+                    try:
+                        response = await handler(request)
+                    except Exception as e:
+                        logger.error(
+                            f"Erreur sur {request.method} {request.path} : {e}")
+                        response = Response.text('Internal Server Error', 500)
+                if isinstance(response, StreamResponse):
+                    await self._stream(writer, response)
+                    break
+                writer.write(response.encode(keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def _stream(self, writer: asyncio.StreamWriter,
+                      response: StreamResponse) -> None:
+        """Envoie une réponse en flux jusqu'à la déconnexion du client"""
+        writer.write((f"HTTP/1.1 200 OK\r\nContent-Type: {response.content_type}"
+                      "\r\nCache-Control: no-cache\r\nConnection: close\r\n\r\n"
+                      ).encode('latin-1'))
+        try:
+            async for chunk in response.chunks:
+                writer.write(chunk)
+                await writer.drain()
+        finally:
+            aclose = getattr(response.chunks, 'aclose', None)
+            if aclose:
+                await aclose()
+
+    async def start(self,
+                    host: str = '127.0.0.1',
+                    port: int = 8080,
+                    unix_path: Optional[str] = None) -> asyncio.AbstractServer:
+        """
+        Démarre l'écoute en TCP ou sur un socket Unix.
+
+        Args:
+            host (str, optional): Adresse d'écoute TCP
+            port (int, optional): Port TCP (0 pour un port libre)
+            unix_path (str, optional): Chemin du socket Unix (prioritaire)
+
+        Returns:
+            asyncio.AbstractServer: Serveur démarré
+        """
+        if unix_path:
+            self._server = await asyncio.start_unix_server(
+                self._handle, unix_path, limit=MAX_HEADER_SIZE)
+        else:
+            self._server = await asyncio.start_server(self._handle,
+                                                      host,
+                                                      port,
+                                                      limit=MAX_HEADER_SIZE,
+                                                      backlog=1024)
+        return self._server
+
+    @property
+    def port(self) -> Optional[int]:
+        """Port TCP effectif (utile avec port=0)"""
+        if self._server and self._server.sockets:
+            address = self._server.sockets[0].getsockname()
+            if isinstance(address, tuple):
+                return address[1]
+        return None
+
+    async def stop(self) -> None:
+        """Arrête l'écoute"""
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+
+class HTTPClientConnection:
+    """
+    Connexion cliente HTTP/1.1 persistante (une requête à la fois).
+
+    La connexion est ouverte à la première requête et réutilisée tant que
+    le serveur l'accepte : pas de « Connection: close », keep-alive
+    explicite pour un serveur HTTP/1.0 et longueur du corps connue. Sinon
+    elle est fermée après la réponse et rouverte à la requête suivante.
+
+    Un serveur peut fermer une connexion inactive au moment où une requête
+    part : si une connexion réutilisée échoue avant le premier octet de
+    réponse, une requête idempotente est renvoyée une fois sur une nouvelle
+    connexion.
+
+    Attributes:
+        host (str): Hôte
+        port (int): Port
+        ssl_context (ssl.SSLContext, optional): Contexte TLS pour https
+        timeout (float): Délai maximal d'une requête (secondes)
+        connects (int): Connexions ouvertes
+        retries (int): Requêtes renvoyées après une connexion périmée
+    """
+
+    # Méthodes renvoyables sans risque (RFC 9110, 9.2.2)
+    IDEMPOTENT = ('GET', 'HEAD', 'OPTIONS', 'TRACE', 'PUT', 'DELETE')
+
+    def __init__(self,
+                 host: str,
+                 port: int,
+                 ssl_context=None,
+                 timeout: float = 10.0):
+        self.host = host
+        self.port = port
+        self.ssl_context = ssl_context
+        self.timeout = timeout
+        self.connects = 0
+        self.retries = 0
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._responded = False
+
+    async def _read_body(self, headers: Dict[str, str]) -> Tuple[bytes, bool]:
+        """Lit le corps ; le booléen indique si sa fin a été délimitée"""
+        reader = self._reader
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if not size:
+                    # En-têtes de fin éventuels, puis ligne vide
+                    while (await reader.readline()) not in (b'\r\n', b''):
+                        pass
+                    return b''.join(chunks), True
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+        if 'content-length' in headers:
+            return await reader.readexactly(int(
+                headers['content-length'])), True
+        # Ni longueur ni découpage : corps jusqu'à la fermeture
+        return await reader.read(), False
+
+    async def _exchange(self, head: bytes, body: bytes,
+                        method: str) -> Tuple[int, bytes, bool]:
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(
+                self.host,
+                self.port,
+                ssl=self.ssl_context,
+                server_hostname=self.host if self.ssl_context else None)
+            self.connects += 1
+        self._writer.write(head + body)
+        await self._writer.drain()
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connexion fermée avant la réponse")
+        self._responded = True
+        version, status = status_line.decode('latin-1').split(' ', 2)[:2]
+        status = int(status)
+        headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b'\r\n', b'\n'):
+                break
+            if not line:
+                raise asyncio.IncompleteReadError(line, None)
+            if b':' in line:
+                name, value = line.decode('latin-1').split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+        if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            data, delimited = b'', True
+        else:
+            data, delimited = await self._read_body(headers)
+        connection = {
+            token.strip().lower()
+            for token in headers.get('connection', '').split(',')
+        }
+        if version.upper() == 'HTTP/1.0':
+            keep_alive = 'keep-alive' in connection
+        else:
+            keep_alive = 'close' not in connection
+        return status, data, keep_alive and delimited
+
+    async def request(self,
+                      method: str,
+                      path: str,
+                      headers: Optional[Dict[str, str]] = None,
+                      body: bytes = b'') -> Tuple[int, bytes]:
+        """
+        Envoie une requête et lit la réponse complète.
+
+        Args:
+            method (str): Méthode HTTP
+            path (str): Chemin (avec la chaîne de requête éventuelle)
+            headers (Dict[str, str], optional): En-têtes supplémentaires
+            body (bytes, optional): Corps
+
+        Returns:
+            Tuple[int, bytes]: (statut, corps)
+
+        Raises:
+            OSError, asyncio.TimeoutError, asyncio.IncompleteReadError: Si
+                l'échange échoue (la connexion est alors fermée)
+        """
+        method = method.upper()
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}",
+                 f"Content-Length: {len(body)}"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        head = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        while True:
+            reused = self._writer is not None
+            self._responded = False
+            try:
+                status, data, keep_alive = await asyncio.wait_for(
+                    self._exchange(head, body, method),
+                    max(0.0, deadline - loop.time()))
+                break
+            except (OSError, asyncio.IncompleteReadError):
+                await self.close()
+                # Connexion périmée : fermée par le serveur pendant l'envoi
+                if reused and not self._responded and \
+                        method in self.IDEMPOTENT:
+                    self.retries += 1
+                    continue
+                raise
+            except BaseException:
+                await self.close()
+                raise
+        if not keep_alive:
+            await self.close()
+        return status, data
+
+    async def close(self) -> None:
+        """Ferme la connexion (rouverte à la prochaine requête)"""
+        writer, self._reader, self._writer = self._writer, None, None
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (OSError, asyncio.CancelledError):
+                pass
@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Suite de benchmarks des scripts DNS contre le simulateur OVH local.
+
+Les scénarios s'exécutent contre mock_ovh_api.py, qui vérifie les
+signatures comme l'API réelle ; la taille de la zone, la latence et le
+taux d'erreurs injectées sont paramétrables :
+- update     : mise à jour de l'enregistrement (dns_web.update_zone_record)
+- bulk_fix   : correction des AAAA d'airquality (check_and_fix_dns)
+- zone_load  : chargement complet de la zone (liste puis détails en parallèle)
+- health     : tests de santé (network_diagnostic) contre le service dns_web
+
+Pour chaque scénario sont relevés le débit, les latences p50/p99, le
+nombre d'appels OVH par opération et les erreurs. Les résultats sont
+comparés à une référence JSON ; une régression fait échouer la commande.
+
+Utilisation:
+    python3 benchmark.py                          # Compare à la référence
+    python3 benchmark.py --update                 # Enregistre la référence
+    python3 benchmark.py --scenarios update zone_load --zone-size 2000
+    python3 benchmark.py --latency 0.02 --error-rate 0.01
+
+Auteur: Franck DESMEDT
+Date: 2024
+Version: 1.0
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import math
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from config import config
+from logger import setup_logger
+
+# Configuration du logger
+logger = setup_logger(__name__)
+
+ZONE = 'bench.example'
+SUBDOMAIN = 'www'
+
+# Cible de l'AAAA supprimé par check_and_fix_dns
+PROBLEMATIC_AAAA = '2001:41d0:301::23'
+
+# Tolérances avant de signaler une régression
+THROUGHPUT_TOLERANCE = 0.20
+P99_TOLERANCE = 0.25
+P99_TOLERANCE_MS = 2.0
+CALLS_TOLERANCE = 0.1
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """
+    Calcule un percentile (rang le plus proche).
+
+    Args:
+        values (List[float]): Mesures
+        fraction (float): Percentile entre 0 et 1 (ex: 0.99)
+
+    Returns:
+        float: Valeur du percentile (0 si aucune mesure)
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+class Scenario:
+    """
+    Scénario mesuré : préparation puis opérations chronométrées.
+
+    Attributes:
+        name (str): Nom du scénario
+        description (str): Description affichée
+        concurrency (int): Opérations exécutées en parallèle
+    """
+
+    name = ''
+    description = ''
+    concurrency = 1
+
+    def __init__(self, server, client, iterations: int, zone_size: int):
+        self.server = server
+        self.client = client
+        self.iterations = iterations
+        self.zone_size = zone_size
+
+    def setup(self) -> None:
+        """Prépare l'état du simulateur (non mesuré)"""
+
+    def operations(self) -> List[Callable[[], bool]]:
+        """Opérations chronométrées individuellement, dans l'ordre"""
+        raise NotImplementedError
+
+    def teardown(self) -> None:
+        """Libère les ressources du scénario"""
+
+
+class UpdateScenario(Scenario):
+    name = 'update'
+    description = "Mise à jour de l'enregistrement (IP différente à chaque fois)"
+
+    def setup(self) -> None:
+        self.record_id = self.server.state.add_record(ZONE, SUBDOMAIN,
+                                                      '10.0.0.1')
+
+    def operations(self) -> List[Callable[[], bool]]:
+        from dns_web import update_zone_record
+
+        def _update(i: int) -> Callable[[], bool]:
+            ip = f"10.1.{i // 250 % 250}.{i % 250 + 2}"
+            return lambda: update_zone_record(self.client, ZONE,
+                                              str(self.record_id), SUBDOMAIN,
+                                              ip)
+
+        return [_update(i) for i in range(self.iterations)]
+
+
+class BulkFixScenario(Scenario):
+    name = 'bulk_fix'
+    description = "Vérification d'airquality et suppression des AAAA"
+
+    # Enregistrements airquality par exécution (moitié à supprimer)
+    RECORDS = 8
+
+    def _seed(self) -> None:
+        for i in range(self.RECORDS // 2):
+            self.server.state.add_record(ZONE, 'airquality', '91.173.110.4')
+            self.server.state.add_record(ZONE, 'airquality',
+                                         f"{PROBLEMATIC_AAAA}:{i:x}", 'AAAA')
+
+    def setup(self) -> None:
+        self._seed()
+
+    def operations(self) -> List[Callable[[], bool]]:
+        from check_and_fix_dns import check_and_fix_airquality_dns
+
+        def _fix() -> bool:
+            with contextlib.redirect_stdout(io.StringIO()):
+                ok = check_and_fix_airquality_dns(self.client)
+            # Les AAAA supprimés sont recréés pour l'itération suivante
+            zone = self.server.state.zones[ZONE]['record']
+            for record_id in [rid for rid, record in zone.items()
+                              if record['subDomain'] == 'airquality']:
+                del zone[record_id]
+            self._seed()
+            return ok
+
+        return [_fix] * self.iterations
+
+
+class ZoneLoadScenario(Scenario):
+    name = 'zone_load'
+    description = "Liste de la zone puis lecture de chaque enregistrement"
+
+    concurrency = 8
+
+    def operations(self) -> List[Callable[[], bool]]:
+
+        def _list() -> bool:
+            return bool(self.client.get(f'/domain/zone/{ZONE}/record'))
+
+        def _read(record_id: int) -> Callable[[], bool]:
+            return lambda: bool(
+                self.client.get(f'/domain/zone/{ZONE}/record/{record_id}'))
+
+        # Chaque itération relit toute la zone (liste puis détails)
+        ids = self.client.get(f'/domain/zone/{ZONE}/record')
+        return ([_list] + [_read(record_id) for record_id in ids]) * \
+            self.iterations
+
+
+class HealthScenario(Scenario):
+    name = 'health'
+    description = "Tests de santé du service dns_web (/health)"
+
+    def setup(self) -> None:
+        from dns_web import DNSWebService
+        record_id = self.server.state.add_record(ZONE, SUBDOMAIN, '10.0.0.1')
+        config.set('OVH_DNS_RECORD_ID', str(record_id))
+        self.service = DNSWebService(self.client, refresh_interval=3600)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever,
+                                       daemon=True)
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self.service.start('127.0.0.1', 0),
+                                         self.loop).result(10)
+
+    def operations(self) -> List[Callable[[], bool]]:
+        root = str(Path(__file__).parent.parent)
+        if root not in sys.path:
+            sys.path.append(root)
+        from network_diagnostic import ServiceDiagnostic
+        diagnostic = ServiceDiagnostic()
+        url = f"http://127.0.0.1:{self.service.server.port}/health"
+        return [lambda: diagnostic.test_service_health(url, max_retries=1,
+                                                       delay=0)
+                ] * self.iterations
+
+    def teardown(self) -> None:
+        asyncio.run_coroutine_threadsafe(self.service.stop(),
+                                         self.loop).result(10)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+SCENARIOS: Dict[str, type] = {
+    scenario.name: scenario
+    for scenario in (UpdateScenario, BulkFixScenario, ZoneLoadScenario,
+                     HealthScenario)
+}
+
+
+def run_scenario(name: str,
+                 iterations: int = 50,
+                 zone_size: int = 200,
+                 latency: float = 0.0,
+                 error_rate: float = 0.0,
+                 seed: int = 0) -> Dict:
+    """
+    Exécute un scénario contre un simulateur dédié.
+
+    Args:
+        name (str): Nom du scénario (voir SCENARIOS)
+        iterations (int, optional): Nombre d'opérations
+        zone_size (int, optional): Enregistrements de la zone simulée
+        latency (float, optional): Latence simulée par appel (s)
+        error_rate (float, optional): Proportion d'erreurs 500 injectées
+        seed (int, optional): Graine de l'injection d'erreurs
+
+    Returns:
+        Dict: {'ops', 'errors', 'duration', 'throughput', 'p50_ms',
+            'p99_ms', 'calls_per_op'}
+    """
+    from mock_ovh_api import MockOVHServer, mock_client
+
+    server = MockOVHServer(latency=latency, error_rate=error_rate,
+                           seed=seed).start()
+    server.state.populate(ZONE, zone_size)
+    # Les journaux des scripts mesurés (erreurs injectées comprises) ne sont
+    # ni affichés ni comptés dans les latences
+    logging.disable(logging.ERROR)
+    try:
+        with tempfile.TemporaryDirectory() as state_dir, config.override(
+                OVH_STATE_DIR=state_dir,
+                OVH_REFRESH_WINDOW='0',
+                OVH_DNS_ZONE=ZONE,
+                OVH_DNS_SUBDOMAIN=SUBDOMAIN):
+            client = mock_client(server.endpoint)
+            client.time_delta  # Synchronisation de l'heure hors mesure
+            scenario = SCENARIOS[name](server, client, iterations, zone_size)
+            scenario.setup()
+            try:
+                operations = scenario.operations()
+                server.state.reset_calls()
+                durations, errors = [], 0
+
+                def _timed(operation: Callable[[], bool]) -> None:
+                    nonlocal errors
+                    started = time.perf_counter()
+                    try:
+                        ok = operation()
+                    except Exception:
+                        ok = False
+                    durations.append(time.perf_counter() - started)
+                    errors += not ok
+
+                started = time.perf_counter()
+                if scenario.concurrency > 1:
+                    with ThreadPoolExecutor(scenario.concurrency) as executor:
+                        list(executor.map(_timed, operations))
+                else:
+                    for operation in operations:
+                        _timed(operation)
+                duration = time.perf_counter() - started
+            finally:
+                scenario.teardown()
+    finally:
+        logging.disable(logging.NOTSET)
+        server.stop()
+
+    ops = len(durations)
+    return {
+        'ops': ops,
+        'errors': errors,
+        'duration': round(duration, 4),
+        'throughput': round(ops / duration, 1) if duration else 0.0,
+        'p50_ms': round(percentile(durations, 0.50) * 1000, 3),
+        'p99_ms': round(percentile(durations, 0.99) * 1000, 3),
+        'calls_per_op': round(len(server.state.calls) / ops, 2) if ops else 0.0,
+    }
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict]) -> List[str]:
+    """
+    Compare les résultats à la référence.
+
+    Args:
+        results (Dict[str, Dict]): Résultats courants par scénario
+        baseline (Dict[str, Dict]): Résultats de référence
+
+    Returns:
+        List[str]: Régressions détectées
+    """
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        if result['throughput'] < reference['throughput'] * (
+                1 - THROUGHPUT_TOLERANCE):
+            regressions.append(
+                f"{name} : débit {result['throughput']:.1f} op/s "
+                f"(référence {reference['throughput']:.1f} op/s)")
+        if result['p99_ms'] > reference['p99_ms'] * (
+                1 + P99_TOLERANCE) + P99_TOLERANCE_MS:
+            regressions.append(f"{name} : p99 {result['p99_ms']:.1f} ms "
+                               f"(référence {reference['p99_ms']:.1f} ms)")
+        if result['calls_per_op'] > reference['calls_per_op'] + CALLS_TOLERANCE:
+            regressions.append(
+                f"{name} : {result['calls_per_op']:.2f} appel(s) OVH par "
+                f"opération (référence {reference['calls_per_op']:.2f})")
+    return regressions
+
+
+def main():
+    """Point d'entrée : exécution, comparaison et mise à jour de la référence"""
+    parser = argparse.ArgumentParser(
+        description="Benchmarks des scripts DNS contre le simulateur OVH")
+    parser.add_argument('--scenarios',
+                        nargs='+',
+                        choices=list(SCENARIOS),
+                        default=list(SCENARIOS))
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--zone-size', type=int, default=200)
+    parser.add_argument('--latency',
+                        type=float,
+                        default=0.0,
+                        help="Latence simulée par appel (secondes)")
+    parser.add_argument('--error-rate',
+                        type=float,
+                        default=0.0,
+                        help="Proportion d'erreurs 500 injectées")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline',
+                        type=Path,
+                        help="Fichier de référence (répertoire d'état par défaut)")
+    parser.add_argument('--update',
+                        action='store_true',
+                        help="Enregistre les résultats comme référence")
+    args = parser.parse_args()
+
+    params = {
+        'iterations': args.iterations,
+        'zone_size': args.zone_size,
+        'latency': args.latency,
+        'error_rate': args.error_rate,
+    }
+    baseline_file = args.baseline or config.get_state_dir() / 'benchmark_baseline.json'
+    try:
+        with open(baseline_file, 'r') as f:
+            document = json.load(f)
+    except (OSError, ValueError):
+        document = {}
+    baseline = document.get('scenarios', {})
+    if baseline and document.get('params') != params:
+        logger.warning("Paramètres différents de la référence "
+                       f"({document.get('params')}) : comparaison ignorée")
+        baseline = {} if not args.update else baseline
+
+    results = {}
+    for name in args.scenarios:
+        results[name] = result = run_scenario(name, args.iterations,
+                                              args.zone_size, args.latency,
+                                              args.error_rate, args.seed)
+        reference = baseline.get(name)
+        delta = f" (réf. {reference['throughput']:.1f} op/s)" \
+            if reference else ''
+        logger.info(f"{name:<10} {result['throughput']:8.1f} op/s, "
+                    f"p50 {result['p50_ms']:7.2f} ms, "
+                    f"p99 {result['p99_ms']:7.2f} ms, "
+                    f"{result['calls_per_op']:.2f} appel(s)/op, "
+                    f"{result['errors']} erreur(s){delta}")
+
+    if args.update:
+        if document.get('params') != params:
+            document = {}
+        document['params'] = params
+        document.setdefault('scenarios', {}).update(results)
+        with open(baseline_file, 'w') as f:
+            json.dump(document, f, indent=2)
+        logger.info(f"Référence enregistrée dans {baseline_file}")
+        return
+
+    regressions = compare(results, baseline)
+    for regression in regressions:
+        logger.error(f"Régression : {regression}")
+    raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
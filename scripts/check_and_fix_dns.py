@@ -4,7 +4,7 @@
 Script pour vérifier et supprimer définitivement l'enregistrement AAAA d'airquality
 """
 
-import ovh
+import argparse
 import os
 import sys
 
@@ -12,28 +12,36 @@ import sys
 script_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(script_dir)
 
+if __name__ == "__main__":
+    # Seulement en point d'entrée : un import ne profile jamais le
+    # processus appelant
+    import profiling
+    profiling.enable_from_argv()
+
 from config import config
 from logger import setup_logger
+from zone_refresh import request_zone_refresh
+from dns_propagation import verify_propagation
 
 # Configuration du logger
 logger = setup_logger('fix_dns')
 
 
-def check_and_fix_airquality_dns():
+def check_and_fix_airquality_dns(client=None, zone=None):
     """
     Vérifie et supprime l'enregistrement AAAA problématique
+
+    Args:
+        client (optional): Client OVH. Par défaut config.get_ovh_client().
+        zone (str, optional): Zone DNS. Par défaut OVH_DNS_ZONE.
     """
     try:
         # Configuration du client OVH
-        client = ovh.Client(
-            endpoint='ovh-eu',
-            application_key=config.get_required('OVH_APPLICATION_KEY'),
-            application_secret=config.get_required('OVH_APPLICATION_SECRET'),
-            consumer_key=config.get_required('OVH_CONSUMER_KEY'))
+        client = client or config.get_ovh_client()
 
-        dns_zone = config.get_required('OVH_DNS_ZONE')
+        dns_zone = zone or config.get_required('OVH_DNS_ZONE')
 
-        print(f"🔍 Vérification DNS pour airquality.iaproject.fr...")
+        print(f"🔍 Vérification DNS pour airquality.{dns_zone}...")
         print("=" * 50)
 
         # Récupération des enregistrements airquality uniquement
@@ -83,16 +91,14 @@ def check_and_fix_airquality_dns():
                     print(f"   ❌ Erreur: {str(e)}")
                     return False
 
-            # Rafraîchissement obligatoire de la zone
+            # Rafraîchissement obligatoire de la zone (regroupé par le coordinateur)
             print(f"\n🔄 Rafraîchissement de la zone DNS...")
-            try:
-                client.post(f'/domain/zone/{dns_zone}/refresh')
-                print(
-                    f"✅ Zone rafraîchie - les changements seront actifs sous 5-10 minutes"
-                )
-            except Exception as e:
-                print(f"❌ Erreur lors du rafraîchissement: {str(e)}")
+            if not request_zone_refresh(client, dns_zone):
+                print(f"❌ Erreur lors du rafraîchissement")
                 return False
+            print(
+                f"✅ Zone rafraîchie - les changements seront actifs sous 5-10 minutes"
+            )
 
             return True
         else:
@@ -105,13 +111,38 @@ def check_and_fix_airquality_dns():
         return False
 
 
-if __name__ == "__main__":
+def main():
+    """Point d'entrée : correction, puis attente de la propagation si --wait"""
+    parser = argparse.ArgumentParser(
+        description="Suppression de l'enregistrement AAAA d'airquality")
+    parser.add_argument('--wait',
+                        action='store_true',
+                        help="Attend la propagation de la suppression")
+    parser.add_argument('--timeout',
+                        type=float,
+                        help="Délai maximal d'attente (s, avec --wait)")
+    args = parser.parse_args()
+
     print("🚀 Vérification et correction DNS airquality...")
 
-    if check_and_fix_airquality_dns():
-        print(f"\n🎉 Opération terminée avec succès!")
-        print(f"⏳ Attendez 5-10 minutes puis testez :")
-        print(f"   nslookup airquality.iaproject.fr")
-        print(f"   curl -I https://airquality.iaproject.fr")
-    else:
+    if not check_and_fix_airquality_dns():
         print(f"\n❌ Échec de l'opération")
+        return
+    print(f"\n🎉 Opération terminée avec succès!")
+    fqdn = f"airquality.{config.get_required('OVH_DNS_ZONE')}"
+    if not args.wait:
+        print(f"⏳ Attendez 5-10 minutes puis testez : curl -I https://{fqdn}")
+        print(f"   (ou suivez la propagation : python3 dns_propagation.py "
+              f"{fqdn} AAAA --absent)")
+        return
+    print(f"⏳ Vérification de la propagation DNS...")
+    kwargs = {'timeout': args.timeout} if args.timeout else {}
+    if verify_propagation(fqdn, 'AAAA', None, **kwargs):
+        print(f"✅ Propagation terminée - testez : curl -I https://{fqdn}")
+    else:
+        print(f"⚠️  Propagation incomplète, relancez : "
+              f"python3 dns_propagation.py {fqdn} AAAA --absent")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lecture des fichiers docker-compose du dépôt.
+
+Ce module extrait des fichiers docker-compose les services déclarés, leurs
+ports publiés (syntaxes courte et longue, plages comprises), leurs réseaux
+et leurs labels. Ces informations servent au diagnostic réseau (ports
+attendus) et à la configuration de Traefik.
+
+Utilisation:
+    python3 compose_config.py                 # Ports publiés
+    python3 compose_config.py --file reverse-proxy/docker-compose.yml
+
+Auteur: Franck DESMEDT
+Date: 2024
+Version: 1.0
+"""
+
+import argparse
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from logger import setup_logger
+
+# Configuration du logger
+logger = setup_logger(__name__)
+
+REPO_DIR = Path(__file__).parent.parent
+
+# Fichiers lus par défaut : services applicatifs et reverse-proxy
+COMPOSE_FILES = [
+    REPO_DIR / 'docker-compose.yml',
+    REPO_DIR / 'reverse-proxy' / 'docker-compose.yml',
+]
+
+
+@dataclass
+class PublishedPort:
+    """Port publié sur l'hôte par un service"""
+    service: str
+    published: int
+    target: int
+    protocol: str = 'tcp'
+    host_ip: Optional[str] = None
+
+
+@dataclass
+class ComposeService:
+    """Service déclaré dans un fichier docker-compose"""
+    name: str
+    file: Path
+    container_name: Optional[str] = None
+    ports: List[PublishedPort] = field(default_factory=list)
+    networks: List[str] = field(default_factory=list)
+    labels: Dict[str, str] = field(default_factory=dict)
+
+
+def _range(text: str) -> List[int]:
+    """« 8000 » ou « 8000-8002 » -> liste des ports"""
+    if '-' in text:
+        first, last = text.split('-', 1)
+        return list(range(int(first), int(last) + 1))
+    return [int(text)]
+
+
+def parse_ports(service: str, entry: Union[str, int,
+                                           Dict]) -> List[PublishedPort]:
+    """
+    Décode une entrée « ports » de docker-compose.
+
+    Syntaxe courte : [ip:]publié[-fin]:cible[-fin][/protocole] ; une cible
+    seule n'est publiée que sur un port éphémère et n'est pas retournée.
+    Syntaxe longue : {target, published, host_ip, protocol}.
+
+    Args:
+        service (str): Nom du service
+        entry (Union[str, int, Dict]): Entrée de la liste « ports »
+
+    Returns:
+        List[PublishedPort]: Ports publiés (plusieurs pour une plage)
+
+    Raises:
+        ValueError: Si l'entrée est mal formée
+    """
+    if isinstance(entry, dict):
+        if entry.get('published') is None:
+            return []
+        published = _range(str(entry['published']))
+        target = _range(str(entry['target']))
+        protocol = entry.get('protocol', 'tcp')
+        host_ip = entry.get('host_ip')
+    else:
+        text, _, protocol = str(entry).partition('/')
+        protocol = protocol or 'tcp'
+        # L'adresse IPv6 éventuelle est entre crochets
+        host_ip = None
+        if text.startswith('['):
+            host_ip, _, text = text[1:].partition(']')
+            text = text.lstrip(':')
+        parts = text.split(':')
+        if len(parts) == 1:
+            return []
+        if len(parts) == 3:
+            host_ip = parts.pop(0) or None
+        published, target = _range(parts[0]), _range(parts[1])
+    if len(target) == 1:
+        target = target * len(published)
+    if len(published) != len(target):
+        raise ValueError(f"Plages de ports incohérentes : {entry}")
+    return [
+        PublishedPort(service, p, t, protocol, host_ip)
+        for p, t in zip(published, target)
+    ]
+
+
+def load_services(path: Optional[Path] = None) -> List[ComposeService]:
+    """
+    Lit les services d'un fichier docker-compose.
+
+    Nécessite PyYAML (importé au premier usage).
+
+    Args:
+        path (Path, optional): Fichier (par défaut docker-compose.yml du dépôt)
+
+    Returns:
+        List[ComposeService]: Services dans l'ordre du fichier
+    """
+    import yaml
+    path = Path(path or COMPOSE_FILES[0])
+    with open(path, 'r', encoding='utf-8') as f:
+        document = yaml.safe_load(f) or {}
+    services = []
+    for name, definition in (document.get('services') or {}).items():
+        definition = definition or {}
+        service = ComposeService(name, path, definition.get('container_name'))
+        for entry in definition.get('ports') or []:
+            try:
+                service.ports.extend(parse_ports(name, entry))
+            except (ValueError, KeyError) as e:
+                logger.warning(f"{path.name} [{name}] : {e}")
+        networks = definition.get('networks') or []
+        service.networks = list(networks)
+        labels = definition.get('labels') or {}
+        if isinstance(labels, list):
+            labels = dict(
+                label.split('=', 1) if '=' in label else (label, '')
+                for label in labels)
+        service.labels = {str(k): str(v) for k, v in labels.items()}
+        services.append(service)
+    return services
+
+
+def published_ports(files: Optional[List[Path]] = None) -> List[PublishedPort]:
+    """
+    Ports publiés par tous les services des fichiers donnés.
+
+    Args:
+        files (List[Path], optional): Fichiers (par défaut COMPOSE_FILES)
+
+    Returns:
+        List[PublishedPort]: Ports publiés
+    """
+    ports = []
+    for path in files or COMPOSE_FILES:
+        if not Path(path).exists():
+            continue
+        for service in load_services(path):
+            ports.extend(service.ports)
+    return ports
+
+
+def main():
+    """Point d'entrée : affiche les ports publiés par les services"""
+    parser = argparse.ArgumentParser(
+        description="Ports publiés par les fichiers docker-compose")
+    parser.add_argument('--file',
+                        type=Path,
+                        action='append',
+                        help="Fichier docker-compose (répétable)")
+    args = parser.parse_args()
+
+    for port in published_ports(args.file):
+        address = f"{port.host_ip}:" if port.host_ip else ''
+        logger.info(f"{port.service} : {address}{port.published} -> "
+                    f"{port.target}/{port.protocol}")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,8 +13,9 @@ Classes:
 
 import os
 import logging
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Optional, List
+from typing import Dict, Iterator, Optional, List
 from logger import setup_logger, mask_sensitive
 
 
@@ -41,8 +42,24 @@ class Config:
         """
         self.logger = setup_logger(__name__)
         self.env_file = env_file or str(Path(__file__).parent.parent / '.env')
-        self._config: Dict[str, str] = {}
-        self._load_config()
+        self._values: Optional[Dict[str, str]] = None
+
+    @property
+    def _config(self) -> Dict[str, str]:
+        """
+        Configurations chargées à la première lecture.
+
+        Le fichier .env n'est pas lu à l'import du module : les commandes qui
+        n'en ont pas besoin (aide, diagnostic réseau) démarrent plus vite.
+        """
+        if self._values is None:
+            self._values = {}
+            try:
+                self._load_config()
+            except Exception:
+                self._values = None
+                raise
+        return self._values
 
     def _load_config(self) -> None:
         """
@@ -60,7 +77,7 @@ class Config:
                     line = line.strip()
                     if line and not line.startswith('#'):
                         key, value = line.split('=', 1)
-                        self._config[key.strip()] = value.strip().strip("'\"")
+                        self._values[key.strip()] = value.strip().strip("'\"")
             self.logger.info("Configuration chargée avec succès")
         except Exception as e:
             self.logger.error(
@@ -90,6 +107,70 @@ class Config:
                 f"Récupération de {key} : {mask_sensitive(value)}")
         return value
 
+    def set(self, key: str, value: str) -> None:
+        """
+        Définit une valeur de configuration pour le processus courant.
+
+        La valeur n'est pas écrite dans le fichier .env.
+
+        Args:
+            key (str): Clé de configuration
+            value (str): Nouvelle valeur
+        """
+        self._config[key] = value
+
+    @contextmanager
+    def override(self, **values: str) -> Iterator[None]:
+        """
+        Remplace des valeurs de configuration le temps d'un bloc.
+
+        Toute la configuration en mémoire est restaurée en sortie, y compris
+        les valeurs définies par set() dans le bloc. Sans fichier .env
+        (tests, mesures contre le simulateur), le bloc part d'une
+        configuration vide.
+
+        Args:
+            **values (str): Valeurs à appliquer dans le bloc
+        """
+        previous = None if self._values is None else dict(self._values)
+        if self._values is None and not os.path.exists(self.env_file):
+            self._values = {}
+        self._config.update(values)
+        try:
+            yield
+        finally:
+            self._values = previous
+
+    def persist(self, key: str, value: str) -> None:
+        """
+        Définit une valeur et l'écrit dans le fichier .env.
+
+        La ligne existante est remplacée (ajoutée sinon) ; le fichier est
+        réécrit de façon atomique en conservant ses permissions.
+
+        Args:
+            key (str): Clé de configuration
+            value (str): Nouvelle valeur
+        """
+        with open(self.env_file, 'r') as f:
+            lines = f.read().splitlines()
+        replaced = False
+        for index, line in enumerate(lines):
+            if line.strip().split('=', 1)[0].strip() == key:
+                lines[index] = f"{key}={value}"
+                replaced = True
+        if not replaced:
+            lines.append(f"{key}={value}")
+        tmp_file = f"{self.env_file}.tmp"
+        # Créé en 0600 : les secrets ne sont jamais lisibles par les autres
+        fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.chmod(tmp_file, os.stat(self.env_file).st_mode & 0o777)
+        os.replace(tmp_file, self.env_file)
+        self._config[key] = value
+        self.logger.info(f"{key} mis à jour dans {self.env_file}")
+
     def get_required(self, key: str) -> str:
         """
         Récupère une valeur de configuration requise.
@@ -134,10 +215,97 @@ class Config:
         self.logger.info("Toutes les variables requises sont présentes")
         return True
 
-    def get_ovh_client(self):
+    def get_float(self, key: str, default: float) -> float:
+        """
+        Récupère une valeur de configuration numérique.
+
+        Args:
+            key (str): Clé de configuration à récupérer
+            default (float): Valeur par défaut si la clé est absente ou invalide
+
+        Returns:
+            float: Valeur convertie en flottant
+        """
+        value = self._config.get(key)
+        if value is None:
+            return default
+        try:
+            return float(value)
+        except ValueError:
+            self.logger.warning(
+                f"Valeur invalide pour {key} : {value}, utilisation de {default}"
+            )
+            return default
+
+    def get_state_dir(self) -> Path:
+        """
+        Retourne le répertoire d'état partagé entre les scripts.
+
+        Ce répertoire contient les fichiers de verrou, d'horodatage et de cache
+        utilisés pour coordonner les différents scripts (cron, ddclient, manuel).
+        Il est défini par OVH_STATE_DIR, par défaut ~/.cache/hebergement.
+
+        Returns:
+            Path: Chemin du répertoire d'état (créé si nécessaire)
+        """
+        state_dir = Path(
+            self._config.get('OVH_STATE_DIR')
+            or os.environ.get('OVH_STATE_DIR')
+            or Path.home() / '.cache' / 'hebergement')
+        state_dir.mkdir(parents=True, exist_ok=True)
+        return state_dir
+
+    def get_zones(self) -> List[Dict[str, Optional[str]]]:
+        """
+        Retourne la liste des zones DNS gérées.
+
+        OVH_DNS_ZONES contient des entrées séparées par des virgules, de la
+        forme zone[:sous-domaine[:identifiant]] (ex:
+        "iaproject.fr:www:1234,exemple.fr:www,autre.fr"). Sans cette
+        variable, la zone unique OVH_DNS_ZONE est utilisée avec
+        OVH_DNS_SUBDOMAIN et OVH_DNS_RECORD_ID.
+
+        Returns:
+            List[Dict[str, Optional[str]]]: {'zone', 'subdomain', 'record_id'}
+                par zone (sous-domaine et identifiant éventuellement None)
+        """
+        entries = self._config.get('OVH_DNS_ZONES')
+        if not entries:
+            zone = self._config.get('OVH_DNS_ZONE')
+            return [{
+                'zone': zone,
+                'subdomain': self._config.get('OVH_DNS_SUBDOMAIN'),
+                'record_id': self._config.get('OVH_DNS_RECORD_ID'),
+            }] if zone else []
+        zones = []
+        for entry in entries.split(','):
+            parts = [part.strip() for part in entry.split(':')]
+            if not parts[0]:
+                continue
+            parts += [None] * (3 - len(parts))
+            zones.append({
+                'zone': parts[0],
+                'subdomain': parts[1] or None,
+                'record_id': parts[2] or None,
+            })
+        return zones
+
+    def get_ovh_client(self, use_cache: bool = True):
         """
         Crée et retourne un client OVH configuré.
 
+        OVH_ENDPOINT peut contenir un nom de région (ovh-eu par défaut) ou
+        une URL (ex: http://127.0.0.1:8899/1.0) ; dans ce cas le client est
+        dirigé vers cette URL, typiquement le simulateur local mock_ovh_api.py.
+
+        Si OVH_CACHE_SOCKET est défini, les lectures passent par le démon de
+        cache partagé (ovh_cache.py). Si OVH_TRACE est défini, les appels
+        sont tracés (api_trace.py). OVH_RECORD enregistre les échanges et
+        OVH_REPLAY les rejoue sans réseau ni credentials (api_replay.py).
+
+        Args:
+            use_cache (bool, optional): Autorise le passage par le cache
+
         Returns:
             ovh.Client: Client OVH initialisé avec les credentials
 
@@ -146,11 +314,35 @@ class Config:
         """
         import ovh
         try:
+            endpoint = self.get('OVH_ENDPOINT', '') or 'ovh-eu'
+            is_url = endpoint.startswith(('http://', 'https://'))
+            record = self.get('OVH_RECORD') or os.environ.get('OVH_RECORD')
+            replay = self.get('OVH_REPLAY') or os.environ.get('OVH_REPLAY')
+            # Le rejeu n'envoie aucune requête : credentials facultatifs
+            credential = (lambda key: self.get(key, 'replay')) \
+                if replay else self.get_required
             client = ovh.Client(
-                endpoint='ovh-eu',
-                application_key=self.get_required('OVH_APPLICATION_KEY'),
-                application_secret=self.get_required('OVH_APPLICATION_SECRET'),
-                consumer_key=self.get_required('OVH_CONSUMER_KEY'))
+                endpoint='ovh-eu' if is_url else endpoint,
+                application_key=credential('OVH_APPLICATION_KEY'),
+                application_secret=credential('OVH_APPLICATION_SECRET'),
+                consumer_key=credential('OVH_CONSUMER_KEY'))
+            if is_url:
+                client._endpoint = endpoint.rstrip('/')
+            if record or replay:
+                from api_replay import install
+                speed = float(
+                    self.get('OVH_REPLAY_SPEED')
+                    or os.environ.get('OVH_REPLAY_SPEED') or 1.0)
+                install(client, record, replay, speed)
+            cache_socket = self.get('OVH_CACHE_SOCKET') or os.environ.get(
+                'OVH_CACHE_SOCKET')
+            if use_cache and cache_socket and not replay:
+                from ovh_cache import CachedOVHClient
+                client = CachedOVHClient(client, cache_socket)
+            trace = self.get('OVH_TRACE') or os.environ.get('OVH_TRACE')
+            if trace:
+                from api_trace import get_tracer, instrument
+                instrument(client, get_tracer(trace))
             self.logger.info("Client OVH configuré avec succès")
             return client
         except Exception as e:
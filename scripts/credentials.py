@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gestion des droits et de l'expiration de la consumer key OVH.
+
+Jusqu'ici, une consumer key expirée ou sans les droits nécessaires n'était
+détectée qu'à l'échec d'un appel, parfois au milieu d'un lot. Ce module :
+- met en cache local les droits (rules) et l'expiration de la consumer key
+  (/auth/currentCredential), pour OVH_CREDENTIAL_CACHE_TTL secondes
+- vérifie hors ligne, avant un lot, que toutes les opérations prévues sont
+  autorisées par les droits en cache
+- prévient à l'approche de l'expiration et, si OVH_CREDENTIAL_ROTATE=true,
+  demande une nouvelle consumer key avec les droits requis ; une fois
+  validée sur le site d'OVH, elle est enregistrée dans le .env
+
+Utilisation:
+    python3 credentials.py status                 # Droits et expiration
+    python3 credentials.py check PUT /domain/zone/iaproject.fr/record/1
+    python3 credentials.py rotate                 # Demande une nouvelle clé
+    python3 credentials.py activate               # Active la clé validée
+
+Configuration (.env):
+    OVH_CREDENTIAL_CACHE_TTL: Durée du cache des droits (défaut: 3600 s)
+    OVH_CREDENTIAL_WARN_DAYS: Alerte avant expiration (défaut: 7 jours)
+    OVH_CREDENTIAL_ROTATE: Demande automatique d'une nouvelle clé (défaut: false)
+
+Auteur: Franck DESMEDT
+Date: 2024
+Version: 1.0
+"""
+
+import argparse
+import fcntl
+import fnmatch
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from config import config
+from logger import setup_logger, mask_sensitive
+
+# Configuration du logger
+logger = setup_logger(__name__)
+
+# Droits demandés pour une nouvelle consumer key (ensemble des scripts)
+REQUIRED_RULES = [
+    {'method': 'GET', 'path': '/auth/*'},
+    {'method': 'GET', 'path': '/domain/zone/*/record'},
+    {'method': 'POST', 'path': '/domain/zone/*/record'},
+    {'method': 'GET', 'path': '/domain/zone/*/record/*'},
+    {'method': 'PUT', 'path': '/domain/zone/*/record/*'},
+    {'method': 'DELETE', 'path': '/domain/zone/*/record/*'},
+    {'method': 'POST', 'path': '/domain/zone/*/refresh'},
+    {'method': 'GET', 'path': '/domain/zone/*/dynHost/record'},
+    {'method': 'GET', 'path': '/domain/zone/*/dynHost/record/*'},
+    {'method': 'PUT', 'path': '/domain/zone/*/dynHost/record/*'},
+]
+
+# Une opération prévue : (méthode, chemin)
+Operation = Tuple[str, str]
+
+
+class CredentialError(Exception):
+    """Consumer key invalide, expirée ou sans les droits nécessaires"""
+
+
+def rule_allows(rule: Dict[str, str], method: str, path: str) -> bool:
+    """
+    Indique si une règle d'accès OVH autorise une opération.
+
+    Comme chez OVH, « * » couvre n'importe quelle suite de caractères,
+    y compris plusieurs segments de chemin.
+
+    Args:
+        rule (Dict[str, str]): Règle {'method', 'path'}
+        method (str): Méthode HTTP
+        path (str): Chemin appelé (la query string est ignorée)
+
+    Returns:
+        bool: True si la règle couvre l'opération
+    """
+    return rule.get('method', '').upper() == method.upper() and \
+        fnmatch.fnmatchcase(path.split('?', 1)[0], rule.get('path', ''))
+
+
+def parse_expiration(value: Optional[str]) -> Optional[float]:
+    """Convertit l'expiration OVH (ISO 8601 ou null) en timestamp"""
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+
+class CredentialManager:
+    """
+    Cache des droits de la consumer key et rotation avant expiration.
+
+    Le cache (credentials.json dans le répertoire d'état) est indexé par une
+    empreinte de la consumer key : la clé elle-même n'y est pas stockée,
+    sauf la clé en attente de validation.
+
+    Attributes:
+        client: Client OVH
+        cache_file (Path): Fichier de cache
+        max_age (float): Durée de validité du cache (secondes)
+        warn_before (float): Délai d'alerte avant expiration (secondes)
+    """
+
+    def __init__(self,
+                 client,
+                 cache_file: Optional[Path] = None,
+                 max_age: Optional[float] = None,
+                 warn_before: Optional[float] = None):
+        self.client = client
+        self.cache_file = Path(cache_file or config.get_state_dir() /
+                               'credentials.json')
+        self.max_age = max_age if max_age is not None else config.get_float(
+            'OVH_CREDENTIAL_CACHE_TTL', 3600)
+        self.warn_before = warn_before if warn_before is not None else \
+            config.get_float('OVH_CREDENTIAL_WARN_DAYS', 7) * 86400
+
+    @property
+    def fingerprint(self) -> str:
+        """Empreinte de la consumer key courante"""
+        consumer_key = getattr(self.client, '_consumer_key', None) or \
+            config.get('OVH_CONSUMER_KEY', '')
+        return hashlib.sha256(consumer_key.encode('utf-8')).hexdigest()[:16]
+
+    @contextmanager
+    def _cache(self) -> Iterator[Dict]:
+        """Verrouille et fournit le cache (réécrit en sortie)"""
+        with open(f"{self.cache_file}.lock", 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(self.cache_file, 'r') as f:
+                    cache = json.load(f)
+            except (OSError, ValueError):
+                cache = {}
+            yield cache
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                              0o600), 'w') as f:
+                json.dump(cache, f, indent=2)
+            os.replace(tmp_file, self.cache_file)
+
+    def details(self, refresh: bool = False) -> Dict:
+        """
+        Retourne les droits et l'expiration de la consumer key.
+
+        Le cache est utilisé tant qu'il a moins de max_age secondes et que
+        la clé n'a pas expiré entre-temps.
+
+        Args:
+            refresh (bool, optional): Ignore le cache
+
+        Returns:
+            Dict: {'status', 'rules', 'expiration', 'fetched_at', ...}
+        """
+        now = time.time()
+        with self._cache() as cache:
+            entry = cache.get('keys', {}).get(self.fingerprint)
+            expires = parse_expiration(entry.get('expiration')) if entry \
+                else None
+            if entry and not refresh and \
+                    now - entry.get('fetched_at', 0) < self.max_age and \
+                    (expires is None or expires > now):
+                return entry
+            credential = self.client.get('/auth/currentCredential')
+            entry = {
+                'credentialId': credential.get('credentialId'),
+                'status': credential.get('status'),
+                'rules': credential.get('rules') or [],
+                'expiration': credential.get('expiration'),
+                'fetched_at': now,
+            }
+            cache.setdefault('keys', {})[self.fingerprint] = entry
+            logger.debug("Droits de la consumer key mis en cache")
+            return entry
+
+    def expires_in(self) -> Optional[float]:
+        """Secondes avant expiration (None si la clé n'expire pas)"""
+        expires = parse_expiration(self.details().get('expiration'))
+        return None if expires is None else expires - time.time()
+
+    def missing(self, operations: Sequence[Operation]) -> List[Operation]:
+        """
+        Liste les opérations non couvertes par les droits en cache.
+
+        Args:
+            operations (Sequence[Operation]): (méthode, chemin) prévus
+
+        Returns:
+            List[Operation]: Opérations refusées
+        """
+        rules = self.details().get('rules', [])
+        return [(method, path) for method, path in operations
+                if not any(rule_allows(rule, method, path) for rule in rules)]
+
+    def require(self, operations: Sequence[Operation] = ()) -> None:
+        """
+        Vérifie avant un lot que la clé est valide et autorise les opérations.
+
+        Prévient (et demande une rotation si configuré) à l'approche de
+        l'expiration.
+
+        Args:
+            operations (Sequence[Operation], optional): (méthode, chemin) prévus
+
+        Raises:
+            CredentialError: Si la clé est invalide, expirée ou sans les droits
+        """
+        # Une clé plus récente est déjà enregistrée : pas de nouvelle demande
+        rotated = self.activate_pending() or getattr(
+            self.client, '_consumer_key', None) not in (
+                None, config.get('OVH_CONSUMER_KEY'))
+        details = self.details()
+        if details.get('status') != 'validated':
+            raise CredentialError(
+                f"Consumer key non utilisable (statut : {details.get('status')})")
+        remaining = self.expires_in()
+        if remaining is not None:
+            if remaining <= 0:
+                raise CredentialError("Consumer key expirée")
+            if remaining < self.warn_before:
+                logger.warning(
+                    f"La consumer key expire dans {remaining / 86400:.1f} jour(s)")
+                if not rotated and str(config.get(
+                        'OVH_CREDENTIAL_ROTATE', 'false')).lower() in ('1', 'true', 'yes'):
+                    self.rotate()
+        refused = self.missing(operations)
+        if refused:
+            raise CredentialError("Droits manquants : " + ', '.join(
+                f"{method} {path}" for method, path in refused))
+
+    def pending(self) -> Optional[Dict]:
+        """Consumer key demandée et en attente de validation"""
+        with self._cache() as cache:
+            return cache.get('pending')
+
+    def rotate(self, rules: Optional[List[Dict[str, str]]] = None) -> Dict:
+        """
+        Demande une nouvelle consumer key avec les droits requis.
+
+        La clé doit être validée sur le site d'OVH ; elle est conservée en
+        attente puis activée par activate_pending(). Une seule demande est
+        faite tant que la précédente n'est pas validée.
+
+        Args:
+            rules (List[Dict[str, str]], optional): Droits (REQUIRED_RULES)
+
+        Returns:
+            Dict: {'consumerKey', 'validationUrl', 'requested_at'}
+        """
+        with self._cache() as cache:
+            if cache.get('pending'):
+                logger.info("Nouvelle consumer key en attente de validation : "
+                            f"{cache['pending']['validationUrl']}")
+                return cache['pending']
+            validation = self.client.post('/auth/credential',
+                                          _need_auth=False,
+                                          accessRules=rules or REQUIRED_RULES,
+                                          redirection=None)
+            cache['pending'] = {
+                'consumerKey': validation['consumerKey'],
+                'validationUrl': validation['validationUrl'],
+                'requested_at': time.time(),
+            }
+        logger.warning("Nouvelle consumer key demandée, à valider sur : "
+                       f"{validation['validationUrl']}")
+        return cache['pending']
+
+    def activate_pending(self) -> bool:
+        """
+        Enregistre dans le .env la consumer key en attente si elle est validée.
+
+        La clé courante reste utilisée jusqu'à la fin du processus.
+
+        Returns:
+            bool: True si une nouvelle clé a été activée
+        """
+        pending = self.pending()
+        if not pending:
+            return False
+        probe = config.get_ovh_client(use_cache=False)
+        probe._consumer_key = pending['consumerKey']
+        try:
+            status = probe.get('/auth/currentCredential').get('status')
+        except Exception as e:
+            logger.debug(f"Clé en attente non vérifiable : {e}")
+            return False
+        if status != 'validated':
+            return False
+        config.persist('OVH_CONSUMER_KEY', pending['consumerKey'])
+        with self._cache() as cache:
+            cache.pop('pending', None)
+        logger.info("Nouvelle consumer key activée : "
+                    f"{mask_sensitive(pending['consumerKey'])}")
+        return True
+
+
+def precheck(client, operations: Sequence[Operation] = ()) -> bool:
+    """
+    Vérifie la consumer key avant un lot d'opérations.
+
+    Si les droits ne peuvent pas être lus (réseau, droit GET /auth/*
+    absent), la vérification est ignorée et les erreurs seront constatées
+    à l'appel, comme auparavant.
+
+    Args:
+        client: Client OVH
+        operations (Sequence[Operation], optional): (méthode, chemin) prévus
+
+    Returns:
+        bool: False si la clé est certainement inutilisable pour ce lot
+    """
+    try:
+        CredentialManager(client).require(operations)
+        return True
+    except CredentialError as e:
+        logger.error(f"{e} - voir generate_consumer_key.py ou "
+                     "« credentials.py rotate »")
+        return False
+    except Exception as e:
+        logger.warning(f"Vérification des droits impossible : {e}")
+        return True
+
+
+def main():
+    """Point d'entrée : état, vérification et rotation de la consumer key"""
+    parser = argparse.ArgumentParser(
+        description="Droits et expiration de la consumer key OVH")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    status = subparsers.add_parser('status', help="Droits et expiration")
+    status.add_argument('--refresh',
+                        action='store_true',
+                        help="Ignore le cache")
+    check = subparsers.add_parser('check',
+                                  help="Vérifie une opération hors ligne")
+    check.add_argument('method')
+    check.add_argument('paths', nargs='+')
+    subparsers.add_parser('rotate', help="Demande une nouvelle consumer key")
+    subparsers.add_parser('activate', help="Active la clé validée")
+    args = parser.parse_args()
+
+    manager = CredentialManager(config.get_ovh_client())
+    if args.command == 'status':
+        details = manager.details(refresh=args.refresh)
+        logger.info(f"Statut : {details['status']}")
+        logger.info(f"Expiration : {details['expiration'] or 'aucune'}")
+        for rule in details['rules']:
+            logger.info(f"- {rule.get('method')} {rule.get('path')}")
+        pending = manager.pending()
+        if pending:
+            logger.info(f"Clé en attente de validation : {pending['validationUrl']}")
+    elif args.command == 'check':
+        refused = manager.missing([(args.method, path) for path in args.paths])
+        for method, path in refused:
+            logger.error(f"Refusé : {method} {path}")
+        raise SystemExit(1 if refused else 0)
+    elif args.command == 'rotate':
+        manager.rotate()
+    elif args.command == 'activate':
+        if not manager.activate_pending():
+            logger.info("Aucune consumer key validée en attente")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,676 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Vérification de la propagation DNS après une mise à jour.
+
+Ce module interroge en parallèle les serveurs de noms faisant autorité pour
+la zone et un ensemble de résolveurs publics, directement en DNS brut
+(UDP, avec repli TCP si la réponse est tronquée), sans appel à nslookup/dig.
+Chaque résolveur est interrogé avec un backoff exponentiel jusqu'à ce qu'il
+renvoie la valeur attendue ou que le délai global expire. Le temps de
+convergence est rapporté pour chaque résolveur.
+
+Un petit serveur DNS local (StubDNSServer) permet d'exercer le vérificateur
+sans réseau.
+
+Utilisation:
+    python3 dns_propagation.py airquality.iaproject.fr A 91.173.110.4
+    python3 dns_propagation.py airquality.iaproject.fr AAAA --absent
+
+Configuration (.env):
+    OVH_DNS_RESOLVERS: Résolveurs à interroger (séparés par des virgules)
+    OVH_PROPAGATION_TIMEOUT: Délai maximal d'attente en secondes
+
+Auteur: Franck DESMEDT
+Date: 2024
+Version: 1.0
+"""
+
+import argparse
+import asyncio
+import ipaddress
+import random
+import struct
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from config import config
+from logger import setup_logger
+
+# Configuration du logger
+logger = setup_logger(__name__)
+
+DEFAULT_RESOLVERS = "1.1.1.1,8.8.8.8,9.9.9.9"
+DEFAULT_TIMEOUT = 600.0
+
+# Types d'enregistrements supportés
+QTYPES = {'A': 1, 'NS': 2, 'CNAME': 5, 'TXT': 16, 'AAAA': 28}
+QTYPE_NAMES = {value: key for key, value in QTYPES.items()}
+
+RCODE_NXDOMAIN = 3
+
+
+class DNSError(Exception):
+    """Erreur de requête ou de décodage DNS"""
+
+
+# =====================================================
+# Encodage / décodage du format DNS
+# =====================================================
+def encode_name(name: str) -> bytes:
+    """
+    Encode un nom de domaine au format DNS (suite de labels).
+
+    Args:
+        name (str): Nom de domaine
+
+    Returns:
+        bytes: Nom encodé
+    """
+    encoded = b''
+    for label in name.rstrip('.').split('.'):
+        if label:
+            raw = label.encode('idna')
+            encoded += bytes([len(raw)]) + raw
+    return encoded + b'\x00'
+
+
+def build_query(name: str, qtype: str, query_id: int) -> bytes:
+    """
+    Construit une requête DNS récursive pour un nom et un type.
+
+    Args:
+        name (str): Nom interrogé
+        qtype (str): Type d'enregistrement (A, AAAA, TXT, NS, CNAME)
+        query_id (int): Identifiant de la requête
+
+    Returns:
+        bytes: Message DNS
+    """
+    header = struct.pack('!HHHHHH', query_id, 0x0100, 1, 0, 0, 0)
+    return header + encode_name(name) + struct.pack('!HH', QTYPES[qtype], 1)
+
+
+def _read_name(data: bytes, offset: int) -> Tuple[str, int]:
+    """Décode un nom (avec compression) et retourne l'offset suivant"""
+    labels = []
+    end = None
+    jumps = 0
+    while True:
+        if offset >= len(data):
+            raise DNSError("Nom tronqué")
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            offset = ((length & 0x3F) << 8) | data[offset + 1]
+            jumps += 1
+            if jumps > 64:
+                raise DNSError("Boucle de compression")
+            continue
+        offset += 1
+        if length == 0:
+            break
+        labels.append(data[offset:offset + length].decode('ascii', 'replace'))
+        offset += length
+    return '.'.join(labels).lower(), end if end is not None else offset
+
+
+def _decode_rdata(data: bytes, offset: int, rtype: int, rdlength: int) -> str:
+    """Décode les données d'un enregistrement en texte"""
+    rdata = data[offset:offset + rdlength]
+    if rtype == QTYPES['A'] and rdlength == 4:
+        return str(ipaddress.IPv4Address(rdata))
+    if rtype == QTYPES['AAAA'] and rdlength == 16:
+        return str(ipaddress.IPv6Address(rdata))
+    if rtype in (QTYPES['NS'], QTYPES['CNAME']):
+        return _read_name(data, offset)[0]
+    if rtype == QTYPES['TXT']:
+        parts = []
+        pos = 0
+        while pos < len(rdata):
+            length = rdata[pos]
+            parts.append(rdata[pos + 1:pos + 1 + length].decode(
+                'utf-8', 'replace'))
+            pos += 1 + length
+        return ''.join(parts)
+    return rdata.hex()
+
+
+@dataclass
+class DNSResponse:
+    """
+    Réponse DNS décodée.
+
+    Attributes:
+        query_id (int): Identifiant de la requête
+        rcode (int): Code de retour (0 = succès, 3 = NXDOMAIN)
+        truncated (bool): Réponse tronquée (bit TC)
+        answers (List[Tuple[str, str, int, str]]): Section réponse
+            (nom, type, ttl, valeur)
+        authority (List[Tuple[str, str, int, str]]): Section autorité
+    """
+    query_id: int
+    rcode: int
+    truncated: bool
+    answers: List[Tuple[str, str, int, str]] = field(default_factory=list)
+    authority: List[Tuple[str, str, int, str]] = field(default_factory=list)
+
+    def values(self, qtype: str) -> Set[str]:
+        """Retourne les valeurs de la section réponse pour un type donné"""
+        return {value for _, rtype, _, value in self.answers if rtype == qtype}
+
+
+def parse_response(data: bytes) -> DNSResponse:
+    """
+    Décode un message de réponse DNS.
+
+    Args:
+        data (bytes): Message reçu
+
+    Returns:
+        DNSResponse: Réponse décodée
+
+    Raises:
+        DNSError: Si le message est mal formé
+    """
+    if len(data) < 12:
+        raise DNSError("Réponse trop courte")
+    query_id, flags, qdcount, ancount, nscount, _ = struct.unpack(
+        '!HHHHHH', data[:12])
+    offset = 12
+    for _ in range(qdcount):
+        _, offset = _read_name(data, offset)
+        offset += 4
+    sections: List[List[Tuple[str, str, int, str]]] = [[], []]
+    for index, count in enumerate((ancount, nscount)):
+        for _ in range(count):
+            name, offset = _read_name(data, offset)
+            if offset + 10 > len(data):
+                raise DNSError("Enregistrement tronqué")
+            rtype, _, ttl, rdlength = struct.unpack('!HHIH',
+                                                    data[offset:offset + 10])
+            offset += 10
+            value = _decode_rdata(data, offset, rtype, rdlength)
+            offset += rdlength
+            sections[index].append(
+                (name, QTYPE_NAMES.get(rtype, str(rtype)), ttl, value))
+    return DNSResponse(query_id=query_id,
+                       rcode=flags & 0x000F,
+                       truncated=bool(flags & 0x0200),
+                       answers=sections[0],
+                       authority=sections[1])
+
+
+# =====================================================
+# Transport UDP / TCP
+# =====================================================
+def parse_server(server: str) -> Tuple[str, int]:
+    """
+    Décode une adresse de serveur « ip », « ip:port » ou « [ipv6]:port ».
+
+    Args:
+        server (str): Adresse du serveur
+
+    Returns:
+        Tuple[str, int]: Hôte et port
+    """
+    if server.startswith('['):
+        host, _, port = server[1:].partition(']:')
+        return host.rstrip(']'), int(port or 53)
+    if server.count(':') == 1:
+        host, port = server.split(':')
+        return host, int(port)
+    return server, 53
+
+
+class _UDPQuery(asyncio.DatagramProtocol):
+    """Protocole UDP attendant la réponse correspondant à un identifiant"""
+
+    def __init__(self, query_id: int, future: asyncio.Future):
+        self.query_id = query_id
+        self.future = future
+
+    def datagram_received(self, data, addr):
+        if len(data) >= 2 and struct.unpack('!H', data[:2])[0] == self.query_id:
+            if not self.future.done():
+                self.future.set_result(data)
+
+    def error_received(self, exc):
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+
+async def _query_tcp(host: str, port: int, message: bytes,
+                     timeout: float) -> bytes:
+    """Envoie une requête DNS sur TCP (préfixe de longueur sur 2 octets)"""
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port),
+                                            timeout)
+    try:
+        writer.write(struct.pack('!H', len(message)) + message)
+        await writer.drain()
+        length = struct.unpack('!H', await asyncio.wait_for(
+            reader.readexactly(2), timeout))[0]
+        return await asyncio.wait_for(reader.readexactly(length), timeout)
+    finally:
+        writer.close()
+
+
+async def query(server: str,
+                name: str,
+                qtype: str = 'A',
+                timeout: float = 2.0) -> DNSResponse:
+    """
+    Interroge un serveur DNS en UDP, avec repli TCP si la réponse est tronquée.
+
+    Args:
+        server (str): Adresse du serveur (ip[:port])
+        name (str): Nom interrogé
+        qtype (str, optional): Type d'enregistrement. Defaults to 'A'.
+        timeout (float, optional): Délai par tentative. Defaults to 2.0.
+
+    Returns:
+        DNSResponse: Réponse décodée
+
+    Raises:
+        DNSError, asyncio.TimeoutError, OSError: En cas d'échec
+    """
+    host, port = parse_server(server)
+    query_id = random.randint(0, 0xFFFF)
+    message = build_query(name, qtype, query_id)
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: _UDPQuery(query_id, future), remote_addr=(host, port))
+    try:
+        transport.sendto(message)
+        data = await asyncio.wait_for(future, timeout)
+    finally:
+        transport.close()
+    response = parse_response(data)
+    if response.truncated:
+        response = parse_response(await _query_tcp(host, port, message,
+                                                   timeout))
+    return response
+
+
+# =====================================================
+# Vérification de la propagation
+# =====================================================
+@dataclass
+class ResolverResult:
+    """
+    Résultat de la vérification pour un résolveur.
+
+    Attributes:
+        server (str): Adresse du résolveur
+        role (str): « authoritative » ou « resolver »
+        converged (bool): La valeur attendue a été observée
+        seconds (Optional[float]): Temps de convergence depuis le début
+        attempts (int): Nombre de requêtes envoyées
+        last_values (Set[str]): Dernières valeurs observées
+        last_error (Optional[str]): Dernière erreur rencontrée
+    """
+    server: str
+    role: str
+    converged: bool = False
+    seconds: Optional[float] = None
+    attempts: int = 0
+    last_values: Set[str] = field(default_factory=set)
+    last_error: Optional[str] = None
+
+
+class PropagationChecker:
+    """
+    Vérifie qu'une modification DNS est visible sur un ensemble de serveurs.
+
+    Attributes:
+        resolvers (List[str]): Résolveurs publics interrogés
+        timeout (float): Délai global d'attente en secondes
+        initial_delay (float): Premier intervalle entre deux requêtes
+        max_delay (float): Intervalle maximal entre deux requêtes
+    """
+
+    def __init__(self,
+                 resolvers: Optional[Sequence[str]] = None,
+                 timeout: Optional[float] = None,
+                 initial_delay: float = 1.0,
+                 max_delay: float = 30.0,
+                 query_timeout: float = 2.0):
+        """
+        Initialise le vérificateur.
+
+        Args:
+            resolvers (Sequence[str], optional): Résolveurs à interroger. Par
+                défaut OVH_DNS_RESOLVERS.
+            timeout (float, optional): Délai global. Par défaut
+                OVH_PROPAGATION_TIMEOUT ou 600 secondes.
+            initial_delay (float, optional): Premier intervalle de backoff.
+            max_delay (float, optional): Intervalle de backoff maximal.
+            query_timeout (float, optional): Délai d'une requête unitaire.
+        """
+        if resolvers is None:
+            resolvers = [
+                r.strip() for r in config.get('OVH_DNS_RESOLVERS',
+                                              DEFAULT_RESOLVERS).split(',')
+                if r.strip()
+            ]
+        self.resolvers = list(resolvers)
+        self.timeout = timeout if timeout is not None else config.get_float(
+            'OVH_PROPAGATION_TIMEOUT', DEFAULT_TIMEOUT)
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.query_timeout = query_timeout
+
+    async def authoritative_servers(self, zone: str) -> List[str]:
+        """
+        Détermine les adresses des serveurs faisant autorité pour la zone.
+
+        Args:
+            zone (str): Nom de la zone DNS
+
+        Returns:
+            List[str]: Adresses IPv4 des serveurs de noms (vide si introuvables)
+        """
+        for resolver in self.resolvers:
+            try:
+                response = await query(resolver, zone, 'NS',
+                                       self.query_timeout)
+            except (DNSError, OSError, asyncio.TimeoutError) as e:
+                logger.debug(f"Requête NS via {resolver} impossible : {e}")
+                continue
+            names = response.values('NS') or {
+                value
+                for _, rtype, _, value in response.authority if rtype == 'NS'
+            }
+            lookups = await asyncio.gather(*[
+                query(resolver, name, 'A', self.query_timeout)
+                for name in sorted(names)
+            ],
+                                           return_exceptions=True)
+            servers = sorted({
+                address
+                for lookup in lookups if isinstance(lookup, DNSResponse)
+                for address in lookup.values('A')
+            })
+            if servers:
+                return servers
+        logger.warning(f"Serveurs faisant autorité introuvables pour {zone}")
+        return []
+
+    async def _watch(self,
+                     result: ResolverResult,
+                     name: str,
+                     qtype: str,
+                     expected: Optional[Set[str]],
+                     started: float,
+                     deadline: float,
+                     require_all: bool = False) -> ResolverResult:
+        """Interroge un serveur avec backoff jusqu'à convergence ou expiration"""
+        delay = self.initial_delay
+        while True:
+            result.attempts += 1
+            try:
+                response = await query(result.server, name, qtype,
+                                       self.query_timeout)
+                result.last_values = response.values(qtype)
+                result.last_error = None
+                if expected is None:
+                    done = not result.last_values
+                elif require_all:
+                    done = expected <= result.last_values
+                else:
+                    done = bool(result.last_values) and result.last_values <= expected
+                if done:
+                    result.converged = True
+                    result.seconds = time.monotonic() - started
+                    return result
+            except (DNSError, OSError, asyncio.TimeoutError) as e:
+                result.last_error = str(e) or e.__class__.__name__
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return result
+            # Backoff exponentiel avec une légère gigue
+            await asyncio.sleep(min(remaining, delay * random.uniform(0.8, 1.2)))
+            delay = min(delay * 2, self.max_delay)
+
+    async def check(self,
+                    name: str,
+                    qtype: str = 'A',
+                    expected: Optional[Sequence[str]] = None,
+                    zone: Optional[str] = None,
+                    require_all: bool = False) -> List[ResolverResult]:
+        """
+        Attend que tous les serveurs renvoient la valeur attendue.
+
+        Args:
+            name (str): Nom complet vérifié (ex: airquality.iaproject.fr)
+            qtype (str, optional): Type d'enregistrement. Defaults to 'A'.
+            expected (Sequence[str], optional): Valeurs attendues. None signifie
+                que l'enregistrement doit avoir disparu.
+            zone (str, optional): Zone dont les serveurs faisant autorité sont
+                interrogés. Si None, seuls les résolveurs sont interrogés.
+            require_all (bool, optional): Toutes les valeurs attendues doivent
+                être présentes, d'autres valeurs pouvant coexister (cas des
+                TXT). Par défaut, les valeurs observées doivent être un
+                sous-ensemble non vide des valeurs attendues.
+
+        Returns:
+            List[ResolverResult]: Résultat par serveur
+        """
+        started = time.monotonic()
+        deadline = started + self.timeout
+        expected_set = ({v if qtype == 'TXT' else v.lower()
+                         for v in expected} if expected else None)
+        servers = [(server, 'authoritative')
+                   for server in (await self.authoritative_servers(zone)
+                                  if zone else [])]
+        servers += [(server, 'resolver') for server in self.resolvers]
+        return list(await asyncio.gather(*[
+            self._watch(ResolverResult(server, role), name, qtype,
+                        expected_set, started, deadline, require_all)
+            for server, role in servers
+        ]))
+
+
+def log_report(results: List[ResolverResult]) -> bool:
+    """
+    Affiche le rapport de convergence.
+
+    Args:
+        results (List[ResolverResult]): Résultats de check()
+
+    Returns:
+        bool: True si tous les serveurs ont convergé
+    """
+    for result in results:
+        if result.converged:
+            logger.info(
+                f"✅ {result.server:<22} {result.role:<14} convergé en "
+                f"{result.seconds:.1f}s ({result.attempts} requête(s))")
+        else:
+            detail = result.last_error or ', '.join(sorted(
+                result.last_values)) or 'aucune réponse'
+            logger.warning(
+                f"❌ {result.server:<22} {result.role:<14} non convergé "
+                f"({result.attempts} requête(s), dernier état : {detail})")
+    return all(result.converged for result in results)
+
+
+def verify_propagation(name: str,
+                       qtype: str = 'A',
+                       expected: Optional[Sequence[str]] = None,
+                       zone: Optional[str] = None,
+                       **kwargs) -> bool:
+    """
+    Vérifie la propagation d'une modification et affiche le rapport.
+
+    Args:
+        name (str): Nom complet vérifié
+        qtype (str, optional): Type d'enregistrement. Defaults to 'A'.
+        expected (Sequence[str], optional): Valeurs attendues (None = absent)
+        zone (str, optional): Zone pour les serveurs faisant autorité. Par
+            défaut OVH_DNS_ZONE.
+        **kwargs: Paramètres transmis à PropagationChecker
+
+    Returns:
+        bool: True si tous les serveurs ont convergé avant l'expiration
+    """
+    zone = zone or config.get('OVH_DNS_ZONE')
+    checker = PropagationChecker(**kwargs)
+    logger.info(
+        f"Vérification de la propagation de {name} {qtype} "
+        f"(délai maximal {checker.timeout:.0f}s)...")
+    results = asyncio.run(checker.check(name, qtype, expected, zone))
+    return log_report(results)
+
+
+# =====================================================
+# Serveur DNS local pour les essais
+# =====================================================
+class StubDNSServer:
+    """
+    Serveur DNS minimal (UDP et TCP) servant des réponses statiques.
+
+    Les enregistrements peuvent être modifiés à chaud pour simuler une
+    propagation progressive.
+
+    Attributes:
+        records (Dict[Tuple[str, str], List[str]]): Valeurs par (nom, type)
+        host (str): Adresse d'écoute
+        port (int): Port d'écoute (attribué au démarrage si 0)
+        queries (int): Nombre de requêtes reçues
+    """
+
+    def __init__(self,
+                 records: Optional[Dict[Tuple[str, str], List[str]]] = None,
+                 host: str = '127.0.0.1',
+                 port: int = 0,
+                 ttl: int = 60):
+        self.records = records if records is not None else {}
+        self.host = host
+        self.port = port
+        self.ttl = ttl
+        self.queries = 0
+        self._transport = None
+        self._server = None
+
+    @property
+    def address(self) -> str:
+        """Adresse « ip:port » utilisable comme résolveur"""
+        return f"{self.host}:{self.port}"
+
+    def answer(self, message: bytes) -> bytes:
+        """
+        Construit la réponse à une requête.
+
+        Args:
+            message (bytes): Requête reçue
+
+        Returns:
+            bytes: Réponse DNS
+        """
+        self.queries += 1
+        query_id = struct.unpack('!H', message[:2])[0]
+        name, offset = _read_name(message, 12)
+        qtype = struct.unpack('!H', message[offset:offset + 2])[0]
+        question = message[12:offset + 4]
+        type_name = QTYPE_NAMES.get(qtype, str(qtype))
+        values = self.records.get((name, type_name), [])
+        known = any(key[0] == name for key in self.records)
+        rcode = 0 if known else RCODE_NXDOMAIN
+        answers = b''
+        for value in values:
+            if type_name == 'A':
+                rdata = ipaddress.IPv4Address(value).packed
+            elif type_name == 'AAAA':
+                rdata = ipaddress.IPv6Address(value).packed
+            elif type_name == 'TXT':
+                raw = value.encode('utf-8')
+                rdata = b''.join(
+                    bytes([len(raw[i:i + 255])]) + raw[i:i + 255]
+                    for i in range(0, max(len(raw), 1), 255))
+            else:
+                rdata = encode_name(value)
+            answers += b'\xc0\x0c' + struct.pack('!HHIH', qtype, 1, self.ttl,
+                                                 len(rdata)) + rdata
+        header = struct.pack('!HHHHHH', query_id, 0x8180 | rcode, 1,
+                             len(values), 0, 0)
+        return header + question + answers
+
+    async def start(self) -> 'StubDNSServer':
+        """Démarre l'écoute UDP et TCP sur le même port"""
+        loop = asyncio.get_running_loop()
+        server = self
+
+        class _Protocol(asyncio.DatagramProtocol):
+
+            def connection_made(self, transport):
+                self.transport = transport
+
+            def datagram_received(self, data, addr):
+                self.transport.sendto(server.answer(data), addr)
+
+        self._transport, _ = await loop.create_datagram_endpoint(
+            _Protocol, local_addr=(self.host, self.port))
+        self.port = self._transport.get_extra_info('sockname')[1]
+
+        async def _handle_tcp(reader, writer):
+            try:
+                length = struct.unpack('!H', await reader.readexactly(2))[0]
+                reply = self.answer(await reader.readexactly(length))
+                writer.write(struct.pack('!H', len(reply)) + reply)
+                await writer.drain()
+            except asyncio.IncompleteReadError:
+                pass
+            finally:
+                writer.close()
+
+        self._server = await asyncio.start_server(_handle_tcp, self.host,
+                                                  self.port)
+        return self
+
+    async def stop(self) -> None:
+        """Arrête le serveur"""
+        if self._transport:
+            self._transport.close()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+
+def main():
+    """Point d'entrée : vérifie la propagation d'un enregistrement"""
+    parser = argparse.ArgumentParser(
+        description="Vérification de la propagation DNS")
+    parser.add_argument('name', help="Nom complet (ex: www.iaproject.fr)")
+    parser.add_argument('qtype',
+                        nargs='?',
+                        default='A',
+                        choices=sorted(QTYPES),
+                        help="Type d'enregistrement")
+    parser.add_argument('expected', nargs='*', help="Valeurs attendues")
+    parser.add_argument('--absent',
+                        action='store_true',
+                        help="L'enregistrement doit avoir disparu")
+    parser.add_argument('--zone', help="Zone (par défaut OVH_DNS_ZONE)")
+    parser.add_argument('--resolver',
+                        action='append',
+                        help="Résolveur à interroger (répétable)")
+    parser.add_argument('--timeout', type=float, help="Délai maximal (s)")
+    args = parser.parse_args()
+
+    if not args.expected and not args.absent:
+        parser.error("Indiquez une valeur attendue ou --absent")
+    ok = verify_propagation(args.name,
+                            args.qtype,
+                            None if args.absent else args.expected,
+                            zone=args.zone,
+                            resolvers=args.resolver,
+                            timeout=args.timeout)
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
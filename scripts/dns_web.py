@@ -9,30 +9,146 @@ dynamiques via l'API OVH. Il permet de :
 - Mettre à jour les enregistrements avec l'IP publique actuelle
 - Rafraîchir la zone DNS
 
+Lancé sans argument, il effectue une mise à jour (usage cron). Avec
+« serve », il démarre un service HTTP asyncio :
+- GET  /api/record   État de l'enregistrement (cache mémoire)
+- POST /api/update   Déclenche une mise à jour
+- GET  /api/history  Historique des mises à jour et changements
+- GET  /api/events   Abonnement aux changements (Server-Sent Events)
+- GET  /nic/update   Endpoint compatible dyndns2 (authentification basique)
+
+L'endpoint dyndns2 permet à la Freebox (ou à tout routeur/ddclient) de
+pousser sa nouvelle IP dès qu'elle change :
+    https://<hôte>/nic/update?hostname=www.iaproject.fr&myip=1.2.3.4
+Les identifiants sont DYNDNS_USER / DYNDNS_PASSWORD (endpoint désactivé
+s'ils sont absents). Une IP identique à l'état en cache répond « nochg »
+sans aucun appel à OVH, si bien que les relances du routeur sont gratuites.
+
+Les lectures sont servies depuis un cache rafraîchi en arrière-plan toutes
+les OVH_WEB_REFRESH_INTERVAL secondes (60 par défaut), jamais depuis OVH.
+
+Utilisation:
+    python3 dns_web.py
+    python3 dns_web.py serve --host 0.0.0.0 --port 8081
+
 Auteur: Franck DESMEDT
 Date: 2024
 Version: 1.0
 """
 
-import sys
-import logging
-import requests
-from logger import setup_logger
+if __name__ == "__main__":
+    # Seulement en point d'entrée : un import ne profile jamais le
+    # processus appelant
+    import profiling
+    profiling.enable_from_argv()
+
+import argparse
+import asyncio
+import hmac
+import ipaddress
+import time
+from collections import deque
+from typing import Dict, Optional, Set
+from logger import setup_logger, mask_sensitive
 from config import config
+from zone_refresh import request_zone_refresh
+from adaptive_ttl import adaptive_ttl, record_ip
+from dynhost import DynHostUpdater
+from credentials import precheck
+from leader import ZoneLease, POLL_INTERVAL
+from async_http import AsyncHTTPServer, Request, Response, StreamResponse, sse_event
 
 # Configuration du logger
 logger = setup_logger(__name__)
 
 
-def update_dns_record():
+def update_zone_record(client,
+                       zone: str,
+                       record_id: str,
+                       subdomain: str,
+                       new_ip: str,
+                       lease: Optional[ZoneLease] = None) -> bool:
+    """
+    Met à jour un enregistrement de zone (GET, PUT puis rafraîchissement).
+
+    L'état obtenu est publié pour les instances suiveuses (leader.py).
+
+    Args:
+        client: Client OVH
+        zone (str): Zone DNS
+        record_id (str): Identifiant de l'enregistrement
+        subdomain (str): Sous-domaine
+        new_ip (str): Nouvelle IP
+        lease (ZoneLease, optional): Bail de la zone détenu par l'appelant
+
+    Returns:
+        bool: True si l'enregistrement est à jour, False sinon
+    """
+    try:
+        # Récupération de l'enregistrement actuel
+        record = client.get(f'/domain/zone/{zone}/record/{record_id}')
+        current_ip = record['target']
+
+        # TTL déduit de l'historique des changements d'IP ; l'IP n'y est
+        # inscrite qu'une fois l'enregistrement écrit
+        name = f"{subdomain}.{zone}"
+        ttl = adaptive_ttl(name, new_ip)
+
+        if current_ip != new_ip or record.get('ttl') != ttl:
+            if current_ip != new_ip:
+                logger.info(
+                    f"Mise à jour nécessaire : IP actuelle {mask_sensitive(current_ip)} -> nouvelle IP {mask_sensitive(new_ip)}"
+                )
+            else:
+                logger.info(
+                    f"Ajustement du TTL : {record.get('ttl')}s -> {ttl}s")
+
+            # Mise à jour de l'enregistrement
+            client.put(f'/domain/zone/{zone}/record/{record_id}',
+                       target=new_ip,
+                       subDomain=subdomain,
+                       ttl=ttl)
+            record_ip(name, new_ip)
+
+            # Demande de rafraîchissement regroupée avec les autres écritures
+            if not request_zone_refresh(client, zone):
+                return False
+            logger.info("Mise à jour DNS effectuée avec succès")
+        else:
+            record_ip(name, new_ip)
+            logger.info("Aucune mise à jour nécessaire : IP inchangée")
+
+        (lease or ZoneLease(zone)).publish(subdomain, {
+            'recordId': str(record_id),
+            'fieldType': record.get('fieldType'),
+            'target': new_ip,
+            'ttl': ttl,
+        })
+        return True
+    except Exception as e:
+        logger.error(f"Erreur lors de la mise à jour DNS : {e}")
+        return False
+
+
+def update_dns_record(client=None, new_ip: Optional[str] = None):
     """
     Met à jour l'enregistrement DNS avec l'IP publique actuelle.
 
     Cette fonction :
     1. Vérifie les variables de configuration requises
     2. Récupère l'IP publique actuelle
-    3. Met à jour l'enregistrement DNS via l'API OVH
-    4. Rafraîchit la zone DNS
+    3. Met à jour le DynHost en un appel si OVH_DNS_UPDATE_MODE=dynhost
+    4. Sinon (ou en cas d'échec), met à jour l'enregistrement de zone et
+       demande le rafraîchissement de la zone au coordinateur
+
+    Une seule instance (le leader de la zone) écrit à la fois ; les autres
+    attendent qu'elle ait publié la même IP, sans appeler OVH.
+
+    Args:
+        client (optional): Client OVH à réutiliser. Par défaut un nouveau
+            client est créé.
+        new_ip (str, optional): IP à publier (ex: poussée par le routeur).
+            Par défaut IP_FREEBOX.
 
     Returns:
         bool: True si la mise à jour a réussi, False sinon
@@ -45,55 +161,398 @@ def update_dns_record():
         required_vars = [
             'OVH_APPLICATION_KEY', 'OVH_APPLICATION_SECRET',
             'OVH_CONSUMER_KEY', 'OVH_DNS_ZONE', 'OVH_DNS_SUBDOMAIN',
-            'OVH_DNS_RECORD_ID', 'IP_FREEBOX'
-        ]
+            'OVH_DNS_RECORD_ID'
+        ] + ([] if new_ip else ['IP_FREEBOX'])
         if not config.check_required_vars(required_vars):
             return False
 
         # Récupération de l'IP publique
         logger.info("Récupération de l'IP publique...")
-        new_ip = config.get_required('IP_FREEBOX')
-        logger.info(f"Nouvelle IP publique : {config.mask_sensitive(new_ip)}")
+        new_ip = new_ip or config.get_required('IP_FREEBOX')
+        logger.info(f"Nouvelle IP publique : {mask_sensitive(new_ip)}")
 
         # Connexion à l'API OVH
         logger.info("Connexion à l'API OVH...")
-        client = config.get_ovh_client()
+        client = client or config.get_ovh_client()
 
         # Mise à jour de l'enregistrement DNS
         zone = config.get_required('OVH_DNS_ZONE')
         record_id = config.get_required('OVH_DNS_RECORD_ID')
         subdomain = config.get_required('OVH_DNS_SUBDOMAIN')
 
-        try:
-            # Récupération de l'enregistrement actuel
-            record = client.get(f'/domain/zone/{zone}/record/{record_id}')
-            current_ip = record['target']
+        lease = ZoneLease(zone)
+        started = time.time()
+        deadline = time.monotonic() + lease.wait
+        while True:
+            with lease.leadership() as leader:
+                if leader:
+                    return update_as_leader(client, lease, record_id,
+                                             subdomain, new_ip)
+            published = lease.published(subdomain)
+            if published.get('target') == new_ip and \
+                    published['publishedAt'] >= started:
+                logger.info(f"IP déjà publiée par {published['owner']}, "
+                            "aucun appel à OVH")
+                return True
+            if time.monotonic() >= deadline:
+                logger.error(f"Leader de {zone} toujours actif après "
+                             f"{lease.wait:.0f}s, mise à jour abandonnée")
+                return False
+            time.sleep(POLL_INTERVAL)
 
-            if current_ip != new_ip:
-                logger.info(
-                    f"Mise à jour nécessaire : IP actuelle {config.mask_sensitive(current_ip)} -> nouvelle IP {config.mask_sensitive(new_ip)}"
-                )
+    except Exception as e:
+        logger.error(f"Erreur lors de la mise à jour : {e}")
+        return False
 
-                # Mise à jour de l'enregistrement
-                client.put(f'/domain/zone/{zone}/record/{record_id}',
-                           target=new_ip,
-                           subDomain=subdomain,
-                           ttl=60)
 
-                # Déclenchement de la mise à jour de la zone
-                client.post(f'/domain/zone/{zone}/refresh')
-                logger.info("Mise à jour DNS effectuée avec succès")
-            else:
-                logger.info("Aucune mise à jour nécessaire : IP inchangée")
+def update_as_leader(client, lease: ZoneLease, record_id: str,
+                      subdomain: str, new_ip: str) -> bool:
+    """
+    Mise à jour effectuée par le leader de la zone, bail tenu.
 
-            return True
-        except Exception as e:
-            logger.error(f"Erreur lors de la mise à jour DNS : {e}")
+    Vérifie les droits du mode utilisé, met à jour le DynHost si
+    OVH_DNS_UPDATE_MODE=dynhost (repli sur l'enregistrement de zone en cas
+    d'échec), sinon l'enregistrement de zone, et publie le résultat sur le
+    bail. Partagée par update_dns_record et multi_zone.py.
+
+    Args:
+        client: Client OVH
+        lease (ZoneLease): Bail de la zone, tenu par l'appelant
+        record_id (str): Identifiant de l'enregistrement de zone
+        subdomain (str): Sous-domaine
+        new_ip (str): IP à publier
+
+    Returns:
+        bool: True si la mise à jour a réussi
+    """
+    zone = lease.zone
+    # Vérification hors ligne des droits du mode utilisé avant toute écriture
+    if config.get('OVH_DNS_UPDATE_MODE', 'record') == 'dynhost':
+        dynhost = DynHostUpdater(client, zone)
+        if not precheck(client, dynhost.operations(subdomain)):
             return False
+        if dynhost.update(subdomain, new_ip):
+            lease.publish(subdomain, {'target': new_ip})
+            return True
+        logger.warning("Repli sur la mise à jour de l'enregistrement de zone")
 
-    except Exception as e:
-        logger.error(f"Erreur lors de la mise à jour : {e}")
+    record_path = f'/domain/zone/{zone}/record/{record_id}'
+    if not precheck(client, [('GET', record_path), ('PUT', record_path),
+                             ('POST', f'/domain/zone/{zone}/refresh')]):
         return False
+    return update_zone_record(client, zone, record_id, subdomain, new_ip,
+                              lease)
+
+
+# =====================================================
+# Service web asyncio
+# =====================================================
+DASHBOARD_HTML = """<!DOCTYPE html>
+<html lang="fr"><head><meta charset="utf-8"><title>DNS OVH</title></head>
+<body><h1>Enregistrement DNS</h1><pre id="record">...</pre>
+<button onclick="fetch('/api/update', {method: 'POST'})">Mettre à jour</button>
+<h2>Événements</h2><pre id="events"></pre>
+<script>
+const events = new EventSource('/api/events');
+events.addEventListener('record', e => {
+  document.getElementById('record').textContent = e.data;
+});
+events.onmessage = e => {
+  document.getElementById('events').textContent = e.data + "\\n" +
+    document.getElementById('events').textContent;
+};
+['update', 'change'].forEach(t => events.addEventListener(t, events.onmessage));
+</script></body></html>
+"""
+
+
+class DNSWebService:
+    """
+    Service HTTP asyncio autour de update_dns_record.
+
+    Attributes:
+        zone (str): Zone DNS
+        subdomain (str): Sous-domaine géré
+        record_id (str): Identifiant de l'enregistrement
+        refresh_interval (float): Période de rafraîchissement du cache
+        history (deque): Derniers événements (mises à jour, changements)
+        server (AsyncHTTPServer): Serveur HTTP
+    """
+
+    def __init__(self,
+                 client=None,
+                 refresh_interval: Optional[float] = None,
+                 history_size: int = 200):
+        """
+        Initialise le service.
+
+        Args:
+            client (optional): Client OVH. Par défaut config.get_ovh_client().
+            refresh_interval (float, optional): Période de rafraîchissement
+                du cache. Par défaut OVH_WEB_REFRESH_INTERVAL ou 60 secondes.
+            history_size (int, optional): Taille de l'historique en mémoire
+        """
+        self.zone = config.get_required('OVH_DNS_ZONE')
+        self.subdomain = config.get_required('OVH_DNS_SUBDOMAIN')
+        self.record_id = config.get_required('OVH_DNS_RECORD_ID')
+        self.refresh_interval = refresh_interval or config.get_float(
+            'OVH_WEB_REFRESH_INTERVAL', 60.0)
+        self.history = deque(maxlen=history_size)
+        self.lease = ZoneLease(self.zone)
+        self.snapshot: Dict = {}
+        self._snapshot_body = b'{}'
+        self._client = client
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._update_lock: Optional[asyncio.Lock] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+        self.server = AsyncHTTPServer()
+        self.server.route('GET', '/')(self.handle_index)
+        self.server.route('GET', '/health')(self.handle_health)
+        self.server.route('GET', '/api/record')(self.handle_record)
+        self.server.route('GET', '/api/history')(self.handle_history)
+        self.server.route('GET', '/api/events')(self.handle_events)
+        self.server.route('POST', '/api/update')(self.handle_update)
+        self.server.route('GET', '/nic/update')(self.handle_nic_update)
+
+    @property
+    def client(self):
+        """Client OVH, créé à la première utilisation"""
+        if self._client is None:
+            self._client = config.get_ovh_client()
+        return self._client
+
+    def _set_snapshot(self, snapshot: Dict) -> None:
+        """Remplace l'état en cache (corps JSON pré-sérialisé)"""
+        self.snapshot = snapshot
+        self._snapshot_body = Response.json(snapshot).body
+
+    def publish(self, event_type: str, payload: Dict) -> None:
+        """
+        Enregistre un événement et le diffuse aux abonnés SSE.
+
+        Les abonnés trop lents (file pleine) sont déconnectés plutôt que de
+        ralentir la diffusion.
+
+        Args:
+            event_type (str): Type d'événement (update, change)
+            payload (Dict): Données de l'événement
+        """
+        entry = {'ts': time.time(), 'type': event_type, **payload}
+        self.history.append(entry)
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(entry)
+            except asyncio.QueueFull:
+                # Abonné trop lent : on vide sa file et on le déconnecte
+                self._subscribers.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def refresh_cache(self) -> None:
+        """
+        Relit l'enregistrement et publie un événement s'il a changé.
+
+        L'état publié par le leader de la zone (leader.py) est utilisé s'il
+        est plus récent que la période de rafraîchissement ; OVH n'est
+        interrogé que sinon.
+        """
+        loop = asyncio.get_running_loop()
+        published = await loop.run_in_executor(None, self.lease.published,
+                                               self.subdomain)
+        if published.get('recordId') == str(self.record_id) and \
+                time.time() - published['publishedAt'] < self.refresh_interval \
+                and published['publishedAt'] >= self.snapshot.get('fetchedAt', 0):
+            record = published
+        else:
+            record = await loop.run_in_executor(
+                None, self.client.get,
+                f'/domain/zone/{self.zone}/record/{self.record_id}')
+        previous = self.snapshot
+        snapshot = {
+            'zone': self.zone,
+            'subDomain': record.get('subDomain', self.subdomain),
+            'recordId': self.record_id,
+            'fieldType': record.get('fieldType'),
+            'target': record.get('target'),
+            'ttl': record.get('ttl'),
+            'fetchedAt': record.get('publishedAt', time.time()),
+        }
+        self._set_snapshot(snapshot)
+        if previous and (previous.get('target'), previous.get('ttl')) != (
+                snapshot['target'], snapshot['ttl']):
+            self.publish(
+                'change', {
+                    'old': {
+                        'target': previous.get('target'),
+                        'ttl': previous.get('ttl')
+                    },
+                    'new': {
+                        'target': snapshot['target'],
+                        'ttl': snapshot['ttl']
+                    }
+                })
+
+    async def _refresh_loop(self) -> None:
+        """Rafraîchit le cache périodiquement"""
+        while True:
+            try:
+                await self.refresh_cache()
+            except Exception as e:
+                logger.error(f"Erreur lors du rafraîchissement du cache : {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    # Routes ------------------------------------------------------------
+
+    async def handle_index(self, request: Request) -> Response:
+        return Response(200, DASHBOARD_HTML.encode('utf-8'),
+                        'text/html; charset=utf-8')
+
+    async def handle_health(self, request: Request) -> Response:
+        return Response.text('ok')
+
+    async def handle_record(self, request: Request) -> Response:
+        return Response(200, self._snapshot_body, 'application/json')
+
+    async def handle_history(self, request: Request) -> Response:
+        limit = int(request.query.get('limit', len(self.history)) or 0)
+        return Response.json(list(self.history)[-limit:] if limit else [])
+
+    async def handle_update(self, request: Request) -> Response:
+        async with self._update_lock:
+            loop = asyncio.get_running_loop()
+            ok = await loop.run_in_executor(None, update_dns_record,
+                                            self.client)
+            self.publish('update', {'ok': ok})
+            try:
+                await self.refresh_cache()
+            except Exception as e:
+                logger.error(f"Erreur lors du rafraîchissement du cache : {e}")
+        return Response.json({'ok': ok, 'record': self.snapshot},
+                             200 if ok else 502)
+
+    def _authorized(self, request: Request) -> bool:
+        """Vérifie l'authentification basique dyndns2 (DYNDNS_USER / DYNDNS_PASSWORD)"""
+        user = config.get('DYNDNS_USER')
+        password = config.get('DYNDNS_PASSWORD')
+        credentials = request.basic_auth()
+        if not user or not password or credentials is None:
+            return False
+        return (hmac.compare_digest(credentials[0], user)
+                and hmac.compare_digest(credentials[1], password))
+
+    async def handle_nic_update(self, request: Request) -> Response:
+        """
+        Endpoint dyndns2 : /nic/update?hostname=...&myip=...
+
+        Réponses (une ligne par nom) : good <ip>, nochg <ip>, badauth,
+        nohost, notfqdn, 911.
+        """
+        if not self._authorized(request):
+            logger.warning(f"dyndns2 : authentification refusée ({request.peer})")
+            return Response(401, b'badauth', headers={
+                'WWW-Authenticate': 'Basic realm="dyndns"'
+            })
+        hostnames = [
+            h.strip().lower().rstrip('.')
+            for h in request.query.get('hostname', '').split(',') if h.strip()
+        ]
+        if not hostnames:
+            return Response.text('notfqdn')
+        # Sans myip, dyndns2 utilise l'adresse source de la requête
+        myip = request.query.get('myip') or request.peer
+        try:
+            myip = str(ipaddress.IPv4Address(myip))
+        except ValueError:
+            return Response.text('911')
+        managed = f"{self.subdomain}.{self.zone}"
+        lines = []
+        for hostname in hostnames:
+            if hostname != managed:
+                lines.append('nohost')
+                continue
+            lines.append(await self._push_ip(myip))
+        return Response.text('\n'.join(lines))
+
+    async def _push_ip(self, ip: str) -> str:
+        """Publie l'IP poussée par le routeur, dédoublonnée contre le cache"""
+        if self.snapshot.get('target') == ip:
+            return f'nochg {ip}'
+        async with self._update_lock:
+            # Une relance concurrente a peut-être déjà publié cette IP
+            if self.snapshot.get('target') == ip:
+                return f'nochg {ip}'
+            loop = asyncio.get_running_loop()
+            ok = await loop.run_in_executor(None, update_dns_record,
+                                            self.client, ip)
+            self.publish('update', {'ok': ok, 'source': 'dyndns2'})
+            if not ok:
+                return '911'
+            snapshot = dict(self.snapshot, target=ip, fetchedAt=time.time())
+            previous = self.snapshot
+            self._set_snapshot(snapshot)
+            self.publish(
+                'change', {
+                    'old': {
+                        'target': previous.get('target'),
+                        'ttl': previous.get('ttl')
+                    },
+                    'new': {
+                        'target': ip,
+                        'ttl': previous.get('ttl')
+                    }
+                })
+        return f'good {ip}'
+
+    async def handle_events(self, request: Request) -> StreamResponse:
+        return StreamResponse(self._event_stream())
+
+    async def _event_stream(self):
+        """Flux SSE : état courant puis événements, avec des keep-alive"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=100)
+        self._subscribers.add(queue)
+        try:
+            yield sse_event(self.snapshot, 'record')
+            while True:
+                try:
+                    entry = await asyncio.wait_for(queue.get(), 15.0)
+                except asyncio.TimeoutError:
+                    yield b': keep-alive\n\n'
+                    continue
+                if entry is None:
+                    break
+                yield sse_event(entry, entry['type'])
+                if entry['type'] == 'change':
+                    yield sse_event(self.snapshot, 'record')
+        finally:
+            self._subscribers.discard(queue)
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8081) -> None:
+        """Démarre le serveur et le rafraîchissement du cache"""
+        self._update_lock = asyncio.Lock()
+        try:
+            await self.refresh_cache()
+        except Exception as e:
+            logger.error(f"Lecture initiale de l'enregistrement impossible : {e}")
+        self._refresh_task = asyncio.create_task(self._refresh_loop())
+        await self.server.start(host, port)
+        logger.info(f"Service DNS à l'écoute sur http://{host}:{self.server.port}")
+
+    async def stop(self) -> None:
+        """Arrête le serveur et le rafraîchissement"""
+        if self._refresh_task:
+            self._refresh_task.cancel()
+        await self.server.stop()
+
+    async def serve_forever(self, host: str = '127.0.0.1',
+                            port: int = 8081) -> None:
+        """Démarre le service et le maintient actif"""
+        await self.start(host, port)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.stop()
 
 
 if __name__ == "__main__":
@@ -102,8 +561,22 @@ if __name__ == "__main__":
 
     Exécute la mise à jour DNS et affiche le résultat.
     """
-    logger.info("Début de la mise à jour DNS")
-    if update_dns_record():
-        logger.info("Mise à jour réussie")
+    parser = argparse.ArgumentParser(
+        description="Mise à jour DNS OVH et service web")
+    subparsers = parser.add_subparsers(dest='command')
+    serve = subparsers.add_parser('serve', help="Démarre le service HTTP")
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8081)
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        try:
+            asyncio.run(DNSWebService().serve_forever(args.host, args.port))
+        except KeyboardInterrupt:
+            logger.info("Arrêt du service DNS")
     else:
-        logger.error("Mise à jour échouée")
+        logger.info("Début de la mise à jour DNS")
+        if update_dns_record():
+            logger.info("Mise à jour réussie")
+        else:
+            logger.error("Mise à jour échouée")
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Mise à jour DNS en un seul appel via les enregistrements DynHost OVH.
+
+La mise à jour classique d'un enregistrement de zone (dns_web.py) coûte
+trois appels signés : GET de l'enregistrement, PUT de la nouvelle cible et
+POST de rafraîchissement de la zone. Un enregistrement DynHost se met à
+jour avec un unique PUT /domain/zone/{zone}/dynHost/record/{id}, sans
+rafraîchissement de zone.
+
+La correspondance sous-domaine -> identifiant DynHost est mise en cache
+localement (dynhost_ids.json dans le répertoire d'état) avec la dernière
+IP écrite : une mise à jour avec une IP inchangée ne coûte aucun appel.
+En cas d'échec (pas de DynHost, droits insuffisants), l'appelant se replie
+sur la mise à jour de l'enregistrement de zone.
+
+Utilisation:
+    python3 dynhost.py bench --updates 50 --latency 0.02
+
+Configuration (.env):
+    OVH_DNS_UPDATE_MODE: « dynhost » pour activer ce mode (« record » par défaut)
+
+Auteur: Franck DESMEDT
+Date: 2024
+Version: 1.0
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import statistics
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config import config
+from logger import setup_logger
+
+# Configuration du logger
+logger = setup_logger(__name__)
+
+
+class DynHostUpdater:
+    """
+    Met à jour les enregistrements DynHost d'une zone.
+
+    Attributes:
+        client: Client OVH
+        zone (str): Nom de la zone DNS
+        cache_file (Path): Cache local des identifiants DynHost
+    """
+
+    def __init__(self, client, zone: str, cache_file: Optional[Path] = None):
+        """
+        Initialise le gestionnaire DynHost.
+
+        Args:
+            client: Client OVH
+            zone (str): Nom de la zone DNS
+            cache_file (Path, optional): Fichier de cache. Par défaut
+                dynhost_ids.json dans le répertoire d'état.
+        """
+        self.client = client
+        self.zone = zone
+        self.cache_file = Path(cache_file
+                               or config.get_state_dir() / 'dynhost_ids.json')
+
+    def _load_cache(self) -> Dict[str, Dict[str, Dict]]:
+        """Lit le cache (vide s'il est absent ou corrompu)"""
+        try:
+            with open(self.cache_file, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _update_cache(self, subdomain: str, entry: Optional[Dict]) -> None:
+        """Met à jour (ou supprime si entry est None) une entrée du cache"""
+        with open(f"{self.cache_file}.lock", 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            cache = self._load_cache()
+            zone_cache = cache.setdefault(self.zone, {})
+            if entry is None:
+                zone_cache.pop(subdomain, None)
+            else:
+                zone_cache[subdomain] = entry
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(cache, f, indent=2)
+            os.replace(tmp_file, self.cache_file)
+
+    def cached(self, subdomain: str) -> Optional[Dict]:
+        """
+        Retourne l'entrée de cache d'un sous-domaine.
+
+        Returns:
+            Optional[Dict]: {'id': ..., 'ip': ...} ou None
+        """
+        return self._load_cache().get(self.zone, {}).get(subdomain)
+
+    def lookup(self, subdomain: str) -> Optional[int]:
+        """
+        Recherche l'identifiant DynHost d'un sous-domaine auprès de l'API.
+
+        Args:
+            subdomain (str): Sous-domaine
+
+        Returns:
+            Optional[int]: Identifiant, ou None si aucun DynHost n'existe
+        """
+        ids = self.client.get(f'/domain/zone/{self.zone}/dynHost/record',
+                              subDomain=subdomain)
+        if not ids:
+            return None
+        self._update_cache(subdomain, {'id': ids[0], 'ip': None})
+        return ids[0]
+
+    def operations(self, subdomain: str) -> List[Tuple[str, str]]:
+        """
+        Opérations (méthode, chemin) d'une mise à jour, pour la vérification
+        des droits de la consumer key (credentials.precheck).
+
+        Args:
+            subdomain (str): Sous-domaine
+
+        Returns:
+            List[Tuple[str, str]]: Recherche de l'identifiant et écriture
+        """
+        entry = self.cached(subdomain)
+        record_id = entry['id'] if entry else '*'
+        base = f'/domain/zone/{self.zone}/dynHost/record'
+        return [('GET', base), ('PUT', f'{base}/{record_id}')]
+
+    def update(self, subdomain: str, ip: str) -> bool:
+        """
+        Met à jour la cible d'un DynHost, en un appel si l'identifiant est connu.
+
+        Args:
+            subdomain (str): Sous-domaine
+            ip (str): Nouvelle IP
+
+        Returns:
+            bool: True si le DynHost est à jour, False si l'appelant doit se
+                replier sur la mise à jour de l'enregistrement de zone
+        """
+        entry = self.cached(subdomain)
+        if entry and entry.get('ip') == ip:
+            logger.info(f"DynHost {subdomain}.{self.zone} déjà à jour")
+            return True
+        from ovh.exceptions import ResourceNotFoundError
+        for attempt in range(2):
+            try:
+                record_id = entry['id'] if entry else self.lookup(subdomain)
+                if record_id is None:
+                    logger.warning(
+                        f"Aucun DynHost pour {subdomain}.{self.zone}")
+                    return False
+                self.client.put(
+                    f'/domain/zone/{self.zone}/dynHost/record/{record_id}',
+                    ip=ip,
+                    subDomain=subdomain)
+                self._update_cache(subdomain, {'id': record_id, 'ip': ip})
+                logger.info(f"DynHost {subdomain}.{self.zone} mis à jour")
+                return True
+            except ResourceNotFoundError as e:
+                # Identifiant obsolète : on invalide le cache et on réessaie une fois
+                if entry and attempt == 0:
+                    self._update_cache(subdomain, None)
+                    entry = None
+                    continue
+                logger.error(f"DynHost introuvable : {e}")
+                return False
+            except Exception as e:
+                logger.error(f"Erreur lors de la mise à jour DynHost : {e}")
+                return False
+        return False
+
+
+# =====================================================
+# Mesure comparative des deux modes de mise à jour
+# =====================================================
+def benchmark(updates: int = 20, latency: float = 0.02) -> Dict[str, Dict]:
+    """
+    Compare les modes « record » et « dynhost » contre le simulateur local.
+
+    Chaque mise à jour change l'IP, afin de mesurer le coût réel d'une
+    écriture (une IP inchangée ne coûte aucun appel en mode DynHost).
+
+    Args:
+        updates (int, optional): Nombre de mises à jour par mode
+        latency (float, optional): Latence simulée par appel (s)
+
+    Returns:
+        Dict[str, Dict]: Appels et latences par mise à jour pour chaque mode
+    """
+    import tempfile
+    from mock_ovh_api import MockOVHServer, mock_client
+    from dns_web import update_zone_record
+
+    zone, subdomain = 'bench.example', 'www'
+    server = MockOVHServer(latency=latency).start()
+    record_id = server.state.add_record(zone, subdomain, '10.0.0.1')
+    server.state.add_record(zone, subdomain, '10.0.0.1', kind='dynHost')
+    results = {}
+    try:
+        # Pas de fenêtre de regroupement : on mesure le coût d'une mise à jour
+        # isolée ; la configuration est restaurée après la mesure
+        with tempfile.TemporaryDirectory() as state_dir, \
+                config.override(OVH_REFRESH_WINDOW='0',
+                                OVH_STATE_DIR=state_dir):
+            client = mock_client(server.endpoint)
+            client.time_delta  # Synchronisation de l'heure hors mesure
+            dynhost = DynHostUpdater(client, zone)
+            modes = {
+                'record':
+                lambda ip: update_zone_record(client, zone, record_id,
+                                              subdomain, ip),
+                'dynhost':
+                lambda ip: dynhost.update(subdomain, ip),
+            }
+            for mode, update in modes.items():
+                server.state.reset_calls()
+                durations = []
+                for i in range(updates):
+                    ip = f"10.0.{i // 250}.{i % 250 + 2}"
+                    started = time.perf_counter()
+                    if not update(ip):
+                        raise RuntimeError(f"Échec de la mise à jour ({mode})")
+                    durations.append(time.perf_counter() - started)
+                results[mode] = {
+                    'calls_per_update': len(server.state.calls) / updates,
+                    'latency_mean_ms': statistics.mean(durations) * 1000,
+                    'latency_max_ms': max(durations) * 1000,
+                }
+    finally:
+        server.stop()
+    return results
+
+
+def main():
+    """Point d'entrée : mesure comparative des modes de mise à jour"""
+    parser = argparse.ArgumentParser(description="Mise à jour DNS via DynHost")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    bench = subparsers.add_parser('bench',
+                                  help="Compare les modes record et dynhost")
+    bench.add_argument('--updates', type=int, default=20)
+    bench.add_argument('--latency', type=float, default=0.02)
+    args = parser.parse_args()
+
+    for mode, result in benchmark(args.updates, args.latency).items():
+        logger.info(f"{mode:<8} : {result['calls_per_update']:.1f} appel(s), "
+                    f"{result['latency_mean_ms']:.1f} ms en moyenne, "
+                    f"{result['latency_max_ms']:.1f} ms au maximum")
+
+
+if __name__ == "__main__":
+    main()
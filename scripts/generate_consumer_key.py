@@ -11,6 +11,7 @@ import ovh
 import json
 from logger import setup_logger
 from config import config
+from credentials import REQUIRED_RULES
 
 # Configuration du logger
 logger = setup_logger(__name__)
@@ -28,25 +29,7 @@ def generate_consumer_key():
             application_secret=config.get_required('OVH_APPLICATION_SECRET'))
 
         # Définition des droits d'accès nécessaires
-        access_rules = [{
-            'method': 'GET',
-            'path': '/domain/zone/*/record/*'
-        }, {
-            'method': 'PUT',
-            'path': '/domain/zone/*/record/*'
-        }, {
-            'method': 'POST',
-            'path': '/domain/zone/*/refresh'
-        }, {
-            'method': 'GET',
-            'path': '/domain/zone/*/record'
-        }, {
-            'method': 'GET',
-            'path': '/domain/zone/*/dynHost/record/*'
-        }, {
-            'method': 'PUT',
-            'path': '/domain/zone/*/dynHost/record/*'
-        }]
+        access_rules = REQUIRED_RULES
 
         # Demande de validation
         validation = client.request_consumerkey(access_rules)
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Historique des tests de santé des services (série temporelle compacte).
+
+Chaque tentative de test de santé (latence, statut HTTP, classe d'erreur)
+est enregistrée telle quelle pendant un jour, puis résumée par minute et
+par heure (nombre, erreurs, min/moyenne/p95/max). Les résumés conservent
+un sketch de latences (latency_sketch.py) : les p95 horaires et ceux d'une
+période quelconque sont calculés en fusionnant les minutes, sans relire
+les mesures brutes.
+
+Le stockage est une base SQLite du répertoire d'état (health.sqlite3),
+indexée par service et par date : une requête sur une période ne lit que
+les lignes de cette période, à la résolution la plus grossière compatible
+avec le pas demandé. Les données expirées sont supprimées au fil des
+enregistrements, ce qui borne la taille du fichier :
+- mesures brutes : 1 jour
+- résumés par minute : 14 jours
+- résumés par heure : 1 an
+
+Utilisation:
+    python3 health_store.py services
+    python3 health_store.py trend http://localhost:8092/health --since 7d --step 6h
+    python3 health_store.py trend http://localhost:8092/health --since 1h --json
+
+Auteur: Franck DESMEDT
+Date: 2024
+Version: 1.0
+"""
+
+import argparse
+import json
+import math
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import config
+from logger import setup_logger
+from latency_sketch import LatencySketch
+
+# Configuration du logger
+logger = setup_logger(__name__)
+
+MINUTE = 60
+HOUR = 3600
+DAY = 86400
+
+# Durées de conservation (secondes)
+RAW_RETENTION = DAY
+MINUTE_RETENTION = 14 * DAY
+HOUR_RETENTION = 365 * DAY
+
+# Nombre de points par défaut d'une tendance
+DEFAULT_POINTS = 48
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS raw (
+    service TEXT NOT NULL,
+    ts REAL NOT NULL,
+    latency REAL,
+    status INTEGER,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS raw_service_ts ON raw (service, ts);
+CREATE TABLE IF NOT EXISTS rollup (
+    resolution INTEGER NOT NULL,
+    service TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    sketch TEXT NOT NULL,
+    PRIMARY KEY (resolution, service, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+"""
+
+
+def _floor(ts: float, step: int) -> int:
+    return int(ts // step * step)
+
+
+def parse_duration(text: str) -> int:
+    """
+    Convertit une durée (« 90 », « 15m », « 6h », « 7d ») en secondes.
+
+    Raises:
+        ValueError: Si la durée est invalide
+    """
+    units = {'s': 1, 'm': MINUTE, 'h': HOUR, 'd': DAY, 'w': 7 * DAY}
+    text = text.strip().lower()
+    if text[-1:] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(float(text))
+
+
+class Bucket:
+    """
+    Agrégat de tests de santé sur un intervalle.
+
+    Attributes:
+        count (int): Tentatives
+        errors (int): Tentatives en échec (connexion, statut différent de 200)
+        sketch (LatencySketch): Latences des réponses reçues (secondes)
+    """
+
+    def __init__(self, count: int = 0, errors: int = 0,
+                 sketch: Optional[LatencySketch] = None):
+        self.count = count
+        self.errors = errors
+        self.sketch = sketch or LatencySketch()
+
+    def merge(self, other: 'Bucket') -> 'Bucket':
+        self.count += other.count
+        self.errors += other.errors
+        self.sketch.merge(other.sketch)
+        return self
+
+    def summary(self) -> Dict:
+        """Résumé : nombre, erreurs, min/avg/p95/max (millisecondes)"""
+        sketch = self.sketch
+
+        def ms(value):
+            return round(value * 1000, 2) if value is not None else None
+
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'min_ms': ms(sketch.min if sketch.count else None),
+            'avg_ms': ms(sketch.mean),
+            'p95_ms': ms(sketch.quantile(0.95)),
+            'max_ms': ms(sketch.max if sketch.count else None),
+        }
+
+
+class HealthStore:
+    """
+    Série temporelle des tests de santé.
+
+    Attributes:
+        path (Path): Fichier SQLite
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or config.get_state_dir() / 'health.sqlite3')
+        # Partagée entre les threads de l'ordonnanceur
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path),
+                                   timeout=10,
+                                   check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(SCHEMA)
+        self._next_compaction = 0.0
+
+    def close(self) -> None:
+        self._db.close()
+
+    def _meta(self, key: str, default: float = 0.0) -> float:
+        row = self._db.execute('SELECT value FROM meta WHERE key = ?',
+                               (key, )).fetchone()
+        return row[0] if row else default
+
+    def record(self,
+               service: str,
+               latency: Optional[float],
+               status: Optional[int] = None,
+               error: Optional[str] = None,
+               ts: Optional[float] = None) -> None:
+        """
+        Enregistre une tentative de test de santé.
+
+        Args:
+            service (str): Service testé (URL)
+            latency (Optional[float]): Durée de la réponse en secondes
+                (None si aucune réponse)
+            status (Optional[int]): Statut HTTP
+            error (Optional[str]): Classe d'erreur (None si le service est sain)
+            ts (Optional[float]): Date de la tentative (par défaut maintenant)
+        """
+        ts = time.time() if ts is None else ts
+        with self._lock, self._db:
+            self._db.execute(
+                'INSERT INTO raw (service, ts, latency, status, error) '
+                'VALUES (?, ?, ?, ?, ?)', (service, ts, latency, status, error))
+        if ts >= self._next_compaction:
+            self.compact(ts)
+            self._next_compaction = _floor(ts, MINUTE) + MINUTE
+
+    def compact(self, now: Optional[float] = None) -> None:
+        """
+        Résume les minutes et heures terminées puis supprime les données expirées.
+
+        Args:
+            now (Optional[float]): Date de référence (par défaut maintenant)
+        """
+        now = time.time() if now is None else now
+        with self._lock, self._db:
+            db = self._db
+            # Minutes terminées depuis le dernier passage
+            rolled = self._meta('rolled_minute')
+            upto = _floor(now, MINUTE)
+            minutes: Dict[Tuple[str, int], Bucket] = {}
+            for service, ts, latency, error in db.execute(
+                    'SELECT service, ts, latency, error FROM raw '
+                    'WHERE ts >= ? AND ts < ?', (rolled, upto)):
+                bucket = minutes.setdefault((service, _floor(ts, MINUTE)),
+                                            Bucket())
+                bucket.count += 1
+                bucket.errors += error is not None
+                if latency is not None:
+                    bucket.sketch.add(latency)
+            self._store(MINUTE, minutes)
+            db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                       ('rolled_minute', upto))
+
+            # Heures terminées, à partir des minutes
+            rolled = self._meta('rolled_hour')
+            upto = _floor(now, HOUR)
+            hours: Dict[Tuple[str, int], Bucket] = {}
+            for service, ts, bucket in self._rollups(MINUTE, None, rolled,
+                                                     upto):
+                hours.setdefault((service, _floor(ts, HOUR)),
+                                 Bucket()).merge(bucket)
+            self._store(HOUR, hours)
+            db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                       ('rolled_hour', upto))
+
+            db.execute('DELETE FROM raw WHERE ts < ?', (now - RAW_RETENTION, ))
+            db.execute('DELETE FROM rollup WHERE resolution = ? AND ts < ?',
+                       (MINUTE, now - MINUTE_RETENTION))
+            db.execute('DELETE FROM rollup WHERE resolution = ? AND ts < ?',
+                       (HOUR, now - HOUR_RETENTION))
+
+    def _store(self, resolution: int, buckets: Dict[Tuple[str, int],
+                                                    Bucket]) -> None:
+        self._db.executemany(
+            'INSERT OR REPLACE INTO rollup VALUES (?, ?, ?, ?, ?, ?)',
+            [(resolution, service, ts, bucket.count, bucket.errors,
+              json.dumps(bucket.sketch.to_dict()))
+             for (service, ts), bucket in buckets.items()])
+
+    def _rollups(self, resolution: int, service: Optional[str], start: float,
+                 end: float) -> Iterable[Tuple[str, int, Bucket]]:
+        query = ('SELECT service, ts, count, errors, sketch FROM rollup '
+                 'WHERE resolution = ? AND ts >= ? AND ts < ?')
+        params = [resolution, start, end]
+        if service is not None:
+            query += ' AND service = ?'
+            params.append(service)
+        for name, ts, count, errors, sketch in self._db.execute(query, params):
+            yield name, ts, Bucket(count, errors,
+                                   LatencySketch.from_dict(json.loads(sketch)))
+
+    def query(self,
+              service: str,
+              start: float,
+              end: Optional[float] = None,
+              step: int = HOUR) -> List[Dict]:
+        """
+        Résume les tests d'un service par intervalles de step secondes.
+
+        Chaque partie de la période est lue dans la table la plus grossière
+        compatible avec le pas (heures, minutes, puis mesures brutes pour
+        la partie non encore résumée) ; au-delà de la conservation d'une
+        résolution, la suivante prend le relais. Les bornes sont arrondies
+        à la résolution des données lues.
+
+        Args:
+            service (str): Service (URL)
+            start (float): Début de la période
+            end (Optional[float]): Fin de la période (par défaut maintenant)
+            step (int, optional): Pas en secondes
+
+        Returns:
+            List[Dict]: {'ts', 'count', 'errors', 'min_ms', 'avg_ms',
+                'p95_ms', 'max_ms'} par intervalle non vide, dans l'ordre
+        """
+        now = time.time()
+        end = now if end is None else end
+        start = _floor(start, step)
+        buckets: Dict[int, Bucket] = {}
+
+        def add(ts: float, bucket: Bucket) -> None:
+            key = _floor(ts, step)
+            if key in buckets:
+                buckets[key].merge(bucket)
+            else:
+                buckets[key] = bucket
+
+        with self._lock:
+            cursor = start
+            rolled_hour = self._meta('rolled_hour')
+            rolled_minute = self._meta('rolled_minute')
+            hour_upto = min(end, rolled_hour if step >= HOUR else min(
+                rolled_hour, now - MINUTE_RETENTION))
+            if hour_upto > cursor:
+                for _, ts, bucket in self._rollups(HOUR, service,
+                                                   _floor(cursor, HOUR),
+                                                   hour_upto):
+                    add(ts, bucket)
+                cursor = hour_upto
+            minute_upto = min(end, rolled_minute if step >= MINUTE else min(
+                rolled_minute, now - RAW_RETENTION))
+            if minute_upto > cursor:
+                for _, ts, bucket in self._rollups(MINUTE, service,
+                                                   _floor(cursor, MINUTE),
+                                                   minute_upto):
+                    add(ts, bucket)
+                cursor = minute_upto
+            for ts, latency, error in self._db.execute(
+                    'SELECT ts, latency, error FROM raw '
+                    'WHERE service = ? AND ts >= ? AND ts < ?',
+                (service, cursor, end)):
+                bucket = Bucket(1, int(error is not None))
+                if latency is not None:
+                    bucket.sketch.add(latency)
+                add(ts, bucket)
+
+        return [dict(ts=ts, **buckets[ts].summary()) for ts in sorted(buckets)]
+
+    def services(self) -> Dict[str, float]:
+        """
+        Services connus et date de leur dernière mesure.
+
+        Returns:
+            Dict[str, float]: Date de la dernière mesure par service
+        """
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT service, MAX(ts) FROM raw GROUP BY service UNION ALL '
+                'SELECT service, MAX(ts) FROM rollup GROUP BY service'
+            ).fetchall()
+        services: Dict[str, float] = {}
+        for service, ts in rows:
+            services[service] = max(services.get(service, 0), ts)
+        return services
+
+
+def sparkline(values: List[Optional[float]]) -> str:
+    """Représentation compacte d'une série (blocs Unicode)"""
+    blocks = '▁▂▃▄▅▆▇█'
+    known = [value for value in values if value is not None]
+    if not known:
+        return ''
+    low, high = min(known), max(known)
+    span = (high - low) or 1
+    return ''.join(' ' if value is None else blocks[min(
+        len(blocks) - 1, int((value - low) / span * len(blocks)))]
+                   for value in values)
+
+
+def main():
+    """Point d'entrée : services mesurés et tendance d'un service"""
+    parser = argparse.ArgumentParser(
+        description="Historique des tests de santé des services")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('services', help="Services mesurés")
+    trend = subparsers.add_parser('trend', help="Tendance d'un service")
+    trend.add_argument('service', help="Service (URL de santé)")
+    trend.add_argument('--since', default='1d', help="Période (ex: 6h, 7d)")
+    trend.add_argument('--step', help="Pas (par défaut période / 48)")
+    trend.add_argument('--json', action='store_true')
+    subparsers.add_parser('compact', help="Résume et purge immédiatement")
+    args = parser.parse_args()
+
+    store = HealthStore()
+    if args.command == 'compact':
+        store.compact()
+        logger.info(f"{store.path} : {store.path.stat().st_size} octets")
+    elif args.command == 'services':
+        for service, ts in sorted(store.services().items()):
+            logger.info(f"{service} : dernière mesure "
+                        f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts))}")
+    else:
+        since = parse_duration(args.since)
+        step = parse_duration(args.step) if args.step else max(
+            MINUTE, math.ceil(since / DEFAULT_POINTS / MINUTE) * MINUTE)
+        points = store.query(args.service, time.time() - since, step=step)
+        if args.json:
+            print(json.dumps(points, indent=2))
+            return
+        if not points:
+            logger.info(f"Aucune mesure pour {args.service}")
+            return
+        logger.info(f"{'période':<17} {'tests':>6} {'échecs':>6} {'min':>8} "
+                    f"{'moy':>8} {'p95':>8} {'max':>8}")
+        for point in points:
+
+            def ms(key):
+                value = point[key]
+                return f"{value:6.1f}ms" if value is not None else f"{'-':>8}"
+
+            logger.info(
+                f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(point['ts']))}"
+                f" {point['count']:6d} {point['errors']:6d} {ms('min_ms')} "
+                f"{ms('avg_ms')} {ms('p95_ms')} {ms('max_ms')}")
+        logger.info(f"p95 : {sparkline([p['p95_ms'] for p in points])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Point d'entrée unique des scripts d'hébergement.
+
+Chaque sous-commande n'importe ses dépendances (ovh, requests, docker...)
+qu'au moment de son exécution : « hebergement --help » ou une commande
+sans appel à OVH démarrent sans charger ces bibliothèques.
+
+Plusieurs sous-commandes peuvent être enchaînées avec « + » ; elles
+partagent alors la configuration et le client OVH (une seule
+synchronisation d'horloge, une seule connexion HTTPS réutilisée).
+L'enchaînement s'arrête à la première commande en échec.
+
+Utilisation:
+    python3 hebergement.py update
+    python3 hebergement.py update --ip 1.2.3.4 + test
+    python3 hebergement.py fix + update
+    python3 hebergement.py diag
+    python3 hebergement.py token
+    python3 hebergement.py serve --port 8081
+    python3 hebergement.py credentials status
+    python3 hebergement.py --profile update
+
+    # Alias conseillé :
+    alias hebergement='python3 /chemin/vers/scripts/hebergement.py'
+
+Auteur: Franck DESMEDT
+Date: 2024
+Version: 1.0
+"""
+
+if __name__ == "__main__":
+    # Seulement en point d'entrée : un import ne profile jamais le
+    # processus appelant
+    import profiling
+    profiling.enable_from_argv()
+
+import argparse
+import importlib
+import sys
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Séparateur des sous-commandes enchaînées
+CHAIN_SEPARATOR = '+'
+
+
+class Context:
+    """
+    État partagé entre les sous-commandes enchaînées.
+
+    Attributes:
+        client: Client OVH, créé au premier usage
+    """
+
+    def __init__(self):
+        self._client = None
+
+    @property
+    def config(self):
+        """Configuration globale (le .env est lu au premier accès)"""
+        from config import config
+        return config
+
+    @property
+    def client(self):
+        """Client OVH partagé"""
+        if self._client is None:
+            self._client = self.config.get_ovh_client()
+        return self._client
+
+
+def _update(args: List[str], context: Context) -> bool:
+    parser = argparse.ArgumentParser(prog='hebergement update',
+                                     description="Mise à jour DNS")
+    parser.add_argument('--ip', help="IP à publier (IP_FREEBOX par défaut)")
+    options = parser.parse_args(args)
+    from dns_web import update_dns_record
+    return update_dns_record(context.client, options.ip)
+
+
+def _fix(args: List[str], context: Context) -> bool:
+    argparse.ArgumentParser(
+        prog='hebergement fix',
+        description="Supprime l'AAAA problématique d'airquality").parse_args(args)
+    from check_and_fix_dns import check_and_fix_airquality_dns
+    return check_and_fix_airquality_dns(context.client)
+
+
+def _test(args: List[str], context: Context) -> bool:
+    argparse.ArgumentParser(
+        prog='hebergement test',
+        description="Teste la configuration et l'API OVH").parse_args(args)
+    from test_dns import test_dns_update
+    return test_dns_update(context.client)
+
+
+def _diag(args: List[str], context: Context) -> bool:
+    root = str(Path(__file__).parent.parent)
+    if root not in sys.path:
+        sys.path.append(root)
+    return _delegate('network_diagnostic')(args, context)
+
+
+def _token(args: List[str], context: Context) -> bool:
+    argparse.ArgumentParser(
+        prog='hebergement token',
+        description="Demande une nouvelle consumer key").parse_args(args)
+    from generate_consumer_key import generate_consumer_key
+    return bool(generate_consumer_key())
+
+
+def _serve(args: List[str], context: Context) -> bool:
+    parser = argparse.ArgumentParser(prog='hebergement serve',
+                                     description="Service web DNS")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    options = parser.parse_args(args)
+    import asyncio
+    from dns_web import DNSWebService
+    try:
+        asyncio.run(
+            DNSWebService(context.client).serve_forever(options.host,
+                                                        options.port))
+    except KeyboardInterrupt:
+        pass
+    return True
+
+
+def _delegate(module: str) -> Callable[[List[str], Context], bool]:
+    """Sous-commande déléguée au main() d'un module (arguments inchangés)"""
+
+    def _run(args: List[str], context: Context) -> bool:
+        argv = sys.argv
+        sys.argv = [f"hebergement {module}"] + args
+        try:
+            importlib.import_module(module).main()
+            return True
+        except SystemExit as e:
+            return not e.code
+        finally:
+            sys.argv = argv
+
+    return _run
+
+
+# Sous-commandes : nom -> (description, traitement)
+COMMANDS: Dict[str, Tuple[str, Callable[[List[str], Context], bool]]] = {
+    'update': ("Met à jour l'enregistrement DNS", _update),
+    'fix': ("Supprime l'AAAA problématique d'airquality", _fix),
+    'test': ("Teste la configuration et l'API OVH", _test),
+    'diag': ("Diagnostic réseau des services", _diag),
+    'token': ("Demande une nouvelle consumer key", _token),
+    'serve': ("Service web DNS et endpoint dyndns2", _serve),
+    'credentials': ("Droits et expiration de la consumer key",
+                    _delegate('credentials')),
+    'refresh': ("Rafraîchissement groupé de la zone", _delegate('zone_refresh')),
+    'propagation': ("Vérification de la propagation DNS",
+                    _delegate('dns_propagation')),
+    'acme': ("Challenges ACME DNS-01 groupés", _delegate('acme_dns01')),
+    'health': ("Historique des tests de santé", _delegate('health_store')),
+    'routes': ("Configuration dynamique Traefik par service",
+               _delegate('traefik_generate')),
+    'weights': ("Poids des réplicas selon leur latence",
+                _delegate('traefik_weights')),
+    'logs': ("Latences du journal d'accès Traefik", _delegate('traefik_logs')),
+    'scheduler': ("Ordonnanceur résident des tâches", _delegate('scheduler')),
+    'zones': ("Opérations sur plusieurs zones", _delegate('multi_zone')),
+    'leader': ("Bail de leader des mises à jour", _delegate('leader')),
+    'cache': ("Cache partagé des lectures OVH", _delegate('ovh_cache')),
+    'hosts': ("Hôtes publiés par Traefik", _delegate('traefik_config')),
+    'replay': ("Enregistrements des appels OVH", _delegate('api_replay')),
+    'bench': ("Benchmarks contre le simulateur OVH", _delegate('benchmark')),
+    'bench-imports': ("Temps de démarrage des commandes",
+                      _delegate('import_bench')),
+}
+
+
+def split_chain(argv: List[str]) -> List[List[str]]:
+    """
+    Découpe la ligne de commande en sous-commandes enchaînées.
+
+    Args:
+        argv (List[str]): Arguments (sans le nom du programme)
+
+    Returns:
+        List[List[str]]: [nom, arguments...] pour chaque sous-commande
+    """
+    chain, current = [], []
+    for arg in argv:
+        if arg == CHAIN_SEPARATOR:
+            if current:
+                chain.append(current)
+            current = []
+        else:
+            current.append(arg)
+    if current:
+        chain.append(current)
+    return chain
+
+
+def _usage() -> argparse.ArgumentParser:
+    """Aide générale (liste des sous-commandes)"""
+    return argparse.ArgumentParser(
+        prog='hebergement',
+        usage="hebergement [--profile] commande [arguments] [+ commande ...]",
+        description="Scripts d'hébergement (DNS OVH, diagnostic, Traefik)",
+        epilog='\n'.join(f"  {name:<14} {description}"
+                         for name, (description, _) in COMMANDS.items()) +
+        f"\n\nEnchaînement : hebergement update {CHAIN_SEPARATOR} test",
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Point d'entrée : exécute les sous-commandes dans l'ordre.
+
+    Args:
+        argv (List[str], optional): Arguments (sys.argv[1:] par défaut)
+
+    Returns:
+        int: Code de sortie (0 si toutes les commandes ont réussi)
+    """
+    chain = split_chain(sys.argv[1:] if argv is None else argv)
+    if not chain or chain[0][0] in ('-h', '--help'):
+        _usage().print_help()
+        return 0 if chain else 2
+    for name, *_ in chain:
+        if name not in COMMANDS:
+            _usage().error(f"commande inconnue : {name}")
+
+    context = Context()
+    for name, *args in chain:
+        if not COMMANDS[name][1](args, context):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Mesure du temps d'import (démarrage à froid) des commandes.
+
+Chaque module est importé dans un interpréteur neuf avec « -X importtime » ;
+le temps cumulé de son import est relevé (minimum sur plusieurs essais)
+ainsi que les bibliothèques lourdes chargées au passage (ovh, requests,
+docker...). Les résultats sont comparés à une référence enregistrée afin
+de détecter les régressions : un import qui redevient coûteux ou une
+dépendance lourde chargée à nouveau au démarrage.
+
+Utilisation:
+    python3 import_bench.py                # Compare à la référence
+    python3 import_bench.py --update       # Enregistre la référence
+    python3 import_bench.py dns_web --runs 10
+
+Auteur: Franck DESMEDT
+Date: 2024
+Version: 1.0
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from logger import setup_logger
+
+# Configuration du logger
+logger = setup_logger(__name__)
+
+SCRIPTS_DIR = Path(__file__).parent
+REPO_DIR = SCRIPTS_DIR.parent
+
+# Modules mesurés par défaut (points d'entrée et commandes du CLI)
+DEFAULT_TARGETS = [
+    'hebergement', 'config', 'dns_web', 'test_dns', 'check_and_fix_dns',
+    'credentials', 'zone_refresh', 'dns_propagation', 'acme_dns01',
+    'ovh_cache', 'network_diagnostic'
+]
+
+# Bibliothèques dont le chargement au démarrage est signalé
+HEAVY_MODULES = ['ovh', 'requests', 'docker', 'urllib3', 'yaml']
+
+# Tolérance avant de signaler une régression
+TOLERANCE_RATIO = 0.25
+TOLERANCE_US = 3000
+
+
+def parse_importtime(output: str) -> Dict[str, int]:
+    """
+    Analyse la sortie de « -X importtime ».
+
+    Args:
+        output (str): Sortie d'erreur de l'interpréteur
+
+    Returns:
+        Dict[str, int]: Temps cumulé (µs) par module importé
+    """
+    result = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        try:
+            _, cumulative, name = line[len('import time:'):].split('|')
+            result[name.strip()] = int(cumulative)
+        except ValueError:
+            # En-tête « self [us] | cumulative | imported package »
+            continue
+    return result
+
+
+def measure(target: str, runs: int = 5) -> Dict:
+    """
+    Mesure l'import d'un module dans des interpréteurs neufs.
+
+    Args:
+        target (str): Nom du module
+        runs (int, optional): Nombre d'essais (le minimum est retenu)
+
+    Returns:
+        Dict: {'import_us', 'process_ms', 'heavy'} ou {'error'}
+    """
+    env = dict(os.environ,
+               PYTHONPATH=os.pathsep.join([str(SCRIPTS_DIR), str(REPO_DIR)]))
+    env.pop('HEBERGEMENT_PROFILE', None)
+    best: Optional[Dict] = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {target}'],
+            cwd=SCRIPTS_DIR,
+            env=env,
+            capture_output=True,
+            text=True)
+        elapsed = (time.perf_counter() - started) * 1000
+        if process.returncode != 0:
+            return {'error': process.stderr.strip().splitlines()[-1]}
+        modules = parse_importtime(process.stderr)
+        result = {
+            'import_us': modules.get(target, 0),
+            'process_ms': round(elapsed, 1),
+            'heavy': sorted(name for name in HEAVY_MODULES if name in modules),
+        }
+        if best is None or result['import_us'] < best['import_us']:
+            best = result
+    return best
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict]) -> List[str]:
+    """
+    Compare les mesures à la référence.
+
+    Args:
+        results (Dict[str, Dict]): Mesures courantes
+        baseline (Dict[str, Dict]): Mesures de référence
+
+    Returns:
+        List[str]: Régressions détectées
+    """
+    regressions = []
+    for target, result in results.items():
+        reference = baseline.get(target)
+        if not reference or 'error' in result or 'error' in reference:
+            continue
+        limit = reference['import_us'] * (1 + TOLERANCE_RATIO) + TOLERANCE_US
+        if result['import_us'] > limit:
+            regressions.append(
+                f"{target} : {result['import_us'] / 1000:.1f} ms "
+                f"(référence {reference['import_us'] / 1000:.1f} ms)")
+        added = set(result['heavy']) - set(reference['heavy'])
+        if added:
+            regressions.append(
+                f"{target} charge désormais {', '.join(sorted(added))}")
+    return regressions
+
+
+def main():
+    """Point d'entrée : mesure, comparaison et mise à jour de la référence"""
+    parser = argparse.ArgumentParser(
+        description="Temps d'import des commandes (-X importtime)")
+    parser.add_argument('targets',
+                        nargs='*',
+                        help="Modules mesurés (tous par défaut)")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--baseline',
+                        type=Path,
+                        help="Fichier de référence (répertoire d'état par défaut)")
+    parser.add_argument('--update',
+                        action='store_true',
+                        help="Enregistre les mesures comme référence")
+    args = parser.parse_args()
+
+    from config import config
+    baseline_file = args.baseline or config.get_state_dir() / 'import_baseline.json'
+    try:
+        with open(baseline_file, 'r') as f:
+            baseline = json.load(f)
+    except (OSError, ValueError):
+        baseline = {}
+
+    results = {}
+    for target in args.targets or DEFAULT_TARGETS:
+        results[target] = measure(target, args.runs)
+        result = results[target]
+        if 'error' in result:
+            logger.error(f"{target:<20} {result['error']}")
+            continue
+        reference = baseline.get(target, {}).get('import_us')
+        delta = f" (réf. {reference / 1000:.1f} ms)" if reference else ''
+        heavy = f" [{', '.join(result['heavy'])}]" if result['heavy'] else ''
+        logger.info(f"{target:<20} {result['import_us'] / 1000:7.1f} ms, "
+                    f"processus {result['process_ms']:6.1f} ms{delta}{heavy}")
+
+    if args.update:
+        baseline.update(results)
+        with open(baseline_file, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        logger.info(f"Référence enregistrée dans {baseline_file}")
+        return
+
+    regressions = compare(results, baseline)
+    for regression in regressions:
+        logger.error(f"Régression : {regression}")
+    raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sketch de latences fusionnable (histogramme à buckets logarithmiques).
+
+Les percentiles sont estimés avec une erreur relative bornée (1 % par
+défaut) quelle que soit la distribution, dans une mémoire proportionnelle
+au logarithme de l'étendue des valeurs et non à leur nombre. Deux sketches
+de même précision se fusionnent en additionnant leurs compteurs : les
+résultats de plusieurs fichiers, exécutions ou conteneurs se combinent
+sans relire les mesures (principe de DDSketch).
+
+Utilisation:
+    sketch = LatencySketch()
+    for duration in durations:
+        sketch.add(duration)
+    sketch.quantile(0.99)
+    total = LatencySketch.from_dict(saved).merge(sketch)
+
+Auteur: Franck DESMEDT
+Date: 2024
+Version: 1.0
+"""
+
+import bisect
+import math
+from typing import Dict, List, Optional
+
+# Précision relative par défaut
+DEFAULT_ACCURACY = 0.01
+
+# Valeurs inférieures comptées dans le bucket zéro
+MIN_VALUE = 1e-9
+
+
+class LatencySketch:
+    """
+    Histogramme à buckets logarithmiques.
+
+    Le bucket i couvre ]gamma^(i-1), gamma^i] avec
+    gamma = (1 + accuracy) / (1 - accuracy).
+
+    Attributes:
+        accuracy (float): Erreur relative maximale des percentiles
+        count (int): Nombre de valeurs
+        total (float): Somme des valeurs
+        min (float): Plus petite valeur
+        max (float): Plus grande valeur
+    """
+
+    def __init__(self, accuracy: float = DEFAULT_ACCURACY):
+        self.accuracy = accuracy
+        self._gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zeros = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float, count: int = 1) -> None:
+        """
+        Ajoute une valeur (durée positive, unité libre).
+
+        Args:
+            value (float): Valeur mesurée
+            count (int, optional): Nombre d'occurrences
+        """
+        if value > MIN_VALUE:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        else:
+            self.zeros += count
+        self.count += count
+        self.total += value * count
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: 'LatencySketch') -> 'LatencySketch':
+        """
+        Ajoute les valeurs d'un autre sketch (même précision).
+
+        Returns:
+            LatencySketch: Ce sketch, complété
+
+        Raises:
+            ValueError: Si les précisions diffèrent
+        """
+        if other.accuracy != self.accuracy:
+            raise ValueError("Sketches de précisions différentes")
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estime un percentile.
+
+        Args:
+            q (float): Percentile entre 0 et 1 (ex: 0.99)
+
+        Returns:
+            Optional[float]: Estimation (None si le sketch est vide)
+        """
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                # Milieu du bucket en erreur relative
+                value = 2 * self._gamma**index / (1 + self._gamma)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def histogram(self, bounds: List[float]) -> List[int]:
+        """
+        Répartit les valeurs entre des bornes croissantes.
+
+        Args:
+            bounds (List[float]): Bornes supérieures des classes
+
+        Returns:
+            List[int]: Effectif de chaque classe (valeur <= borne), plus
+                une dernière classe pour les valeurs au-delà
+        """
+        counts = [0] * (len(bounds) + 1)
+        counts[bisect.bisect_left(bounds, 0.0)] += self.zeros
+        for index, count in self.buckets.items():
+            value = 2 * self._gamma**index / (1 + self._gamma)
+            counts[bisect.bisect_left(bounds, value)] += count
+        return counts
+
+    @property
+    def mean(self) -> Optional[float]:
+        """Moyenne exacte des valeurs"""
+        return self.total / self.count if self.count else None
+
+    def to_dict(self) -> Dict:
+        """Forme sérialisable en JSON"""
+        return {
+            'accuracy': self.accuracy,
+            'buckets': {str(index): count
+                        for index, count in self.buckets.items()},
+            'zeros': self.zeros,
+            'count': self.count,
+            'total': self.total,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'LatencySketch':
+        """Reconstruit un sketch sérialisé par to_dict"""
+        sketch = cls(data.get('accuracy', DEFAULT_ACCURACY))
+        sketch.buckets = {int(index): count
+                          for index, count in data.get('buckets', {}).items()}
+        sketch.zeros = data.get('zeros', 0)
+        sketch.count = data.get('count', 0)
+        sketch.total = data.get('total', 0.0)
+        if sketch.count:
+            sketch.min = data['min']
+            sketch.max = data['max']
+        return sketch
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Élection d'un leader par zone entre les instances de mise à jour DNS.
+
+La mise à jour est lancée par cron, à la main (update_dns.py, dns_web.py)
+et par le service dns_web (endpoint dyndns2). Sans coordination, des
+exécutions simultanées dupliquent les appels à OVH et se disputent le même
+enregistrement (lecture puis écriture sans verrou).
+
+Chaque zone a un bail (leader_<zone>.json) dans le répertoire d'état,
+modifié sous verrou fcntl (leader_<zone>.lock) :
+- le leader renouvelle le bail (heartbeat) tant qu'il travaille
+- un bail non renouvelé depuis OVH_LEADER_TTL secondes (30 par défaut), ou
+  dont le processus propriétaire a disparu, est repris par une autre instance
+- le leader publie l'état des enregistrements écrits
+  (leader_<zone>.state.json) ; les suiveurs lisent cet état au lieu
+  d'interroger OVH
+
+Utilisation:
+    python3 leader.py                 # État du bail et état publié
+    python3 leader.py --zone exemple.fr
+
+Auteur: Franck DESMEDT
+Date: 2024
+Version: 1.0
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+from config import config
+from logger import setup_logger
+
+# Configuration du logger
+logger = setup_logger(__name__)
+
+# Valeurs par défaut (en secondes)
+DEFAULT_TTL = 30.0
+DEFAULT_WAIT = 60.0
+POLL_INTERVAL = 0.5
+
+
+def _process_alive(pid: int) -> bool:
+    """Indique si un processus local existe encore"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ZoneLease:
+    """
+    Bail de leader d'une zone DNS, partagé entre processus.
+
+    Attributes:
+        zone (str): Nom de la zone DNS
+        ttl (float): Durée de validité du bail sans heartbeat
+        wait (float): Attente maximale d'un suiveur
+        owner (str): Identifiant de cette instance (hôte:pid:aléa)
+    """
+
+    def __init__(self,
+                 zone: str,
+                 ttl: Optional[float] = None,
+                 wait: Optional[float] = None,
+                 state_dir: Optional[Path] = None):
+        """
+        Initialise le bail d'une zone.
+
+        Args:
+            zone (str): Nom de la zone DNS
+            ttl (float, optional): Validité du bail. Par défaut
+                OVH_LEADER_TTL ou 30 secondes.
+            wait (float, optional): Attente maximale d'un suiveur. Par défaut
+                OVH_LEADER_WAIT ou 60 secondes.
+            state_dir (Path, optional): Répertoire d'état. Par défaut celui
+                de la configuration.
+        """
+        self.zone = zone
+        self.ttl = ttl if ttl is not None else config.get_float(
+            'OVH_LEADER_TTL', DEFAULT_TTL)
+        self.wait = wait if wait is not None else config.get_float(
+            'OVH_LEADER_WAIT', DEFAULT_WAIT)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        state_dir = Path(state_dir or config.get_state_dir())
+        self.lock_file = state_dir / f"leader_{zone}.lock"
+        self.lease_file = state_dir / f"leader_{zone}.json"
+        self.state_file = state_dir / f"leader_{zone}.state.json"
+        self._heartbeat: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Verrou exclusif sur les fichiers de la zone"""
+        with open(self.lock_file, 'a+') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _read(path: Path) -> Dict:
+        """Lit un fichier JSON (vide s'il est absent ou corrompu)"""
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _write(path: Path, content: Dict) -> None:
+        """Écrit un fichier JSON de manière atomique"""
+        tmp_file = path.with_suffix('.tmp')
+        with open(tmp_file, 'w') as f:
+            json.dump(content, f)
+        os.replace(tmp_file, path)
+
+    def lease(self) -> Dict:
+        """
+        Retourne le bail courant.
+
+        Returns:
+            Dict: {'owner', 'host', 'pid', 'acquired', 'heartbeat'} ou {}
+        """
+        with self._locked():
+            return self._read(self.lease_file)
+
+    def _stale(self, lease: Dict, now: float) -> bool:
+        """Indique si un bail peut être repris"""
+        if not lease:
+            return True
+        if now - lease.get('heartbeat', 0.0) > self.ttl:
+            return True
+        # Propriétaire local disparu : inutile d'attendre l'expiration
+        return lease.get('host') == socket.gethostname() and \
+            not _process_alive(lease.get('pid', 0))
+
+    def acquire(self) -> bool:
+        """
+        Tente de prendre (ou reprendre) le bail.
+
+        Returns:
+            bool: True si cette instance est leader
+        """
+        now = time.time()
+        with self._locked():
+            lease = self._read(self.lease_file)
+            if lease.get('owner') != self.owner:
+                if not self._stale(lease, now):
+                    return False
+                if lease:
+                    logger.warning(f"Reprise du bail de {self.zone} "
+                                   f"abandonné par {lease.get('owner')}")
+                lease = {
+                    'owner': self.owner,
+                    'host': socket.gethostname(),
+                    'pid': os.getpid(),
+                    'acquired': now,
+                }
+            lease['heartbeat'] = now
+            self._write(self.lease_file, lease)
+        return True
+
+    def renew(self) -> bool:
+        """
+        Renouvelle le bail (heartbeat).
+
+        Returns:
+            bool: False si le bail a été perdu (repris par une autre instance)
+        """
+        with self._locked():
+            lease = self._read(self.lease_file)
+            if lease.get('owner') != self.owner:
+                return False
+            lease['heartbeat'] = time.time()
+            self._write(self.lease_file, lease)
+        return True
+
+    def release(self) -> None:
+        """Libère le bail s'il appartient à cette instance"""
+        with self._locked():
+            if self._read(self.lease_file).get('owner') == self.owner:
+                self.lease_file.unlink()
+
+    def _heartbeat_loop(self) -> None:
+        """Renouvelle le bail toutes les ttl/3 secondes"""
+        while not self._stop.wait(self.ttl / 3):
+            if not self.renew():
+                logger.error(f"Bail de {self.zone} perdu")
+                return
+
+    @contextmanager
+    def leadership(self) -> Iterator[bool]:
+        """
+        Tente de devenir leader pour la durée du bloc.
+
+        Le bail est renouvelé en arrière-plan puis libéré en sortie.
+
+        Yields:
+            bool: True si cette instance est leader
+        """
+        if not self.acquire():
+            yield False
+            return
+        self._stop.clear()
+        self._heartbeat = threading.Thread(target=self._heartbeat_loop,
+                                           daemon=True)
+        self._heartbeat.start()
+        try:
+            yield True
+        finally:
+            self._stop.set()
+            self._heartbeat.join()
+            self.release()
+
+    def publish(self, subdomain: str, state: Dict) -> None:
+        """
+        Publie l'état d'un enregistrement pour les suiveurs.
+
+        Args:
+            subdomain (str): Sous-domaine
+            state (Dict): État (target, ttl, recordId...)
+        """
+        with self._locked():
+            published = self._read(self.state_file)
+            published[subdomain] = dict(state,
+                                        publishedAt=time.time(),
+                                        owner=self.owner)
+            self._write(self.state_file, published)
+
+    def published(self, subdomain: str) -> Dict:
+        """
+        Retourne l'état publié d'un enregistrement.
+
+        Args:
+            subdomain (str): Sous-domaine
+
+        Returns:
+            Dict: État publié ({} si aucun)
+        """
+        with self._locked():
+            return self._read(self.state_file).get(subdomain, {})
+
+
+def main():
+    """Point d'entrée : affiche le bail et l'état publié d'une zone"""
+    parser = argparse.ArgumentParser(
+        description="Bail de leader des mises à jour DNS")
+    parser.add_argument('--zone', help="Zone DNS (par défaut OVH_DNS_ZONE)")
+    args = parser.parse_args()
+
+    lease = ZoneLease(args.zone or config.get_required('OVH_DNS_ZONE'))
+    current = lease.lease()
+    if current:
+        age = time.time() - current['heartbeat']
+        state = 'expiré' if lease._stale(current, time.time()) else 'actif'
+        logger.info(f"Leader : {current['owner']} ({state}, heartbeat il y a "
+                    f"{age:.1f}s)")
+    else:
+        logger.info("Aucun leader")
+    with lease._locked():
+        published = lease._read(lease.state_file)
+    for subdomain, state in sorted(published.items()):
+        logger.info(f"  {subdomain:<20} {state.get('target')} "
+                    f"(TTL {state.get('ttl')}, publié il y a "
+                    f"{time.time() - state['publishedAt']:.0f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,537 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Simulateur local de l'API OVH pour les mesures de performance.
+
+Ce module démarre un petit serveur HTTP qui reproduit les routes de l'API
+OVH utilisées par les scripts (enregistrements de zone, DynHost,
+rafraîchissement, heure serveur, credentials). Il compte les appels reçus
+et peut ajouter une latence artificielle à chaque réponse, ce qui permet
+de comparer des stratégies de mise à jour sans credentials ni réseau.
+
+Comme l'API réelle, il vérifie la signature des requêtes authentifiées
+(voir test_ovh_api.generate_ovh_signature) et refuse les clés inconnues.
+Il peut aussi pré-remplir une zone et injecter des erreurs.
+
+Utilisation:
+    python3 mock_ovh_api.py --port 8899 --latency 0.05
+    python3 mock_ovh_api.py --zone-size 500 --error-rate 0.01 \
+        --app-key ak --app-secret as --consumer-key ck
+    # puis OVH_ENDPOINT=http://127.0.0.1:8899/1.0 dans le .env
+
+Auteur: Franck DESMEDT
+Date: 2024
+Version: 1.0
+"""
+
+import argparse
+import hmac
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from logger import setup_logger
+from test_ovh_api import generate_ovh_signature
+
+# Configuration du logger
+logger = setup_logger(__name__)
+
+API_PREFIX = '/1.0'
+
+# Routes appelées sans signature par le client OVH
+UNAUTHENTICATED = {('GET', '/auth/time'), ('POST', '/auth/credential')}
+
+# Écart maximal accepté entre l'horodatage signé et l'heure du serveur
+MAX_CLOCK_SKEW = 300
+
+
+class MockOVHState:
+    """
+    État en mémoire du simulateur (zones, enregistrements, compteurs).
+
+    Attributes:
+        zones (Dict[str, Dict[str, Dict[int, Dict[str, Any]]]]): Enregistrements
+            par zone, séparés en « record » et « dynHost »
+        calls (List[Tuple[str, str]]): Appels reçus (méthode, chemin)
+        refreshes (Dict[str, int]): Nombre de rafraîchissements par zone
+        credentials (Dict[str, Dict[str, Any]]): Credentials par consumer key
+        applications (Dict[str, str]): Secret par clé d'application
+        rejected (int): Requêtes refusées (signature, clé)
+        injected (int): Erreurs injectées
+    """
+
+    def __init__(self):
+        self.zones: Dict[str, Dict[str, Dict[int, Dict[str, Any]]]] = {}
+        self.calls: List[Tuple[str, str]] = []
+        self.refreshes: Dict[str, int] = {}
+        self.credentials: Dict[str, Dict[str, Any]] = {}
+        self.applications: Dict[str, str] = {'mock-ak': 'mock-as'}
+        self.rejected = 0
+        self.injected = 0
+        self._next_id = 1000
+        self._lock = threading.Lock()
+        self.add_credential('mock-ck', [{
+            'method': method,
+            'path': '/*'
+        } for method in ('GET', 'POST', 'PUT', 'DELETE')])
+
+    def add_credential(self,
+                       consumer_key: str,
+                       rules: List[Dict[str, str]],
+                       expiration: Optional[str] = None,
+                       status: str = 'validated') -> Dict[str, Any]:
+        """
+        Ajoute un credential (consumer key) et ses droits.
+
+        Returns:
+            Dict[str, Any]: Credential tel que retourné par /auth/currentCredential
+        """
+        with self._lock:
+            credential = {
+                'credentialId': len(self.credentials) + 1,
+                'status': status,
+                'rules': rules,
+                'expiration': expiration,
+                'creation': time.strftime('%Y-%m-%dT%H:%M:%S+00:00',
+                                          time.gmtime()),
+            }
+            self.credentials[consumer_key] = credential
+            return credential
+
+    def add_record(self,
+                   zone: str,
+                   sub_domain: str,
+                   target: str,
+                   field_type: str = 'A',
+                   ttl: int = 60,
+                   kind: str = 'record') -> int:
+        """
+        Ajoute un enregistrement (ou un DynHost si kind='dynHost').
+
+        Returns:
+            int: Identifiant de l'enregistrement
+        """
+        with self._lock:
+            record_id = self._next_id
+            self._next_id += 1
+            records = self.zones.setdefault(zone, {
+                'record': {},
+                'dynHost': {}
+            })[kind]
+            if kind == 'dynHost':
+                records[record_id] = {
+                    'id': record_id,
+                    'zone': zone,
+                    'subDomain': sub_domain,
+                    'ip': target
+                }
+            else:
+                records[record_id] = {
+                    'id': record_id,
+                    'zone': zone,
+                    'subDomain': sub_domain,
+                    'fieldType': field_type,
+                    'target': target,
+                    'ttl': ttl
+                }
+            return record_id
+
+    def populate(self, zone: str, size: int) -> List[int]:
+        """
+        Remplit une zone d'enregistrements variés (A, AAAA, CNAME, TXT).
+
+        Args:
+            zone (str): Zone
+            size (int): Nombre d'enregistrements
+
+        Returns:
+            List[int]: Identifiants créés
+        """
+        kinds = [('A', lambda i: f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}"),
+                 ('AAAA', lambda i: f"2001:db8::{i:x}"),
+                 ('CNAME', lambda i: f"host{i}.{zone}."),
+                 ('TXT', lambda i: f'"v=bench{i}"')]
+        ids = []
+        for i in range(size):
+            field_type, target = kinds[i % len(kinds)]
+            ids.append(
+                self.add_record(zone, f"host{i // len(kinds)}", target(i),
+                                field_type))
+        return ids
+
+    def reset_calls(self) -> None:
+        """Remet à zéro les compteurs d'appels"""
+        with self._lock:
+            self.calls.clear()
+            self.refreshes.clear()
+            self.rejected = 0
+            self.injected = 0
+
+
+# Routes : (méthode, expression) -> nom du traitement
+ROUTES = [
+    ('GET', r'/auth/time', 'auth_time'),
+    ('GET', r'/auth/currentCredential', 'current_credential'),
+    ('POST', r'/auth/credential', 'request_credential'),
+    ('GET', r'/domain/zone/(?P<zone>[^/]+)/(?P<kind>record|dynHost/record)',
+     'list_records'),
+    ('POST', r'/domain/zone/(?P<zone>[^/]+)/(?P<kind>record|dynHost/record)',
+     'create_record'),
+    ('GET',
+     r'/domain/zone/(?P<zone>[^/]+)/(?P<kind>record|dynHost/record)/(?P<id>\d+)',
+     'get_record'),
+    ('PUT',
+     r'/domain/zone/(?P<zone>[^/]+)/(?P<kind>record|dynHost/record)/(?P<id>\d+)',
+     'put_record'),
+    ('DELETE',
+     r'/domain/zone/(?P<zone>[^/]+)/(?P<kind>record|dynHost/record)/(?P<id>\d+)',
+     'delete_record'),
+    ('POST', r'/domain/zone/(?P<zone>[^/]+)/refresh', 'refresh'),
+]
+COMPILED_ROUTES = [(method, re.compile(pattern + '$'), name)
+                   for method, pattern, name in ROUTES]
+
+
+class MockOVHHandler(BaseHTTPRequestHandler):
+    """Traitement des requêtes HTTP du simulateur"""
+
+    protocol_version = 'HTTP/1.1'
+    # Évite les 40 ms de délai d'ACK entre en-têtes et corps sur keep-alive
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    @property
+    def state(self) -> MockOVHState:
+        return self.server.state
+
+    def _send(self, status: int, payload: Any = None) -> None:
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _dispatch(self, method: str) -> None:
+        url = urlsplit(self.path)
+        path = url.path
+        if path.startswith(API_PREFIX):
+            path = path[len(API_PREFIX):]
+        length = int(self.headers.get('Content-Length') or 0)
+        raw_body = self.rfile.read(length) if length else b''
+        self.server.delay()
+        with self.state._lock:
+            self.state.calls.append((method, path))
+        refusal = self._check_signature(method, path, raw_body)
+        if refusal:
+            with self.state._lock:
+                self.state.rejected += 1
+            self._send(*refusal)
+            return
+        if not path.startswith('/auth/') and self.server.inject_error():
+            with self.state._lock:
+                self.state.injected += 1
+            self._send(500, {'message': 'Injected failure'})
+            return
+        for route_method, pattern, name in COMPILED_ROUTES:
+            match = pattern.match(path)
+            if route_method == method and match:
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                body = json.loads(raw_body) if raw_body else {}
+                status, payload = getattr(self, f'_route_{name}')(
+                    match.groupdict(), params, body)
+                self._send(status, payload)
+                return
+        self._send(404, {'message': f'The requested object ({path}) does not exist'})
+
+    def _check_signature(self, method: str, path: str,
+                         raw_body: bytes) -> Optional[Tuple[int, Dict]]:
+        """
+        Vérifie l'authentification comme l'API réelle.
+
+        Returns:
+            Optional[Tuple[int, Dict]]: Réponse de refus, None si acceptée
+        """
+        if not self.server.verify_signatures:
+            return None
+        secret = self.state.applications.get(
+            self.headers.get('X-Ovh-Application', ''))
+        if secret is None:
+            return 403, {'errorCode': 'INVALID_KEY',
+                         'message': 'This application key is invalid'}
+        consumer_key = self.headers.get('X-Ovh-Consumer')
+        if consumer_key is None:
+            if (method, path) in UNAUTHENTICATED:
+                return None
+            return 401, {'errorCode': 'NOT_CREDENTIAL',
+                         'message': 'You must login first'}
+        credential = self.state.credentials.get(consumer_key)
+        # Une clé en attente peut consulter son propre état
+        if path != '/auth/currentCredential' and (
+                credential is None or credential['status'] != 'validated'):
+            return 403, {'errorCode': 'INVALID_CREDENTIAL',
+                         'message': 'This credential is not valid'}
+        timestamp = self.headers.get('X-Ovh-Timestamp', '')
+        if not timestamp.isdigit() or \
+                abs(int(timestamp) - time.time()) > MAX_CLOCK_SKEW:
+            return 400, {'errorCode': 'QUERY_TIME_OUT',
+                         'message': 'Query out of time'}
+        url = f"http://{self.headers.get('Host', '')}{self.path}"
+        expected = generate_ovh_signature(method, url,
+                                          raw_body.decode('utf-8'), timestamp,
+                                          secret, consumer_key)
+        if not hmac.compare_digest(expected,
+                                   self.headers.get('X-Ovh-Signature', '')):
+            return 400, {'errorCode': 'INVALID_SIGNATURE',
+                         'message': 'Invalid signature'}
+        return None
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    # Routes ------------------------------------------------------------
+
+    def _records(self, args: Dict[str, str]) -> Optional[Dict[int, Dict]]:
+        zone = self.state.zones.get(args['zone'])
+        if zone is None:
+            return None
+        return zone['dynHost' if args['kind'].startswith('dynHost') else 'record']
+
+    def _route_auth_time(self, args, params, body):
+        return 200, int(time.time())
+
+    def _route_current_credential(self, args, params, body):
+        credential = self.state.credentials.get(
+            self.headers.get('X-Ovh-Consumer', ''))
+        if credential is None:
+            return 403, {'message': 'This credential does not exist',
+                         'errorCode': 'INVALID_CREDENTIAL'}
+        return 200, credential
+
+    def _route_request_credential(self, args, params, body):
+        consumer_key = f"mock-ck-{len(self.state.credentials) + 1}"
+        self.state.add_credential(consumer_key,
+                                  body.get('accessRules', []),
+                                  status='pendingValidation')
+        return 200, {
+            'consumerKey': consumer_key,
+            'validationUrl': f"http://localhost/validate/{consumer_key}",
+            'state': 'pendingValidation'
+        }
+
+    def _route_list_records(self, args, params, body):
+        records = self._records(args)
+        if records is None:
+            return 404, {'message': f"Zone {args['zone']} not found"}
+        with self.state._lock:
+            ids = [
+                record_id for record_id, record in records.items()
+                if all(str(record.get(key)) == value
+                       for key, value in params.items())
+            ]
+        return 200, ids
+
+    def _route_create_record(self, args, params, body):
+        if self._records(args) is None:
+            return 404, {'message': f"Zone {args['zone']} not found"}
+        kind = 'dynHost' if args['kind'].startswith('dynHost') else 'record'
+        record_id = self.state.add_record(args['zone'],
+                                          body.get('subDomain', ''),
+                                          body.get('target') or body.get('ip'),
+                                          body.get('fieldType', 'A'),
+                                          body.get('ttl', 0), kind)
+        return 200, self._records(args)[record_id]
+
+    def _route_get_record(self, args, params, body):
+        records = self._records(args) or {}
+        record = records.get(int(args['id']))
+        if record is None:
+            return 404, {'message': 'This service does not exist'}
+        return 200, record
+
+    def _route_put_record(self, args, params, body):
+        records = self._records(args) or {}
+        with self.state._lock:
+            record = records.get(int(args['id']))
+            if record is None:
+                return 404, {'message': 'This service does not exist'}
+            record.update(body)
+        return 200, None
+
+    def _route_delete_record(self, args, params, body):
+        records = self._records(args) or {}
+        with self.state._lock:
+            if records.pop(int(args['id']), None) is None:
+                return 404, {'message': 'This service does not exist'}
+        return 200, None
+
+    def _route_refresh(self, args, params, body):
+        if args['zone'] not in self.state.zones:
+            return 404, {'message': f"Zone {args['zone']} not found"}
+        with self.state._lock:
+            self.state.refreshes[args['zone']] = self.state.refreshes.get(
+                args['zone'], 0) + 1
+        return 200, None
+
+
+class MockOVHServer(ThreadingHTTPServer):
+    """
+    Serveur HTTP du simulateur, exécuté dans un thread.
+
+    Attributes:
+        state (MockOVHState): État partagé
+        latency (float): Latence ajoutée à chaque réponse (secondes)
+        jitter (float): Variation aléatoire ajoutée à la latence (secondes)
+        error_rate (float): Proportion de réponses 500 injectées
+        verify_signatures (bool): Vérifie les signatures des requêtes
+    """
+
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self,
+                 host: str = '127.0.0.1',
+                 port: int = 0,
+                 latency: float = 0.0,
+                 state: Optional[MockOVHState] = None,
+                 jitter: float = 0.0,
+                 error_rate: float = 0.0,
+                 verify_signatures: bool = True,
+                 seed: Optional[int] = None):
+        super().__init__((host, port), MockOVHHandler)
+        self.state = state or MockOVHState()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.verify_signatures = verify_signatures
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def delay(self) -> None:
+        """Applique la latence simulée d'une réponse"""
+        latency = self.latency
+        if self.jitter:
+            with self._random_lock:
+                latency += self._random.uniform(0, self.jitter)
+        if latency:
+            time.sleep(latency)
+
+    def inject_error(self) -> bool:
+        """Tire au sort l'injection d'une erreur"""
+        if not self.error_rate:
+            return False
+        with self._random_lock:
+            return self._random.random() < self.error_rate
+
+    @property
+    def endpoint(self) -> str:
+        """URL de base à utiliser comme endpoint du client OVH"""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    def start(self) -> 'MockOVHServer':
+        """Démarre le serveur en arrière-plan"""
+        self._thread = threading.Thread(target=self.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Arrête le serveur"""
+        self.shutdown()
+        self.server_close()
+
+
+def mock_client(endpoint: str,
+                application_key: str = 'mock-ak',
+                application_secret: str = 'mock-as',
+                consumer_key: str = 'mock-ck'):
+    """
+    Crée un client OVH pointant vers le simulateur.
+
+    Args:
+        endpoint (str): URL du simulateur (MockOVHServer.endpoint)
+
+    Returns:
+        ovh.Client: Client configuré
+    """
+    import ovh
+    client = ovh.Client(endpoint='ovh-eu',
+                        application_key=application_key,
+                        application_secret=application_secret,
+                        consumer_key=consumer_key)
+    client._endpoint = endpoint
+    return client
+
+
+def main():
+    """Point d'entrée : démarre le simulateur au premier plan"""
+    parser = argparse.ArgumentParser(description="Simulateur de l'API OVH")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8899)
+    parser.add_argument('--latency',
+                        type=float,
+                        default=0.0,
+                        help="Latence ajoutée par réponse (s)")
+    parser.add_argument('--jitter',
+                        type=float,
+                        default=0.0,
+                        help="Variation aléatoire de la latence (s)")
+    parser.add_argument('--error-rate',
+                        type=float,
+                        default=0.0,
+                        help="Proportion d'erreurs 500 injectées")
+    parser.add_argument('--zone', default='iaproject.fr')
+    parser.add_argument('--zone-size',
+                        type=int,
+                        default=0,
+                        help="Enregistrements supplémentaires dans la zone")
+    parser.add_argument('--no-verify',
+                        action='store_true',
+                        help="Désactive la vérification des signatures")
+    parser.add_argument('--app-key', help="Clé d'application acceptée")
+    parser.add_argument('--app-secret', help="Secret de cette application")
+    parser.add_argument('--consumer-key', help="Consumer key acceptée")
+    args = parser.parse_args()
+
+    server = MockOVHServer(args.host,
+                           args.port,
+                           args.latency,
+                           jitter=args.jitter,
+                           error_rate=args.error_rate,
+                           verify_signatures=not args.no_verify)
+    if args.app_key and args.app_secret:
+        server.state.applications[args.app_key] = args.app_secret
+    if args.consumer_key:
+        server.state.add_credential(
+            args.consumer_key,
+            server.state.credentials['mock-ck']['rules'])
+    server.state.add_record(args.zone, 'www', '1.2.3.4')
+    server.state.add_record(args.zone, 'www', '1.2.3.4', kind='dynHost')
+    server.state.populate(args.zone, args.zone_size)
+    logger.info(f"Simulateur OVH à l'écoute sur {server.endpoint}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gestion de plusieurs zones DNS par un pool de workers.
+
+Les zones sont listées dans OVH_DNS_ZONES (voir Config.get_zones). Le
+travail est découpé par zone : chaque zone est traitée par un worker du
+pool (OVH_ZONE_WORKERS, 8 par défaut) avec un client OVH partagé (une
+seule synchronisation d'horloge, connexions réutilisées). Chaque zone a
+son propre budget d'appels (OVH_ZONE_RATE appels par seconde, rafale de
+OVH_ZONE_BURST) : une zone volumineuse est ralentie sans priver les
+autres de leur part de l'API.
+
+Opérations :
+- update : mise à jour de l'enregistrement de chaque zone (bail de leader
+  par zone, voir leader.py)
+- fix    : suppression des AAAA problématiques d'airquality
+- test   : lecture des enregistrements et vérification de l'identifiant
+
+Les résultats sont regroupés dans un rapport unique (journal ou JSON).
+
+Utilisation:
+    python3 multi_zone.py update
+    python3 multi_zone.py fix --workers 4
+    python3 multi_zone.py test --json
+    python3 multi_zone.py bench --zones 20     # Pool contre exécution séquentielle
+
+Auteur: Franck DESMEDT
+Date: 2024
+Version: 1.0
+"""
+
+import argparse
+import io
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from config import config
+from logger import setup_logger
+
+# Configuration du logger
+logger = setup_logger(__name__)
+
+# Valeurs par défaut
+DEFAULT_WORKERS = 8
+DEFAULT_RATE = 5.0
+DEFAULT_BURST = 10
+
+
+class RateBudget:
+    """
+    Budget d'appels d'une zone (seau à jetons).
+
+    Attributes:
+        rate (float): Appels par seconde (0 : illimité)
+        capacity (float): Rafale maximale
+        waited (float): Attente cumulée imposée (secondes)
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.waited = 0.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Consomme un jeton, en attendant si le budget est épuisé"""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity,
+                               self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Le jeton est réservé : les appels suivants attendent leur tour
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.waited += wait
+        if wait:
+            time.sleep(wait)
+
+
+class BudgetedClient:
+    """
+    Client OVH soumis au budget d'une zone.
+
+    Les appels get/put/post/delete consomment le budget ; le reste est
+    délégué au client partagé.
+
+    Attributes:
+        client: Client OVH partagé
+        budget (RateBudget): Budget de la zone
+        calls (int): Appels effectués
+    """
+
+    def __init__(self, client, budget: RateBudget):
+        self.client = client
+        self.budget = budget
+        self.calls = 0
+
+    def _call(self, method: str, *args, **kwargs):
+        self.budget.acquire()
+        self.calls += 1
+        return getattr(self.client, method)(*args, **kwargs)
+
+    def get(self, *args, **kwargs):
+        return self._call('get', *args, **kwargs)
+
+    def put(self, *args, **kwargs):
+        return self._call('put', *args, **kwargs)
+
+    def post(self, *args, **kwargs):
+        return self._call('post', *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._call('delete', *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+class _ThreadOutput(io.TextIOBase):
+    """Sortie standard redirigée vers un tampon propre à chaque thread"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text: str) -> int:
+        buffer = getattr(self.local, 'buffer', None)
+        return (buffer or self.stream).write(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+
+# Opération : (client de la zone, entrée de zone) -> (succès, détail)
+Operation = Callable[[BudgetedClient, Dict[str, Optional[str]]], tuple]
+
+
+def _resolve_record_id(client, entry: Dict[str, Optional[str]]) -> str:
+    """Identifiant de l'enregistrement A de la zone (recherché si absent)"""
+    if entry['record_id']:
+        return entry['record_id']
+    ids = client.get(f"/domain/zone/{entry['zone']}/record",
+                     fieldType='A',
+                     subDomain=entry['subdomain'] or '')
+    if not ids:
+        raise LookupError(f"aucun enregistrement A pour "
+                          f"{entry['subdomain']}.{entry['zone']}")
+    return str(ids[0])
+
+
+def update_operation(ip: str) -> Operation:
+    """
+    Opération de mise à jour de l'enregistrement de chaque zone.
+
+    Le leader de la zone applique la même mise à jour que dns_web
+    (update_as_leader) : vérification des droits et mode DynHost compris.
+
+    Args:
+        ip (str): IP à publier
+    """
+    from dns_web import update_as_leader
+    from leader import ZoneLease
+
+    def _update(client, entry):
+        zone, subdomain = entry['zone'], entry['subdomain'] or 'www'
+        lease = ZoneLease(zone)
+        with lease.leadership() as leader:
+            if not leader:
+                published = lease.published(subdomain)
+                return published.get('target') == ip, \
+                    f"leader actif ({published.get('owner', '?')})"
+            record_id = _resolve_record_id(client, entry)
+            ok = update_as_leader(client, lease, record_id, subdomain, ip)
+            return ok, f"{subdomain}.{zone} -> {ip}"
+
+    return _update
+
+
+def fix_operation(client, entry) -> tuple:
+    """Opération de correction des AAAA d'airquality"""
+    from check_and_fix_dns import check_and_fix_airquality_dns
+    return check_and_fix_airquality_dns(client, entry['zone']), 'airquality'
+
+
+def test_operation(client, entry) -> tuple:
+    """Opération de test : lecture des enregistrements de la zone"""
+    zone = entry['zone']
+    ids = client.get(f'/domain/zone/{zone}/record',
+                     **({'subDomain': entry['subdomain']}
+                        if entry['subdomain'] else {}))
+    if entry['record_id'] and int(entry['record_id']) not in ids:
+        return False, f"enregistrement {entry['record_id']} introuvable"
+    return True, f"{len(ids)} enregistrement(s)"
+
+
+class ZonePool:
+    """
+    Exécute une opération sur chaque zone avec un pool de workers.
+
+    Attributes:
+        client: Client OVH partagé
+        zones (List[Dict]): Zones (voir Config.get_zones)
+        workers (int): Zones traitées en parallèle
+        rate (float): Budget d'appels par seconde et par zone
+        burst (float): Rafale maximale par zone
+    """
+
+    def __init__(self,
+                 client,
+                 zones: List[Dict[str, Optional[str]]],
+                 workers: Optional[int] = None,
+                 rate: Optional[float] = None,
+                 burst: Optional[float] = None):
+        self.client = client
+        self.zones = zones
+        self.workers = workers or int(
+            config.get_float('OVH_ZONE_WORKERS', DEFAULT_WORKERS))
+        self.rate = rate if rate is not None else config.get_float(
+            'OVH_ZONE_RATE', DEFAULT_RATE)
+        self.burst = burst or config.get_float('OVH_ZONE_BURST', DEFAULT_BURST)
+
+    def _run_zone(self, operation: Operation, entry: Dict,
+                  output: Optional[_ThreadOutput]) -> Dict:
+        """Traite une zone et retourne son résultat"""
+        client = BudgetedClient(self.client, RateBudget(self.rate, self.burst))
+        if output:
+            output.local.buffer = io.StringIO()
+        started = time.perf_counter()
+        try:
+            ok, detail = operation(client, entry)
+        except Exception as e:
+            ok, detail = False, str(e)
+        result = {
+            'zone': entry['zone'],
+            'ok': bool(ok),
+            'detail': detail,
+            'calls': client.calls,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 1),
+            'throttled_ms': round(client.budget.waited * 1000, 1),
+        }
+        if output:
+            result['output'] = output.local.buffer.getvalue()
+            output.local.buffer = None
+        return result
+
+    def run(self, operation: Operation) -> Dict:
+        """
+        Exécute l'opération sur toutes les zones.
+
+        La sortie standard des opérations (check_and_fix_dns affiche son
+        diagnostic) est capturée par zone et jointe au rapport.
+
+        Args:
+            operation (Operation): Opération à exécuter par zone
+
+        Returns:
+            Dict: Rapport {'zones', 'ok', 'failed', 'calls', 'duration_ms'}
+        """
+        output = _ThreadOutput(sys.stdout)
+        started = time.perf_counter()
+        sys.stdout = output
+        try:
+            with ThreadPoolExecutor(self.workers) as executor:
+                results = list(
+                    executor.map(
+                        lambda entry: self._run_zone(operation, entry, output),
+                        self.zones))
+        finally:
+            sys.stdout = output.stream
+        return {
+            'zones': results,
+            'ok': sum(r['ok'] for r in results),
+            'failed': sum(not r['ok'] for r in results),
+            'calls': sum(r['calls'] for r in results),
+            'duration_ms': round((time.perf_counter() - started) * 1000, 1),
+        }
+
+
+def log_report(report: Dict) -> None:
+    """Journalise le rapport agrégé"""
+    for result in report['zones']:
+        log = logger.info if result['ok'] else logger.error
+        throttled = f", {result['throttled_ms']:.0f} ms de budget" \
+            if result['throttled_ms'] else ''
+        log(f"{'OK ' if result['ok'] else 'KO '} {result['zone']:<30} "
+            f"{result['calls']:3d} appel(s), {result['duration_ms']:7.1f} ms"
+            f"{throttled} - {result['detail']}")
+    logger.info(f"{report['ok']} zone(s) OK, {report['failed']} en échec, "
+                f"{report['calls']} appel(s) OVH en "
+                f"{report['duration_ms']:.0f} ms")
+
+
+def benchmark(zones: int = 20,
+              latency: float = 0.05,
+              workers: int = DEFAULT_WORKERS) -> Dict[str, Dict]:
+    """
+    Compare le pool à l'exécution séquentielle des scripts (simulateur local).
+
+    En séquentiel, chaque zone est traitée comme par un lancement de script
+    (nouveau client, synchronisation de l'horloge, mise à jour puis
+    correction) ; le pool traite les mêmes zones avec un client partagé.
+
+    Args:
+        zones (int, optional): Nombre de zones
+        latency (float, optional): Latence simulée par appel (s)
+        workers (int, optional): Taille du pool
+
+    Returns:
+        Dict[str, Dict]: {'sequential', 'pool'} : durée et appels
+    """
+    import contextlib
+    import logging
+    import tempfile
+    from check_and_fix_dns import check_and_fix_airquality_dns
+    from mock_ovh_api import MockOVHServer, mock_client
+
+    server = MockOVHServer(latency=latency).start()
+    entries = []
+    for i in range(zones):
+        zone = f"zone{i:02d}.example"
+        record_id = server.state.add_record(zone, 'www', '10.0.0.1')
+        server.state.add_record(zone, 'airquality', '91.173.110.4')
+        entries.append({
+            'zone': zone,
+            'subdomain': 'www',
+            'record_id': str(record_id)
+        })
+    results = {}
+    logging.disable(logging.ERROR)
+    try:
+        # Configuration de mesure, restaurée ensuite (commandes enchaînées)
+        with tempfile.TemporaryDirectory() as state_dir, \
+                config.override(OVH_REFRESH_WINDOW='0',
+                                OVH_STATE_DIR=state_dir):
+            update = update_operation('10.0.0.2')
+
+            server.state.reset_calls()
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                for entry in entries:
+                    client = mock_client(server.endpoint)
+                    update(client, entry)
+                    check_and_fix_airquality_dns(client, entry['zone'])
+            results['sequential'] = {
+                'duration': time.perf_counter() - started,
+                'calls': len(server.state.calls),
+            }
+
+            update = update_operation('10.0.0.3')
+            server.state.reset_calls()
+            started = time.perf_counter()
+            pool = ZonePool(mock_client(server.endpoint), entries, workers,
+                            rate=0)
+            pool.run(update)
+            pool.run(fix_operation)
+            results['pool'] = {
+                'duration': time.perf_counter() - started,
+                'calls': len(server.state.calls),
+            }
+    finally:
+        logging.disable(logging.NOTSET)
+        server.stop()
+    return results
+
+
+OPERATIONS = ('update', 'fix', 'test')
+
+
+def main():
+    """Point d'entrée : opération sur toutes les zones ou benchmark"""
+    parser = argparse.ArgumentParser(
+        description="Opérations DNS sur plusieurs zones")
+    parser.add_argument('command', choices=OPERATIONS + ('bench', ))
+    parser.add_argument('--workers', type=int, help="Zones en parallèle")
+    parser.add_argument('--rate',
+                        type=float,
+                        help="Appels par seconde et par zone (0 : illimité)")
+    parser.add_argument('--ip', help="IP publiée (IP_FREEBOX par défaut)")
+    parser.add_argument('--json',
+                        action='store_true',
+                        help="Affiche le rapport en JSON")
+    parser.add_argument('--zones',
+                        type=int,
+                        default=20,
+                        help="Nombre de zones simulées (bench)")
+    parser.add_argument('--latency',
+                        type=float,
+                        default=0.05,
+                        help="Latence simulée (bench)")
+    args = parser.parse_args()
+
+    if args.command == 'bench':
+        results = benchmark(args.zones, args.latency,
+                            args.workers or DEFAULT_WORKERS)
+        for mode, result in results.items():
+            logger.info(f"{mode:<10} : {result['duration']:.2f} s, "
+                        f"{result['calls']} appel(s)")
+        speedup = results['sequential']['duration'] / results['pool']['duration']
+        logger.info(f"Accélération : x{speedup:.1f}")
+        return
+
+    zones = config.get_zones()
+    if not zones:
+        logger.error("Aucune zone configurée (OVH_DNS_ZONES ou OVH_DNS_ZONE)")
+        raise SystemExit(1)
+    client = config.get_ovh_client()
+    if args.command == 'update':
+        # Droits vérifiés par zone, selon le mode, par update_as_leader
+        operation = update_operation(args.ip or config.get_required('IP_FREEBOX'))
+    else:
+        operation = fix_operation if args.command == 'fix' else test_operation
+
+    report = ZonePool(client, zones, args.workers, args.rate).run(operation)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        for result in report['zones']:
+            if result.get('output'):
+                print(result['output'], end='')
+        log_report(report)
+    raise SystemExit(0 if not report['failed'] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache local partagé des lectures de l'API OVH.
+
+Plusieurs scripts (test_dns.py, dns_web.py, check_and_fix_dns.py,
+script_doc_ovh.py) relisent les mêmes ressources (/domain/zone/{zone}/record/...,
+/auth/details, /auth/currentCredential). Ce module fournit :
+- un démon asyncio à l'écoute sur un socket Unix qui sert les GET depuis un
+  cache à durée de vie par chemin, et regroupe les requêtes identiques
+  simultanées en un seul appel à OVH
+- un client de substitution (CachedOVHClient) utilisé par
+  Config.get_ovh_client lorsque OVH_CACHE_SOCKET est défini : les GET
+  passent par le démon, les PUT/POST/DELETE vont directement à OVH puis
+  invalident les entrées concernées
+
+Si le démon ne répond pas, le client se replie sur un appel direct.
+
+Utilisation:
+    python3 ovh_cache.py serve           # Démarre le démon
+    python3 ovh_cache.py stats           # Statistiques du cache
+    python3 ovh_cache.py flush           # Vide le cache
+
+Configuration (.env):
+    OVH_CACHE_SOCKET: Chemin du socket (active le client de substitution)
+    OVH_CACHE_TTLS: Durées de vie, ex: "/auth/*=300,/domain/zone/*/record*=30"
+
+Auteur: Franck DESMEDT
+Date: 2024
+Version: 1.0
+"""
+
+import argparse
+import asyncio
+import fnmatch
+import http.client
+import json
+import os
+import socket
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from config import config
+from logger import setup_logger
+from async_http import AsyncHTTPServer, Request, Response
+
+# Configuration du logger
+logger = setup_logger(__name__)
+
+# Durées de vie par défaut (motif de chemin, secondes) ; la première
+# règle qui correspond s'applique
+DEFAULT_TTLS: List[Tuple[str, float]] = [
+    ('/auth/time', 0.0),
+    ('/auth/*', 300.0),
+    ('/domain/zone/*/record*', 30.0),
+    ('/domain/zone/*/dynHost/record*', 30.0),
+    ('*', 10.0),
+]
+
+
+def default_socket_path() -> str:
+    """Chemin du socket : OVH_CACHE_SOCKET ou ovh_cache.sock dans le répertoire d'état"""
+    return config.get('OVH_CACHE_SOCKET') or str(config.get_state_dir() /
+                                                 'ovh_cache.sock')
+
+
+def load_ttl_rules() -> List[Tuple[str, float]]:
+    """
+    Charge les durées de vie (OVH_CACHE_TTLS prioritaire sur les défauts).
+
+    Returns:
+        List[Tuple[str, float]]: Règles (motif, durée)
+    """
+    rules = []
+    for item in (config.get('OVH_CACHE_TTLS') or '').split(','):
+        if '=' in item:
+            pattern, ttl = item.rsplit('=', 1)
+            rules.append((pattern.strip(), float(ttl)))
+    return rules + DEFAULT_TTLS
+
+
+def invalidation_prefix(path: str) -> str:
+    """
+    Calcule le préfixe des entrées à invalider après une écriture.
+
+    Une écriture sur /domain/zone/Z/record/123 invalide la collection
+    /domain/zone/Z/record (listes et éléments) ; un rafraîchissement de
+    /domain/zone/Z invalide toute la zone.
+
+    Args:
+        path (str): Chemin écrit (sans query string)
+
+    Returns:
+        str: Préfixe de chemin
+    """
+    path = path.split('?', 1)[0].rstrip('/')
+    parent, _, last = path.rpartition('/')
+    if last.isdigit() or last == 'refresh':
+        return parent
+    return path
+
+
+# =====================================================
+# Démon de cache
+# =====================================================
+class OVHCacheDaemon:
+    """
+    Démon de cache des GET OVH avec regroupement des requêtes.
+
+    Attributes:
+        rules (List[Tuple[str, float]]): Durées de vie par motif
+        entries (Dict[str, Tuple[float, int, str]]): Cache
+            chemin -> (expiration, statut, corps JSON)
+        stats (Dict[str, int]): Compteurs (hits, misses, coalesced, upstream)
+    """
+
+    def __init__(self, client=None, rules: Optional[List[Tuple[str,
+                                                              float]]] = None):
+        self._client = client
+        self.rules = rules or load_ttl_rules()
+        self.entries: Dict[str, Tuple[float, int, str]] = {}
+        self.inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'upstream': 0,
+                      'invalidations': 0}
+        self.server = AsyncHTTPServer()
+        self.server.route('GET', '/get')(self.handle_get)
+        self.server.route('POST', '/invalidate')(self.handle_invalidate)
+        self.server.route('GET', '/stats')(self.handle_stats)
+
+    @property
+    def client(self):
+        """Client OVH direct (jamais le client de substitution)"""
+        if self._client is None:
+            self._client = config.get_ovh_client(use_cache=False)
+        return self._client
+
+    def ttl_for(self, path: str) -> float:
+        """Durée de vie applicable à un chemin"""
+        bare = path.split('?', 1)[0]
+        for pattern, ttl in self.rules:
+            if fnmatch.fnmatchcase(bare, pattern):
+                return ttl
+        return 0.0
+
+    def _upstream(self, path: str) -> Tuple[int, str]:
+        """Appel direct à OVH (exécuté dans un thread)"""
+        try:
+            return 200, json.dumps(self.client.get(path))
+        except Exception as e:
+            return 502, json.dumps({
+                'errorClass': e.__class__.__name__,
+                'message': str(e)
+            })
+
+    async def fetch(self, path: str) -> Tuple[int, str]:
+        """
+        Retourne la réponse d'un GET, depuis le cache si possible.
+
+        Les requêtes simultanées sur un même chemin attendent le même appel.
+
+        Args:
+            path (str): Chemin OVH (avec query string éventuelle)
+
+        Returns:
+            Tuple[int, str]: Statut (200 ou 502) et corps JSON
+        """
+        entry = self.entries.get(path)
+        if entry and entry[0] > time.monotonic():
+            self.stats['hits'] += 1
+            return entry[1], entry[2]
+        future = self.inflight.get(path)
+        if future is not None:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(future)
+        self.stats['misses'] += 1
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[path] = future
+        try:
+            self.stats['upstream'] += 1
+            status, body = await asyncio.get_running_loop().run_in_executor(
+                None, self._upstream, path)
+            ttl = self.ttl_for(path)
+            # Les erreurs ne sont pas mises en cache
+            if status == 200 and ttl > 0 and self.inflight.get(path) is future:
+                self.entries[path] = (time.monotonic() + ttl, status, body)
+            future.set_result((status, body))
+            return status, body
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            if self.inflight.get(path) is future:
+                del self.inflight[path]
+
+    def invalidate(self, prefix: str) -> int:
+        """
+        Invalide les entrées dont le chemin commence par le préfixe.
+
+        Les requêtes en cours sur ces chemins ne seront pas mises en cache.
+
+        Returns:
+            int: Nombre d'entrées supprimées
+        """
+        stale = [
+            path for path in self.entries
+            if path.split('?', 1)[0].startswith(prefix)
+        ]
+        for path in stale:
+            del self.entries[path]
+        for path in list(self.inflight):
+            if path.split('?', 1)[0].startswith(prefix):
+                # Détache la requête en cours : son résultat peut précéder l'écriture
+                del self.inflight[path]
+        self.stats['invalidations'] += len(stale)
+        return len(stale)
+
+    # Routes ------------------------------------------------------------
+
+    async def handle_get(self, request: Request) -> Response:
+        path = request.query.get('path', '')
+        if not path.startswith('/'):
+            return Response.json({'message': 'path manquant'}, 400)
+        status, body = await self.fetch(path)
+        return Response(status, body.encode('utf-8'), 'application/json')
+
+    async def handle_invalidate(self, request: Request) -> Response:
+        prefix = request.json().get('prefix', '')
+        if not prefix:
+            self.stats['invalidations'] += len(self.entries)
+            count = len(self.entries)
+            self.entries.clear()
+            self.inflight.clear()
+        else:
+            count = self.invalidate(prefix)
+        return Response.json({'invalidated': count})
+
+    async def handle_stats(self, request: Request) -> Response:
+        return Response.json(dict(self.stats, entries=len(self.entries)))
+
+    async def serve_forever(self, socket_path: str) -> None:
+        """Démarre le démon sur le socket Unix"""
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        await self.server.start(unix_path=socket_path)
+        os.chmod(socket_path, 0o600)
+        logger.info(f"Cache OVH à l'écoute sur {socket_path}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.server.stop()
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+
+
+# =====================================================
+# Client de substitution
+# =====================================================
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """Connexion HTTP sur socket Unix"""
+
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class CachedOVHClient:
+    """
+    Client OVH dont les GET passent par le démon de cache.
+
+    Toutes les autres méthodes et attributs sont délégués au client réel.
+
+    Attributes:
+        client: Client OVH réel
+        socket_path (str): Socket du démon
+    """
+
+    def __init__(self, client, socket_path: str, timeout: float = 30.0):
+        self.client = client
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._connection: Optional[_UnixHTTPConnection] = None
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def _request(self, method: str, path: str,
+                 body: Optional[bytes] = None) -> Tuple[int, bytes]:
+        """Envoie une requête au démon (connexion réutilisée)"""
+        for attempt in range(2):
+            if self._connection is None:
+                self._connection = _UnixHTTPConnection(self.socket_path,
+                                                       self.timeout)
+            try:
+                self._connection.request(method, path, body)
+                response = self._connection.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, ConnectionError):
+                # Connexion fermée par le démon : une nouvelle tentative
+                self._connection.close()
+                self._connection = None
+                if attempt:
+                    raise
+        raise ConnectionError("Démon de cache indisponible")
+
+    def _target(self, _target: str, kwargs: Dict) -> str:
+        """Reconstruit le chemin avec la query string, comme ovh.Client.get"""
+        if not kwargs:
+            return _target
+        query = self.client._prepare_query_string(
+            self.client._canonicalize_kwargs(kwargs))
+        return f"{_target}{'&' if '?' in _target else '?'}{query}"
+
+    def get(self, _target, _need_auth=True, **kwargs):
+        """GET via le démon de cache (repli direct si indisponible)"""
+        path = self._target(_target, kwargs)
+        try:
+            status, body = self._request('GET',
+                                         f"/get?path={quote(path, safe='')}")
+        except OSError as e:
+            logger.debug(f"Cache OVH indisponible ({e}), appel direct")
+            return self.client.get(_target, _need_auth, **kwargs)
+        payload = json.loads(body)
+        if status == 200:
+            return payload
+        import ovh.exceptions
+        error_class = getattr(ovh.exceptions, payload.get('errorClass', ''),
+                              ovh.exceptions.APIError)
+        raise error_class(payload.get('message'))
+
+    def _invalidate(self, path: str) -> None:
+        """Signale une écriture au démon"""
+        try:
+            self._request(
+                'POST', '/invalidate',
+                json.dumps({'prefix': invalidation_prefix(path)}).encode())
+        except OSError as e:
+            logger.debug(f"Invalidation impossible ({e})")
+
+    def put(self, _target, _need_auth=True, **kwargs):
+        result = self.client.put(_target, _need_auth, **kwargs)
+        self._invalidate(_target)
+        return result
+
+    def post(self, _target, _need_auth=True, **kwargs):
+        result = self.client.post(_target, _need_auth, **kwargs)
+        self._invalidate(_target)
+        return result
+
+    def delete(self, _target, _need_auth=True, **kwargs):
+        result = self.client.delete(_target, _need_auth, **kwargs)
+        self._invalidate(_target)
+        return result
+
+
+def main():
+    """Point d'entrée : démon et commandes d'administration"""
+    parser = argparse.ArgumentParser(description="Cache local de l'API OVH")
+    parser.add_argument('command', choices=['serve', 'stats', 'flush'])
+    parser.add_argument('--socket', help="Chemin du socket Unix")
+    args = parser.parse_args()
+
+    socket_path = args.socket or default_socket_path()
+    if args.command == 'serve':
+        try:
+            asyncio.run(OVHCacheDaemon().serve_forever(socket_path))
+        except KeyboardInterrupt:
+            logger.info("Arrêt du cache OVH")
+        return
+
+    shim = CachedOVHClient(None, socket_path)
+    if args.command == 'stats':
+        _, body = shim._request('GET', '/stats')
+    else:
+        _, body = shim._request('POST', '/invalidate', b'{}')
+    logger.info(body.decode('utf-8'))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Mode profilage commun aux points d'entrée des scripts.
+
+Les scripts lancés par cron retardent directement la convergence DNS ; ce
+module permet de voir où passe leur temps. Un point d'entrée l'active en
+tête de fichier, avant ses autres imports, lorsqu'il est exécuté comme
+script (jamais lorsqu'il est importé) :
+
+    if __name__ == "__main__":
+        import profiling
+        profiling.enable_from_argv()
+
+Avec l'option --profile (retirée de sys.argv) ou HEBERGEMENT_PROFILE défini,
+l'exécution complète est profilée par cProfile. En fin de processus :
+- les statistiques pstats sont écrites (<script>-<horodatage>.pstats)
+- une pile repliée (« collapsed stacks ») est écrite pour flamegraph.pl
+  ou speedscope (<script>-<horodatage>.folded)
+- le temps mural des phases est journalisé : imports, chargement de la
+  configuration, établissement TLS, attente de l'API, journalisation
+
+Les fichiers sont écrits dans HEBERGEMENT_PROFILE s'il désigne un
+répertoire, sinon dans <répertoire d'état>/profiles.
+
+Utilisation:
+    python3 update_dns.py --profile
+    HEBERGEMENT_PROFILE=/tmp/prof python3 dns_web.py
+    python3 profiling.py /tmp/prof/update_dns-20240101-120000.pstats
+
+Auteur: Franck DESMEDT
+Date: 2024
+Version: 1.0
+"""
+
+import atexit
+import cProfile
+import os
+import pstats
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Pas de logger au niveau du module : le chargement de la journalisation
+# fait partie de ce qui est mesuré.
+
+# Phases mesurées : nom -> fonction (fichier, nom) dont le temps cumulé
+# (mural, appels récursifs comptés une fois) est attribué à la phase. Les
+# phases peuvent se recouvrir (la configuration journalise, par exemple).
+PHASES: Dict[str, Tuple[str, str]] = {
+    'imports': ('<frozen importlib._bootstrap>', '_find_and_load'),
+    'configuration': ('/config.py', '_load_config'),
+    'tls': ('/ssl.py', 'do_handshake'),
+    'attente API': ('/http/client.py', 'getresponse'),
+    'journalisation': ('/logging/__init__.py', '_log'),
+}
+
+_profiler: Optional[cProfile.Profile] = None
+_started = 0.0
+_log = None
+
+# Fonction : (fichier, ligne, nom) comme dans pstats
+Function = Tuple[str, int, str]
+
+
+def _matches(function: Function, file_suffix: str, name: str) -> bool:
+    filename = function[0].replace(os.sep, '/')
+    return function[2] == name and (filename == file_suffix
+                                    or filename.endswith(file_suffix))
+
+
+def phase_times(stats: pstats.Stats) -> Dict[str, float]:
+    """
+    Calcule le temps cumulé de chaque phase.
+
+    Args:
+        stats (pstats.Stats): Statistiques cProfile
+
+    Returns:
+        Dict[str, float]: Secondes par phase
+    """
+    return {
+        phase: sum(entry[3] for function, entry in stats.stats.items()
+                   if _matches(function, *spec))
+        for phase, spec in PHASES.items()
+    }
+
+
+def _label(function: Function) -> str:
+    filename, line, name = function
+    if filename == '~':
+        return name
+    # Les paquets sont désignés par leur répertoire (requests/__init__.py)
+    short = os.path.join(*Path(filename).parts[-2:]) \
+        if filename.endswith('__init__.py') else os.path.basename(filename)
+    return f"{name} ({short}:{line})"
+
+
+def collapsed_stacks(stats: pstats.Stats,
+                     min_time: float = 1e-4,
+                     max_depth: int = 64) -> List[str]:
+    """
+    Reconstitue des piles repliées à partir du graphe d'appels cProfile.
+
+    cProfile ne conserve que les arcs appelant -> appelé ; le temps d'une
+    fonction est réparti entre ses chemins au prorata des arcs, ce qui est
+    l'approximation habituelle des flamegraphs issus de cProfile.
+
+    Args:
+        stats (pstats.Stats): Statistiques cProfile
+        min_time (float, optional): Temps minimal d'un chemin conservé (s)
+        max_depth (int, optional): Profondeur maximale
+
+    Returns:
+        List[str]: Lignes « a;b;c microsecondes »
+    """
+    children: Dict[Function, List[Tuple[Function, float]]] = {}
+    for function, (_, _, _, _, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            children.setdefault(caller, []).append((function, edge[3]))
+    roots = [function for function, entry in stats.stats.items()
+             if not entry[4]]
+    totals: Dict[str, float] = {}
+
+    def _walk(function: Function, stack: List[str], budget: float) -> None:
+        cumulative = stats.stats[function][3] or budget or 1.0
+        ratio = budget / cumulative
+        stack = stack + [_label(function)]
+        self_time = stats.stats[function][2] * ratio
+        if self_time >= min_time / 10:
+            key = ';'.join(stack)
+            totals[key] = totals.get(key, 0.0) + self_time
+        if len(stack) >= max_depth:
+            return
+        for child, edge_time in children.get(function, []):
+            child_budget = edge_time * ratio
+            if child_budget >= min_time and _label(child) not in stack:
+                _walk(child, stack, child_budget)
+
+    for root in roots:
+        _walk(root, [], stats.stats[root][3])
+    return [f"{stack} {round(seconds * 1e6)}"
+            for stack, seconds in sorted(totals.items()) if seconds > 0]
+
+
+def _output_dir() -> Path:
+    target = os.environ.get('HEBERGEMENT_PROFILE', '')
+    if target and target.lower() not in ('1', 'true', 'yes'):
+        directory = Path(target)
+    elif 'config' in sys.modules and hasattr(sys.modules['config'], 'config'):
+        directory = sys.modules['config'].config.get_state_dir() / 'profiles'
+    else:
+        directory = Path(
+            os.environ.get('OVH_STATE_DIR')
+            or Path.home() / '.cache' / 'hebergement') / 'profiles'
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+
+def _logger():
+    """Logger du module, créé à la demande"""
+    global _log
+    if _log is None:
+        from logger import setup_logger
+        _log = setup_logger(__name__)
+    return _log
+
+
+def report(stats: pstats.Stats, wall: Optional[float] = None,
+           top: int = 15) -> None:
+    """
+    Affiche les phases et les fonctions les plus coûteuses.
+
+    Args:
+        stats (pstats.Stats): Statistiques cProfile
+        wall (float, optional): Durée murale totale (s)
+        top (int, optional): Nombre de fonctions affichées
+    """
+    logger = _logger()
+    wall = wall or stats.total_tt
+    logger.info(f"Durée totale : {wall * 1000:.1f} ms")
+    for phase, seconds in sorted(phase_times(stats).items(),
+                                 key=lambda item: -item[1]):
+        logger.info(f"  {phase:<15} {seconds * 1000:8.1f} ms "
+                    f"({seconds / wall * 100 if wall else 0:5.1f} %)")
+    ranked = sorted(stats.stats.items(), key=lambda item: -item[1][3])
+    logger.info("Fonctions (temps cumulé) :")
+    for function, entry in ranked[:top]:
+        logger.info(f"  {entry[3] * 1000:8.1f} ms  {_label(function)}")
+
+
+def _finish() -> None:
+    """Arrête le profilage, écrit les fichiers et affiche le résumé"""
+    global _profiler
+    if _profiler is None:
+        return
+    _profiler.disable()
+    wall = time.perf_counter() - _started
+    profiler, _profiler = _profiler, None
+    script = Path(sys.argv[0]).stem or 'python'
+    base = _output_dir() / f"{script}-{time.strftime('%Y%m%d-%H%M%S')}"
+    profiler.dump_stats(f"{base}.pstats")
+    stats = pstats.Stats(profiler)
+    with open(f"{base}.folded", 'w') as f:
+        f.write('\n'.join(collapsed_stacks(stats)) + '\n')
+    report(stats, wall)
+    _logger().info(f"Profil écrit dans {base}.pstats et {base}.folded")
+
+
+def enable(force: bool = False) -> bool:
+    """
+    Démarre le profilage jusqu'à la fin du processus.
+
+    Args:
+        force (bool, optional): Active même sans --profile ni variable
+
+    Returns:
+        bool: True si le profilage est actif
+    """
+    global _profiler, _started
+    if _profiler is not None:
+        return True
+    if not force and not os.environ.get('HEBERGEMENT_PROFILE'):
+        return False
+    _started = time.perf_counter()
+    _profiler = cProfile.Profile()
+    atexit.register(_finish)
+    _profiler.enable()
+    return True
+
+
+def enable_from_argv() -> bool:
+    """
+    Active le profilage si --profile est passé (option retirée de sys.argv).
+
+    À appeler en tête du point d'entrée, avant les autres imports, sous
+    if __name__ == "__main__".
+
+    Returns:
+        bool: True si le profilage est actif
+    """
+    force = '--profile' in sys.argv
+    if force:
+        sys.argv.remove('--profile')
+    return enable(force)
+
+
+def main():
+    """Point d'entrée : résumé d'un fichier pstats existant"""
+    import argparse
+    parser = argparse.ArgumentParser(description="Résumé d'un profil")
+    parser.add_argument('file', help="Fichier .pstats")
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--folded', help="Écrit aussi les piles repliées")
+    args = parser.parse_args()
+
+    stats = pstats.Stats(args.file)
+    report(stats, top=args.top)
+    if args.folded:
+        with open(args.folded, 'w') as f:
+            f.write('\n'.join(collapsed_stacks(stats)) + '\n')
+
+
+if __name__ == "__main__":
+    main()
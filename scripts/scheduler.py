@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ordonnanceur résident des tâches d'hébergement.
+
+Remplace les lancements cron (update_dns.py toutes les 5 minutes,
+vérifications, diagnostic, nettoyage des images) par un processus unique :
+la configuration, le client OVH (horloge synchronisée, connexions
+ouvertes) et le client Docker restent chauds d'une exécution à l'autre.
+
+Pour chaque tâche :
+- intervalle et gigue aléatoire (évite les exécutions synchronisées)
+- pas de chevauchement : une tâche encore en cours n'est pas relancée
+- délai maximal : une tâche Python qui le dépasse est signalée (elle ne
+  peut pas être interrompue et reste marquée en cours) ; un script shell
+  est arrêté
+- rattrapage des exécutions manquées (arrêt du processus, tâche trop
+  longue) : « skip » attend le prochain créneau, « once » exécute une
+  fois immédiatement, « all » rejoue chaque créneau manqué (10 au plus)
+- statistiques de latence (p50, p95, max) écrites dans le répertoire d'état
+
+Les intervalles et délais se règlent par SCHEDULE_<TÂCHE>_INTERVAL et
+SCHEDULE_<TÂCHE>_TIMEOUT (secondes, intervalle 0 : tâche désactivée).
+
+Utilisation:
+    python3 scheduler.py run
+    python3 scheduler.py run --jobs update_dns check_and_fix
+    python3 scheduler.py run --once          # Chaque tâche une fois, puis sortie
+    python3 scheduler.py status
+
+Auteur: Franck DESMEDT
+Date: 2024
+Version: 1.0
+"""
+
+if __name__ == "__main__":
+    # Seulement en point d'entrée : un import ne profile jamais le
+    # processus appelant
+    import profiling
+    profiling.enable_from_argv()
+
+import argparse
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Deque, Dict, List, Optional
+
+from config import config
+from logger import setup_logger
+from benchmark import percentile
+from hebergement import Context
+
+# Configuration du logger
+logger = setup_logger(__name__)
+
+REPO_DIR = Path(__file__).parent.parent
+
+# Politiques de rattrapage des exécutions manquées
+CATCH_UP_POLICIES = ('skip', 'once', 'all')
+MAX_CATCH_UP = 10
+
+# Nombre de durées conservées par tâche pour les statistiques
+LATENCY_WINDOW = 200
+
+
+@dataclass
+class Job:
+    """
+    Tâche planifiée.
+
+    Attributes:
+        name (str): Nom de la tâche
+        func (Callable[[Context], bool]): Traitement (contexte partagé)
+        interval (float): Période (secondes)
+        jitter (float): Gigue maximale ajoutée à chaque créneau (secondes)
+        timeout (float): Durée maximale d'une exécution (secondes)
+        catch_up (str): Politique de rattrapage (skip, once, all)
+    """
+    name: str
+    func: Callable[[Context], bool]
+    interval: float
+    jitter: float = 0.0
+    timeout: float = 300.0
+    catch_up: str = 'once'
+    slot: float = 0.0
+    next_run: float = 0.0
+    running: bool = False
+    pending: int = 0
+    last_run: Optional[float] = None
+    last_status: Optional[str] = None
+    runs: int = 0
+    failures: int = 0
+    timeouts: int = 0
+    skipped: int = 0
+    durations: Deque[float] = field(
+        default_factory=lambda: deque(maxlen=LATENCY_WINDOW))
+
+    def stats(self) -> Dict:
+        """Statistiques de la tâche (durées en millisecondes)"""
+        durations = list(self.durations)
+        return {
+            'last_run': self.last_run,
+            'last_status': self.last_status,
+            'next_run': self.next_run,
+            'runs': self.runs,
+            'failures': self.failures,
+            'timeouts': self.timeouts,
+            'skipped': self.skipped,
+            'p50_ms': round(percentile(durations, 0.50) * 1000, 1),
+            'p95_ms': round(percentile(durations, 0.95) * 1000, 1),
+            'max_ms': round(max(durations, default=0.0) * 1000, 1),
+        }
+
+
+# Tâches ------------------------------------------------------------------
+
+def _update_dns(context: Context) -> bool:
+    from dns_web import update_dns_record
+    return update_dns_record(context.client)
+
+
+def _check_and_fix(context: Context) -> bool:
+    from check_and_fix_dns import check_and_fix_airquality_dns
+    return check_and_fix_airquality_dns(context.client)
+
+
+def _network_diagnostic(context: Context) -> bool:
+    # Le client Docker et l'historique de santé restent ouverts entre deux diagnostics
+    diagnostic = getattr(context, 'diagnostic', None)
+    if diagnostic is None:
+        if str(REPO_DIR) not in sys.path:
+            sys.path.append(str(REPO_DIR))
+        from network_diagnostic import ServiceDiagnostic
+        from health_store import HealthStore
+        diagnostic = context.diagnostic = ServiceDiagnostic(HealthStore())
+    diagnostic.run_diagnostics()
+    return True
+
+
+def _shell(script: str) -> Callable[[Context], bool]:
+    """Tâche exécutant un script shell du dépôt (arrêté au délai maximal)"""
+
+    def _run(context: Context, timeout: Optional[float] = None) -> bool:
+        result = subprocess.run(['bash', str(REPO_DIR / script)],
+                                capture_output=True,
+                                text=True,
+                                timeout=timeout)
+        for line in (result.stdout + result.stderr).splitlines():
+            logger.info(f"[{script}] {line}")
+        return result.returncode == 0
+
+    _run.shell = True
+    return _run
+
+
+# Tâches par défaut : nom -> (traitement, intervalle, gigue, délai, rattrapage)
+DEFAULT_JOBS = {
+    'update_dns': (_update_dns, 300, 10, 120, 'once'),
+    'check_and_fix': (_check_and_fix, 3600, 60, 300, 'once'),
+    'network_diagnostic': (_network_diagnostic, 900, 30, 300, 'skip'),
+    'nettoyage': (_shell('nettoyage_container_obsoletes.sh'), 86400, 600,
+                  1800, 'once'),
+}
+
+
+def default_jobs(names: Optional[List[str]] = None) -> List[Job]:
+    """
+    Construit les tâches par défaut, ajustées par la configuration.
+
+    Args:
+        names (List[str], optional): Tâches retenues (toutes par défaut)
+
+    Returns:
+        List[Job]: Tâches actives (intervalle non nul)
+    """
+    jobs = []
+    for name, (func, interval, jitter, timeout, catch_up) in DEFAULT_JOBS.items():
+        if names and name not in names:
+            continue
+        prefix = f"SCHEDULE_{name.upper()}"
+        interval = config.get_float(f"{prefix}_INTERVAL", interval)
+        if interval <= 0:
+            continue
+        jobs.append(
+            Job(name, func, interval, min(jitter, interval / 2),
+                config.get_float(f"{prefix}_TIMEOUT", timeout),
+                config.get(f"{prefix}_CATCH_UP", catch_up)))
+    return jobs
+
+
+class Scheduler:
+    """
+    Exécute des tâches périodiques dans le processus courant.
+
+    Attributes:
+        jobs (Dict[str, Job]): Tâches par nom
+        context (Context): Configuration et clients partagés par les tâches
+        state_file (Path): Dernières exécutions et statistiques
+    """
+
+    def __init__(self,
+                 jobs: List[Job],
+                 context: Optional[Context] = None,
+                 state_file: Optional[Path] = None):
+        self.jobs = {job.name: job for job in jobs}
+        self.context = context or Context()
+        self.state_file = Path(state_file or
+                               config.get_state_dir() / 'scheduler.json')
+        self._executor = ThreadPoolExecutor(len(jobs) * 2 or 1,
+                                            thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._random = random.Random()
+        for job in jobs:
+            if job.catch_up not in CATCH_UP_POLICIES:
+                raise ValueError(f"Politique de rattrapage inconnue pour "
+                                 f"{job.name} : {job.catch_up}")
+
+    # État persistant ------------------------------------------------------
+
+    def _load_state(self) -> None:
+        """Reprend les dernières exécutions enregistrées"""
+        try:
+            with open(self.state_file, 'r') as f:
+                saved = json.load(f).get('jobs', {})
+        except (OSError, ValueError):
+            saved = {}
+        now = time.time()
+        for job in self.jobs.values():
+            job.last_run = saved.get(job.name, {}).get('last_run')
+            job.slot = job.last_run + job.interval if job.last_run else now
+            job.next_run = job.slot + self._random.uniform(0, job.jitter)
+
+    def _save_state(self) -> None:
+        """Écrit les statistiques de manière atomique"""
+        with self._lock:
+            document = {
+                'pid': os.getpid(),
+                'updated': time.time(),
+                'jobs': {name: job.stats() for name, job in self.jobs.items()},
+            }
+        tmp_file = self.state_file.with_suffix('.tmp')
+        with open(tmp_file, 'w') as f:
+            json.dump(document, f, indent=2)
+        os.replace(tmp_file, self.state_file)
+
+    # Exécution -----------------------------------------------------------
+
+    def _execute(self, job: Job) -> None:
+        """Exécute une tâche en appliquant son délai maximal"""
+        started = time.perf_counter()
+        job.last_run = time.time()
+        if getattr(job.func, 'shell', False):
+            future = self._executor.submit(job.func, self.context, job.timeout)
+        else:
+            future = self._executor.submit(job.func, self.context)
+        try:
+            ok = future.result(timeout=job.timeout)
+            status = 'ok' if ok else 'échec'
+        except (TimeoutError, subprocess.TimeoutExpired):
+            status = 'délai dépassé'
+        except Exception as e:
+            logger.error(f"Tâche {job.name} : {e}")
+            status = 'erreur'
+        duration = time.perf_counter() - started
+        with self._lock:
+            job.runs += 1
+            job.last_status = status
+            job.durations.append(duration)
+            if status == 'délai dépassé':
+                job.timeouts += 1
+            elif status != 'ok':
+                job.failures += 1
+        log = logger.info if status == 'ok' else logger.warning
+        log(f"Tâche {job.name} : {status} en {duration * 1000:.0f} ms")
+        if status == 'délai dépassé' and not future.done():
+            # Le traitement continue en arrière-plan : pas de nouvelle
+            # exécution avant sa fin
+            future.add_done_callback(lambda _: self._finish(job))
+        else:
+            self._finish(job)
+
+    def _finish(self, job: Job) -> None:
+        with self._lock:
+            # Rattrapage : exécution suivante immédiate, créneaux inchangés
+            catch_up = job.pending > 0 and not self._stop.is_set()
+            if catch_up:
+                job.pending -= 1
+            else:
+                job.running = False
+        self._save_state()
+        if catch_up:
+            self._start(job)
+
+    def _start(self, job: Job) -> None:
+        threading.Thread(target=self._execute,
+                         args=(job, ),
+                         name=f"scheduler-{job.name}",
+                         daemon=True).start()
+
+    def _advance(self, job: Job, now: float) -> int:
+        """
+        Passe au prochain créneau régulier postérieur à now.
+
+        La gigue est tirée à chaque créneau sans décaler les suivants.
+
+        Returns:
+            int: Nombre de créneaux manqués
+        """
+        missed = max(0, int((now - job.slot) // job.interval))
+        job.slot += (missed + 1) * job.interval
+        job.next_run = job.slot + self._random.uniform(0, job.jitter)
+        return missed
+
+    def _due(self, job: Job, now: float) -> None:
+        """Traite une tâche arrivée à échéance"""
+        with self._lock:
+            missed = self._advance(job, now)
+            if job.running:
+                job.skipped += 1
+                logger.warning(f"Tâche {job.name} toujours en cours, "
+                               "exécution sautée")
+                return
+            if missed and job.catch_up == 'skip':
+                job.skipped += missed
+                logger.info(f"Tâche {job.name} : {missed} exécution(s) "
+                            "manquée(s) ignorée(s)")
+                return
+            if missed and job.catch_up == 'all':
+                job.pending = min(missed, MAX_CATCH_UP)
+                logger.info(f"Tâche {job.name} : rattrapage de "
+                            f"{job.pending} exécution(s) manquée(s)")
+            job.running = True
+        self._start(job)
+
+    def run_once(self) -> bool:
+        """
+        Exécute chaque tâche une fois, séquentiellement.
+
+        Returns:
+            bool: True si toutes les tâches ont réussi
+        """
+        for job in self.jobs.values():
+            job.running = True
+            self._execute(job)
+        return all(job.last_status == 'ok' for job in self.jobs.values())
+
+    def run_forever(self) -> None:
+        """Boucle principale, jusqu'à stop() ou SIGTERM/SIGINT"""
+        self._load_state()
+        for job in self.jobs.values():
+            logger.info(f"Tâche {job.name} : toutes les {job.interval:.0f}s, "
+                        f"prochaine dans "
+                        f"{max(0.0, job.next_run - time.time()):.0f}s")
+        while not self._stop.is_set():
+            now = time.time()
+            for job in self.jobs.values():
+                if job.next_run <= now:
+                    self._due(job, now)
+            upcoming = min(job.next_run for job in self.jobs.values())
+            self._stop.wait(min(max(0.0, upcoming - time.time()), 1.0))
+        self._executor.shutdown(wait=False)
+        logger.info("Ordonnanceur arrêté")
+
+    def stop(self, *_) -> None:
+        """Demande l'arrêt de la boucle principale"""
+        self._stop.set()
+
+
+def main():
+    """Point d'entrée : ordonnanceur ou état des tâches"""
+    parser = argparse.ArgumentParser(
+        description="Ordonnanceur des tâches d'hébergement")
+    parser.add_argument('command', choices=['run', 'status'])
+    parser.add_argument('--jobs',
+                        nargs='+',
+                        choices=list(DEFAULT_JOBS),
+                        help="Tâches exécutées (toutes par défaut)")
+    parser.add_argument('--once',
+                        action='store_true',
+                        help="Exécute chaque tâche une fois puis s'arrête")
+    args = parser.parse_args()
+
+    if args.command == 'status':
+        try:
+            with open(config.get_state_dir() / 'scheduler.json', 'r') as f:
+                document = json.load(f)
+        except (OSError, ValueError):
+            logger.info("Aucune statistique enregistrée")
+            return
+        now = time.time()
+        for name, stats in document['jobs'].items():
+            last = f"il y a {now - stats['last_run']:.0f}s" \
+                if stats['last_run'] else 'jamais'
+            logger.info(f"{name:<20} {stats['last_status'] or '-':<14} "
+                        f"dernière {last}, {stats['runs']} exécution(s), "
+                        f"p50 {stats['p50_ms']:.0f} ms, "
+                        f"p95 {stats['p95_ms']:.0f} ms, "
+                        f"max {stats['max_ms']:.0f} ms, "
+                        f"{stats['failures']} échec(s), "
+                        f"{stats['timeouts']} délai(s) dépassé(s), "
+                        f"{stats['skipped']} sautée(s)")
+        return
+
+    scheduler = Scheduler(default_jobs(args.jobs))
+    if args.once:
+        raise SystemExit(0 if scheduler.run_once() else 1)
+    signal.signal(signal.SIGTERM, scheduler.stop)
+    signal.signal(signal.SIGINT, scheduler.stop)
+    scheduler.run_forever()
+
+
+if __name__ == "__main__":
+    main()
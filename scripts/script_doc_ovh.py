@@ -19,7 +19,6 @@ Prérequis:
 """
 
 import json
-import ovh
 import requests
 from logger import setup_logger
 from config import config
@@ -63,12 +62,7 @@ def check_token_permissions(client):
 
 # Initialisation du client OVH avec les credentials
 try:
-    client = ovh.Client(
-        endpoint=config.get_required('OVH_ENDPOINT'),
-        application_key=config.get_required('OVH_APPLICATION_KEY'),
-        application_secret=config.get_required('OVH_APPLICATION_SECRET'),
-        consumer_key=config.get_required('OVH_CONSUMER_KEY'),
-    )
+    client = config.get_ovh_client()
     logger.info("Client OVH initialisé avec succès")
 except Exception as e:
     logger.error(f"Erreur lors de l'initialisation du client OVH: {str(e)}")
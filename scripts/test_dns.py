@@ -14,11 +14,15 @@ Date: 2024
 Version: 1.0
 """
 
-import sys
-import logging
-import requests
+if __name__ == "__main__":
+    # Seulement en point d'entrée : un import ne profile jamais le
+    # processus appelant
+    import profiling
+    profiling.enable_from_argv()
+
 from logger import setup_logger, mask_sensitive
 from config import config
+from credentials import CredentialManager
 
 # Configuration du logger
 logger = setup_logger(__name__)
@@ -44,7 +48,7 @@ def print_required_rights():
     logger.info("5. Mettez à jour votre fichier .env avec la nouvelle clé")
 
 
-def test_dns_update():
+def test_dns_update(client=None):
     """
     Test la configuration DNS et la connexion à l'API OVH.
 
@@ -54,6 +58,9 @@ def test_dns_update():
     3. Teste la connexion à l'API OVH
     4. Teste la récupération des enregistrements DNS
 
+    Args:
+        client (optional): Client OVH. Par défaut config.get_ovh_client().
+
     Returns:
         bool: True si tous les tests réussissent, False sinon
 
@@ -86,18 +93,35 @@ def test_dns_update():
 
         # Test de la récupération de l'IP publique
         logger.info("Test de la récupération de l'IP publique...")
+        import requests
         response = requests.get('https://api.ipify.org')
         ip = response.text
         logger.info(f"IP publique actuelle : {mask_sensitive(ip)}")
 
         # Test de la connexion à l'API OVH
         logger.info("Test de la connexion à l'API OVH...")
-        client = config.get_ovh_client()
+        client = client or config.get_ovh_client()
 
         # Test de la récupération des informations DNS
         zone = config.get_required('OVH_DNS_ZONE')
         record_id = config.get_required('OVH_DNS_RECORD_ID')
 
+        # Vérification des droits depuis le cache (sans appel si récent)
+        record_path = f'/domain/zone/{zone}/record/{record_id}'
+        try:
+            refused = CredentialManager(client).missing([
+                ('GET', record_path), ('PUT', record_path),
+                ('POST', f'/domain/zone/{zone}/refresh')
+            ])
+        except Exception as e:
+            logger.warning(f"Droits de la consumer key non vérifiables : {e}")
+            refused = []
+        if refused:
+            for method, path in refused:
+                logger.error(f"Droit manquant : {method} {path}")
+            print_required_rights()
+            return False
+
         try:
             logger.info(
                 f"Test de lecture de l'enregistrement DNS {record_id}...")
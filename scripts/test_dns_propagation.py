@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests de la vérification de propagation DNS contre un serveur DNS local.
+
+Ces tests n'utilisent ni le réseau ni l'API OVH : StubDNSServer
+(dns_propagation.py) joue le rôle des résolveurs, et ses enregistrements
+sont modifiés pendant la vérification pour simuler la propagation.
+
+Cas vérifiés :
+- convergence d'un enregistrement A modifié en cours de vérification
+- disparition d'un enregistrement (expected=None)
+- expiration du délai sur un résolveur en retard
+
+Utilisation:
+    python3 test_dns_propagation.py
+    python3 -m pytest test_dns_propagation.py
+
+Auteur: Franck DESMEDT
+Date: 2024
+Version: 1.0
+"""
+
+import asyncio
+
+from logger import setup_logger
+from dns_propagation import PropagationChecker, StubDNSServer, log_report
+
+# Configuration du logger
+logger = setup_logger(__name__)
+
+NAME = 'airquality.iaproject.fr'
+OLD_IP = '192.0.2.10'
+NEW_IP = '192.0.2.20'
+
+
+def _checker(servers, timeout: float) -> PropagationChecker:
+    return PropagationChecker(
+        resolvers=[server.address for server in servers],
+        timeout=timeout,
+        initial_delay=0.05,
+        max_delay=0.2,
+        query_timeout=0.5)
+
+
+async def _later(delay: float, server: StubDNSServer, records) -> None:
+    """Remplace les enregistrements d'un serveur après un délai"""
+    await asyncio.sleep(delay)
+    server.records.clear()
+    server.records.update(records)
+
+
+async def _convergence() -> bool:
+    servers = [
+        await StubDNSServer({(NAME, 'A'): [OLD_IP]}).start() for _ in range(2)
+    ]
+    try:
+        # Le second serveur ne voit la modification qu'après 0,3 s
+        servers[0].records[(NAME, 'A')] = [NEW_IP]
+        update = asyncio.ensure_future(
+            _later(0.3, servers[1], {(NAME, 'A'): [NEW_IP]}))
+        results = await _checker(servers, 5.0).check(NAME, 'A', [NEW_IP])
+        await update
+    finally:
+        for server in servers:
+            await server.stop()
+    assert log_report(results)
+    # Marge : la boucle asyncio peut réveiller un sleep un peu en avance
+    assert results[1].seconds >= 0.25 and results[1].attempts > 1
+    return True
+
+
+async def _absent() -> bool:
+    server = await StubDNSServer({(NAME, 'AAAA'): ['2001:db8::1']}).start()
+    try:
+        removal = asyncio.ensure_future(_later(0.2, server, {}))
+        results = await _checker([server], 5.0).check(NAME, 'AAAA', None)
+        await removal
+    finally:
+        await server.stop()
+    assert log_report(results)
+    assert not results[0].last_values
+    return True
+
+
+async def _timeout() -> bool:
+    servers = [
+        await StubDNSServer({(NAME, 'A'): [NEW_IP]}).start(),
+        # Résolveur en retard : garde l'ancienne valeur
+        await StubDNSServer({(NAME, 'A'): [OLD_IP]}).start(),
+    ]
+    try:
+        results = await _checker(servers, 0.5).check(NAME, 'A', [NEW_IP])
+    finally:
+        for server in servers:
+            await server.stop()
+    assert not log_report(results)
+    assert results[0].converged
+    assert not results[1].converged
+    assert results[1].last_values == {OLD_IP}
+    return True
+
+
+def test_convergence():
+    assert asyncio.run(_convergence())
+
+
+def test_absent_record():
+    assert asyncio.run(_absent())
+
+
+def test_timeout_on_lagging_server():
+    assert asyncio.run(_timeout())
+
+
+if __name__ == "__main__":
+    failures = 0
+    for test in (test_convergence, test_absent_record,
+                 test_timeout_on_lagging_server):
+        try:
+            test()
+            logger.info(f"✅ {test.__name__}")
+        except AssertionError:
+            logger.exception(f"❌ {test.__name__}")
+            failures += 1
+    if failures:
+        raise SystemExit(1)
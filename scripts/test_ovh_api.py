@@ -39,8 +39,12 @@ def print_required_rights():
     logger.info("5. Mettez à jour votre fichier .env avec la nouvelle clé")
 
 
-def generate_ovh_signature(method: str, url: str, body: str,
-                           timestamp: str) -> str:
+def generate_ovh_signature(method: str,
+                           url: str,
+                           body: str,
+                           timestamp: str,
+                           application_secret: str = None,
+                           consumer_key: str = None) -> str:
     """
     Génère la signature pour l'authentification OVH selon la documentation officielle.
 
@@ -49,12 +53,15 @@ def generate_ovh_signature(method: str, url: str, body: str,
         url (str): URL complète de l'endpoint
         body (str): Corps de la requête (vide pour GET)
         timestamp (str): Timestamp actuel
+        application_secret (str, optional): Secret (OVH_APPLICATION_SECRET par défaut)
+        consumer_key (str, optional): Consumer key (OVH_CONSUMER_KEY par défaut)
 
     Returns:
         str: Signature générée au format "$1$[signature_hex]"
     """
-    application_secret = config.get_required('OVH_APPLICATION_SECRET')
-    consumer_key = config.get_required('OVH_CONSUMER_KEY')
+    application_secret = application_secret or config.get_required(
+        'OVH_APPLICATION_SECRET')
+    consumer_key = consumer_key or config.get_required('OVH_CONSUMER_KEY')
 
     to_sign = f"{application_secret}+{consumer_key}+{method}+{url}+{body}+{timestamp}"
     signature = "$1$" + hashlib.sha1(to_sign.encode('utf-8')).hexdigest()
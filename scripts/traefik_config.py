@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lecture de la configuration dynamique de Traefik.
+
+Ce module extrait des fichiers du reverse-proxy (reverse-proxy/dynamic/*.yml)
+les noms d'hôtes publiés par les règles Host(...). Ces noms servent à
+préparer les challenges ACME, à sonder les certificats, etc.
+
+Utilisation:
+    python3 traefik_config.py               # Liste les hôtes publiés
+    python3 traefik_config.py --zone iaproject.fr
+
+Auteur: Franck DESMEDT
+Date: 2024
+Version: 1.0
+"""
+
+import argparse
+import re
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from logger import setup_logger
+
+# Configuration du logger
+logger = setup_logger(__name__)
+
+# Répertoire des fichiers dynamiques du dépôt
+DYNAMIC_DIR = Path(__file__).parent.parent / 'reverse-proxy' / 'dynamic'
+
+# Host(`a.example.fr`) ou Host(`a.example.fr`, `b.example.fr`)
+HOST_RULE = re.compile(r'\bHost\(([^)]*)\)')
+QUOTED_NAME = re.compile(r'[`"\']([^`"\']+)[`"\']')
+
+
+def hosts_from_rule(rule: str) -> List[str]:
+    """
+    Extrait les noms d'hôtes d'une règle de routeur Traefik.
+
+    Args:
+        rule (str): Règle (ex: "Host(`a.fr`) && PathPrefix(`/api`)")
+
+    Returns:
+        List[str]: Noms d'hôtes, en minuscules, dans l'ordre d'apparition
+    """
+    hosts = []
+    for match in HOST_RULE.finditer(rule):
+        for name in QUOTED_NAME.findall(match.group(1)):
+            name = name.strip().lower()
+            if name and name not in hosts:
+                hosts.append(name)
+    return hosts
+
+
+def dynamic_files(directory: Optional[Path] = None,
+                  include_dev: bool = False) -> List[Path]:
+    """
+    Liste les fichiers de configuration dynamique.
+
+    Args:
+        directory (Path, optional): Répertoire. Par défaut reverse-proxy/dynamic.
+        include_dev (bool, optional): Inclut les fichiers *.dev.yml
+
+    Returns:
+        List[Path]: Fichiers triés par nom
+    """
+    directory = Path(directory or DYNAMIC_DIR)
+    files = sorted(
+        list(directory.glob('*.yml')) + list(directory.glob('*.yaml')))
+    if not include_dev:
+        files = [f for f in files if not f.name.endswith(('.dev.yml',
+                                                         '.dev.yaml'))]
+    return files
+
+
+def load_hosts(directory: Optional[Path] = None,
+               zone: Optional[str] = None,
+               include_dev: bool = False) -> Dict[str, List[str]]:
+    """
+    Extrait les hôtes publiés par la configuration dynamique.
+
+    L'analyse porte sur le texte des fichiers : elle ne dépend pas de
+    PyYAML et fonctionne aussi avec les fichiers TOML.
+
+    Args:
+        directory (Path, optional): Répertoire des fichiers dynamiques
+        zone (str, optional): Ne garde que les hôtes de cette zone
+        include_dev (bool, optional): Inclut les fichiers *.dev.yml
+
+    Returns:
+        Dict[str, List[str]]: Hôtes par fichier source
+    """
+    result = {}
+    for path in dynamic_files(directory, include_dev):
+        hosts = hosts_from_rule(path.read_text(encoding='utf-8'))
+        if zone:
+            hosts = [
+                host for host in hosts
+                if host == zone or host.endswith(f'.{zone}')
+            ]
+        if hosts:
+            result[path.name] = hosts
+    return result
+
+
+def all_hosts(directory: Optional[Path] = None,
+              zone: Optional[str] = None,
+              include_dev: bool = False) -> List[str]:
+    """
+    Retourne la liste dédoublonnée des hôtes publiés.
+
+    Args:
+        directory (Path, optional): Répertoire des fichiers dynamiques
+        zone (str, optional): Ne garde que les hôtes de cette zone
+        include_dev (bool, optional): Inclut les fichiers *.dev.yml
+
+    Returns:
+        List[str]: Hôtes triés
+    """
+    return sorted({
+        host
+        for hosts in load_hosts(directory, zone, include_dev).values()
+        for host in hosts
+    })
+
+
+def main():
+    """Point d'entrée : affiche les hôtes publiés par Traefik"""
+    parser = argparse.ArgumentParser(
+        description="Hôtes publiés par la configuration dynamique Traefik")
+    parser.add_argument('--dir', type=Path, help="Répertoire dynamique")
+    parser.add_argument('--zone', help="Filtre sur une zone DNS")
+    parser.add_argument('--dev',
+                        action='store_true',
+                        help="Inclut les fichiers *.dev.yml")
+    args = parser.parse_args()
+
+    for filename, hosts in load_hosts(args.dir, args.zone, args.dev).items():
+        logger.info(f"{filename} : {', '.join(hosts)}")
+
+
+if __name__ == "__main__":
+    main()
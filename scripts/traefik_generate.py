@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Génération de la configuration dynamique de Traefik, un fichier par service.
+
+Les routes sont décrites par des labels des services docker-compose
+(inventaire lu par compose_config.py) :
+
+    labels:
+      - "hebergement.traefik.host=grafana.iaproject.fr"
+      - "hebergement.traefik.port=3000"
+
+Labels reconnus (préfixe hebergement.traefik.) :
+- host : nom(s) d'hôte, séparés par des virgules (obligatoire)
+- path : préfixe de chemin (PathPrefix) facultatif
+- port : port du conteneur (par défaut : premier port publié ou exposé)
+- servers : URLs des réplicas, séparées par des virgules
+  (par défaut http://<service>:<port>)
+- entrypoints : points d'entrée (websecure par défaut)
+- middlewares : middlewares, séparés par des virgules
+- certresolver : résolveur de certificats (letsencrypt par défaut)
+- healthcheck : chemin de test de santé des serveurs
+
+Chaque service produit reverse-proxy/dynamic/<service>.generated.yml. Un
+fichier n'est réécrit que si l'empreinte de son contenu change, et de
+manière atomique : le fournisseur « file » de Traefik ne recharge que ce
+qui a réellement changé, jamais un fichier à moitié écrit. Les fichiers
+générés dont le service a disparu sont supprimés.
+
+Utilisation:
+    python3 traefik_generate.py                # Génère les fichiers
+    python3 traefik_generate.py --dry-run      # Affiche les changements
+
+Auteur: Franck DESMEDT
+Date: 2024
+Version: 1.0
+"""
+
+import argparse
+import hashlib
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from compose_config import ComposeService, load_services, COMPOSE_FILES
+from logger import setup_logger
+from traefik_config import DYNAMIC_DIR
+
+# Configuration du logger
+logger = setup_logger(__name__)
+
+LABEL_PREFIX = 'hebergement.traefik.'
+GENERATED_SUFFIX = '.generated.yml'
+
+HEADER = ("# Généré par scripts/traefik_generate.py depuis {source} "
+          "(service {service}).\n"
+          "# Ne pas modifier : changer les labels hebergement.traefik.* "
+          "du service.\n")
+
+
+@dataclass
+class RouteSpec:
+    """Route d'un service vers ses serveurs"""
+    service: str
+    source: str
+    hosts: List[str]
+    servers: List[str]
+    path: Optional[str] = None
+    entrypoints: List[str] = field(default_factory=lambda: ['websecure'])
+    middlewares: List[str] = field(default_factory=list)
+    cert_resolver: Optional[str] = 'letsencrypt'
+    healthcheck: Optional[str] = None
+
+
+def _split(value: str) -> List[str]:
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def route_spec(service: ComposeService) -> Optional[RouteSpec]:
+    """
+    Construit la route d'un service à partir de ses labels.
+
+    Args:
+        service (ComposeService): Service docker-compose
+
+    Returns:
+        Optional[RouteSpec]: Route, ou None si le service n'est pas routé
+    """
+    labels = {
+        key[len(LABEL_PREFIX):]: value
+        for key, value in service.labels.items()
+        if key.startswith(LABEL_PREFIX)
+    }
+    hosts = _split(labels.get('host', ''))
+    if not hosts:
+        return None
+    servers = _split(labels.get('servers', ''))
+    if not servers:
+        port = labels.get('port') or (str(service.ports[0].target)
+                                       if service.ports else None)
+        if not port:
+            logger.warning(f"{service.name} : ni port ni serveurs, ignoré")
+            return None
+        servers = [f"http://{service.name}:{port}"]
+    return RouteSpec(
+        service=service.name,
+        source=service.file.name,
+        hosts=hosts,
+        servers=servers,
+        path=labels.get('path') or None,
+        entrypoints=_split(labels.get('entrypoints', '')) or ['websecure'],
+        middlewares=_split(labels.get('middlewares', '')),
+        cert_resolver=labels.get('certresolver', 'letsencrypt') or None,
+        healthcheck=labels.get('healthcheck') or None)
+
+
+def inventory(files: Optional[List[Path]] = None) -> List[RouteSpec]:
+    """
+    Routes déclarées par les services des fichiers docker-compose.
+
+    Args:
+        files (List[Path], optional): Fichiers (par défaut COMPOSE_FILES)
+
+    Returns:
+        List[RouteSpec]: Routes, dans l'ordre des fichiers
+    """
+    specs = []
+    for path in files or COMPOSE_FILES:
+        if not Path(path).exists():
+            continue
+        for service in load_services(path):
+            spec = route_spec(service)
+            if spec:
+                specs.append(spec)
+    return specs
+
+
+def render(spec: RouteSpec, weights: Optional[Dict[str, int]] = None) -> str:
+    """
+    Configuration dynamique d'un service (YAML déterministe).
+
+    Args:
+        spec (RouteSpec): Route
+        weights (Dict[str, int], optional): Poids par URL de serveur ; avec
+            plusieurs serveurs, le service devient un « weighted » de
+            services à un serveur (<service>-<n>)
+
+    Returns:
+        str: Contenu du fichier
+    """
+    import yaml
+    rule = ' || '.join(f"Host(`{host}`)" for host in spec.hosts)
+    if len(spec.hosts) > 1 and spec.path:
+        rule = f"({rule})"
+    if spec.path:
+        rule += f" && PathPrefix(`{spec.path}`)"
+    router = {
+        'rule': rule,
+        'entryPoints': spec.entrypoints,
+        'service': spec.service,
+    }
+    if spec.middlewares:
+        router['middlewares'] = spec.middlewares
+    if spec.cert_resolver:
+        router['tls'] = {'certResolver': spec.cert_resolver}
+
+    def load_balancer(servers: List[str]) -> Dict:
+        balancer = {'servers': [{'url': url} for url in servers]}
+        if spec.healthcheck:
+            balancer['healthCheck'] = {
+                'path': spec.healthcheck,
+                'interval': '10s',
+                'timeout': '3s',
+            }
+        return {'loadBalancer': balancer}
+
+    if weights and len(spec.servers) > 1:
+        services = {
+            spec.service: {
+                'weighted': {
+                    'services': [{
+                        'name': f"{spec.service}-{index}",
+                        'weight': weights.get(url, 1),
+                    } for index, url in enumerate(spec.servers)]
+                }
+            }
+        }
+        for index, url in enumerate(spec.servers):
+            services[f"{spec.service}-{index}"] = load_balancer([url])
+    else:
+        services = {spec.service: load_balancer(spec.servers)}
+    document = {
+        'http': {
+            'routers': {
+                spec.service: router
+            },
+            'services': services
+        }
+    }
+    return HEADER.format(source=spec.source, service=spec.service) + \
+        yaml.safe_dump(document, sort_keys=False, default_flow_style=False)
+
+
+def write_if_changed(path: Path, content: str) -> bool:
+    """
+    Écrit un fichier seulement si l'empreinte de son contenu change.
+
+    L'écriture passe par un fichier temporaire caché du même répertoire,
+    renommé ensuite : Traefik ne voit jamais de fichier partiel.
+
+    Returns:
+        bool: True si le fichier a été écrit
+    """
+    data = content.encode('utf-8')
+    try:
+        if hashlib.sha256(path.read_bytes()).digest() == \
+                hashlib.sha256(data).digest():
+            return False
+    except FileNotFoundError:
+        pass
+    tmp_file = path.with_name(f".{path.name}.tmp")
+    with open(tmp_file, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, path)
+    return True
+
+
+def output_path(spec: RouteSpec, directory: Optional[Path] = None) -> Path:
+    """Fichier généré d'un service"""
+    return Path(directory or DYNAMIC_DIR) / f"{spec.service}{GENERATED_SUFFIX}"
+
+
+def generate(specs: List[RouteSpec],
+             directory: Optional[Path] = None,
+             dry_run: bool = False,
+             weights: Optional[Dict[str, Dict[str, int]]] = None
+             ) -> Dict[str, str]:
+    """
+    Met à jour les fichiers générés du répertoire dynamique.
+
+    Args:
+        specs (List[RouteSpec]): Routes à publier
+        directory (Path, optional): Répertoire dynamique
+        dry_run (bool, optional): N'écrit ni ne supprime rien
+        weights (Dict[str, Dict[str, int]], optional): Poids des serveurs par
+            service (traefik_weights.py), conservés s'ils couvrent encore
+            exactement les serveurs du service
+
+    Returns:
+        Dict[str, str]: Action par fichier (created, updated, unchanged,
+            removed)
+    """
+    directory = Path(directory or DYNAMIC_DIR)
+    actions = {}
+    for spec in specs:
+        path = output_path(spec, directory)
+        service_weights = (weights or {}).get(spec.service)
+        if service_weights and set(service_weights) != set(spec.servers):
+            service_weights = None
+        content = render(spec, service_weights)
+        existed = path.exists()
+        if dry_run:
+            changed = not existed or path.read_text(encoding='utf-8') != content
+        else:
+            changed = write_if_changed(path, content)
+        actions[path.name] = ('updated' if existed else
+                              'created') if changed else 'unchanged'
+    for path in directory.glob(f"*{GENERATED_SUFFIX}"):
+        if path.name not in actions:
+            if not dry_run:
+                path.unlink()
+            actions[path.name] = 'removed'
+    return actions
+
+
+def main():
+    """Point d'entrée : génère un fichier dynamique par service routé"""
+    parser = argparse.ArgumentParser(
+        description="Configuration dynamique Traefik depuis docker-compose")
+    parser.add_argument('--compose',
+                        type=Path,
+                        action='append',
+                        help="Fichier docker-compose (répétable)")
+    parser.add_argument('--dir', type=Path, help="Répertoire dynamique")
+    parser.add_argument('--dry-run',
+                        action='store_true',
+                        help="Affiche les changements sans écrire")
+    args = parser.parse_args()
+
+    from traefik_weights import saved_weights
+    actions = generate(inventory(args.compose), args.dir, args.dry_run,
+                       saved_weights())
+    for name, action in sorted(actions.items()):
+        if action == 'unchanged':
+            logger.debug(f"{name} : inchangé")
+        else:
+            logger.info(f"{name} : {action}")
+    changed = sum(action != 'unchanged' for action in actions.values())
+    logger.info(f"{len(actions)} fichier(s), {changed} modifié(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Analyse en continu du journal d'accès JSON de Traefik.
+
+Le journal (accessLog au format json, /var/log/traefik/access.log par
+défaut ou TRAEFIK_ACCESS_LOG) est lu par blocs depuis la dernière position
+enregistrée : seules les nouvelles lignes sont traitées à chaque passage.
+La rotation est gérée : si le fichier a changé d'inode, la fin de l'ancien
+fichier (access.log.1) est lue avant de reprendre le nouveau au début ; un
+fichier tronqué (copytruncate) est relu depuis le début.
+
+Les latences (Duration) sont agrégées par routeur et par service dans des
+sketches fusionnables (latency_sketch.py) : p50/p95/p99 avec 1 % d'erreur
+relative, cumulés d'un passage à l'autre dans le répertoire d'état. Seuls
+les champs utiles sont extraits (expression régulière, repli sur json si
+la ligne n'est pas au format compact de Traefik).
+
+Sorties : tableau dans le journal, JSON, ou fichier de métriques au format
+texte Prometheus (collecteur textfile de node_exporter).
+
+Utilisation:
+    python3 traefik_logs.py analyze
+    python3 traefik_logs.py analyze /var/log/traefik/access.log --by service
+    python3 traefik_logs.py analyze --prometheus /var/lib/node_exporter/traefik.prom
+    python3 traefik_logs.py analyze --follow --interval 10
+    python3 traefik_logs.py bench --lines 500000
+
+Auteur: Franck DESMEDT
+Date: 2024
+Version: 1.0
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+from config import config
+from logger import setup_logger
+from latency_sketch import LatencySketch
+
+# Configuration du logger
+logger = setup_logger(__name__)
+
+DEFAULT_ACCESS_LOG = '/var/log/traefik/access.log'
+
+# Taille des blocs lus
+CHUNK_SIZE = 1 << 20
+
+# Champs extraits d'une ligne compacte (valeur numérique ou chaîne)
+FIELDS = re.compile(
+    rb'"(Duration|DownstreamStatus|RouterName|ServiceName)":\s*"?([^",}]*)')
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Clé d'agrégation : (routeur, service)
+Route = Tuple[str, str]
+
+
+def parse_line(line: bytes) -> Optional[Tuple[Route, float, int]]:
+    """
+    Extrait routeur, service, durée et statut d'une ligne du journal.
+
+    Args:
+        line (bytes): Ligne JSON
+
+    Returns:
+        Optional[Tuple[Route, float, int]]: ((routeur, service), durée en
+            secondes, statut) ou None si la ligne n'est pas exploitable
+    """
+    fields = dict(FIELDS.findall(line))
+    try:
+        duration = int(fields[b'Duration'])
+        status = int(fields.get(b'DownstreamStatus') or 0)
+        router = fields.get(b'RouterName', b'').decode() or '-'
+        service = fields.get(b'ServiceName', b'').decode() or '-'
+    except (KeyError, ValueError):
+        # Format inattendu (espaces, échappements) : décodage complet
+        try:
+            entry = json.loads(line)
+            duration = int(entry['Duration'])
+            status = int(entry.get('DownstreamStatus') or 0)
+            router = entry.get('RouterName') or '-'
+            service = entry.get('ServiceName') or '-'
+        except (ValueError, KeyError, TypeError):
+            return None
+    return (router, service), duration / 1e9, status
+
+
+class RouteStats:
+    """
+    Statistiques d'un couple routeur/service.
+
+    Attributes:
+        sketch (LatencySketch): Latences (secondes)
+        statuses (Dict[str, int]): Requêtes par classe de statut (2xx...)
+    """
+
+    def __init__(self):
+        self.sketch = LatencySketch()
+        self.statuses: Dict[str, int] = {}
+
+    def add(self, duration: float, status: int) -> None:
+        self.sketch.add(duration)
+        key = f"{status // 100}xx"
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+
+    def merge(self, other: 'RouteStats') -> 'RouteStats':
+        self.sketch.merge(other.sketch)
+        for key, count in other.statuses.items():
+            self.statuses[key] = self.statuses.get(key, 0) + count
+        return self
+
+    def to_dict(self) -> Dict:
+        return {'sketch': self.sketch.to_dict(), 'statuses': self.statuses}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'RouteStats':
+        stats = cls()
+        stats.sketch = LatencySketch.from_dict(data['sketch'])
+        stats.statuses = dict(data['statuses'])
+        return stats
+
+
+class AccessLogAnalyzer:
+    """
+    Lecture incrémentale d'un journal d'accès et agrégation des latences.
+
+    Attributes:
+        path (Path): Journal d'accès
+        state_file (Path): Position de lecture et agrégats cumulés
+        routes (Dict[Route, RouteStats]): Statistiques par couple
+        lines (int): Lignes lues depuis la création de l'état
+        invalid (int): Lignes ignorées
+    """
+
+    def __init__(self, path: Path, state_file: Optional[Path] = None):
+        self.path = Path(path)
+        self.state_file = Path(state_file or
+                               config.get_state_dir() / 'traefik_logs.json')
+        self.inode: Optional[int] = None
+        self.offset = 0
+        self.since = time.time()
+        self.lines = 0
+        self.invalid = 0
+        self.routes: Dict[Route, RouteStats] = {}
+
+    # État persistant ------------------------------------------------------
+
+    def load(self) -> None:
+        """Reprend la position et les agrégats enregistrés"""
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        if state.get('path') != str(self.path):
+            return
+        self.inode = state['inode']
+        self.offset = state['offset']
+        self.since = state['since']
+        self.lines = state['lines']
+        self.invalid = state['invalid']
+        self.routes = {
+            tuple(key.split('\t', 1)): RouteStats.from_dict(value)
+            for key, value in state['routes'].items()
+        }
+
+    def save(self) -> None:
+        """Écrit la position et les agrégats de manière atomique"""
+        state = {
+            'path': str(self.path),
+            'inode': self.inode,
+            'offset': self.offset,
+            'since': self.since,
+            'lines': self.lines,
+            'invalid': self.invalid,
+            'routes': {
+                '\t'.join(route): stats.to_dict()
+                for route, stats in self.routes.items()
+            },
+        }
+        tmp_file = self.state_file.with_suffix('.tmp')
+        with open(tmp_file, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_file, self.state_file)
+
+    # Lecture --------------------------------------------------------------
+
+    @staticmethod
+    def _read_from(path: Path, offset: int) -> Iterator[Tuple[bytes, int]]:
+        """
+        Lit les lignes complètes d'un fichier à partir d'une position.
+
+        Yields:
+            Tuple[bytes, int]: (bloc de lignes complètes, position après le bloc)
+        """
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            partial = b''
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    return
+                chunk = partial + chunk
+                end = chunk.rfind(b'\n') + 1
+                partial = chunk[end:]
+                if end:
+                    offset += end
+                    yield chunk[:end], offset
+
+    def _rotated_file(self) -> Optional[Path]:
+        """Ancien fichier (après rotation) portant l'inode enregistré"""
+        for suffix in ('.1', '.0', '-1'):
+            candidate = self.path.with_name(self.path.name + suffix)
+            try:
+                if candidate.stat().st_ino == self.inode:
+                    return candidate
+            except OSError:
+                continue
+        return None
+
+    def _consume(self, block: bytes) -> None:
+        """Agrège un bloc de lignes complètes"""
+        routes = self.routes
+        for line in block.splitlines():
+            if not line:
+                continue
+            parsed = parse_line(line)
+            if parsed is None:
+                self.invalid += 1
+                continue
+            route, duration, status = parsed
+            stats = routes.get(route)
+            if stats is None:
+                stats = routes[route] = RouteStats()
+            stats.add(duration, status)
+            self.lines += 1
+
+    def update(self) -> int:
+        """
+        Traite les lignes ajoutées depuis le dernier passage.
+
+        Returns:
+            int: Nombre de lignes traitées
+        """
+        before = self.lines + self.invalid
+        try:
+            stat = self.path.stat()
+        except OSError as e:
+            logger.error(f"Journal d'accès illisible : {e}")
+            return 0
+        if self.inode is not None and stat.st_ino != self.inode:
+            rotated = self._rotated_file()
+            if rotated:
+                logger.info(f"Rotation détectée : fin de {rotated}")
+                for block, _ in self._read_from(rotated, self.offset):
+                    self._consume(block)
+            else:
+                logger.warning("Rotation détectée, ancien fichier introuvable")
+            self.offset = 0
+        elif stat.st_size < self.offset:
+            logger.info("Journal tronqué : relecture depuis le début")
+            self.offset = 0
+        self.inode = stat.st_ino
+        for block, offset in self._read_from(self.path, self.offset):
+            self._consume(block)
+            self.offset = offset
+        return self.lines + self.invalid - before
+
+    # Rapports -------------------------------------------------------------
+
+    def grouped(self, by: str = 'router') -> Dict[str, RouteStats]:
+        """
+        Fusionne les statistiques par routeur ou par service.
+
+        Args:
+            by (str, optional): « router » ou « service »
+
+        Returns:
+            Dict[str, RouteStats]: Statistiques par nom
+        """
+        index = 0 if by == 'router' else 1
+        grouped: Dict[str, RouteStats] = {}
+        for route, stats in self.routes.items():
+            grouped.setdefault(route[index], RouteStats()).merge(stats)
+        return grouped
+
+    def report(self, by: str = 'router') -> Dict[str, Dict]:
+        """
+        Résumé par routeur ou par service.
+
+        Returns:
+            Dict[str, Dict]: {'count', 'errors', 'statuses', 'mean_ms',
+                'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'} par nom
+        """
+        report = {}
+        for name, stats in self.grouped(by).items():
+            sketch = stats.sketch
+            entry = {
+                'count': sketch.count,
+                'errors': stats.statuses.get('5xx', 0),
+                'statuses': stats.statuses,
+                'mean_ms': round(sketch.mean * 1000, 2),
+                'max_ms': round(sketch.max * 1000, 2),
+            }
+            for q in QUANTILES:
+                entry[f"p{round(q * 100)}_ms"] = round(
+                    sketch.quantile(q) * 1000, 2)
+            report[name] = entry
+        return report
+
+    def prometheus(self) -> str:
+        """
+        Métriques au format texte Prometheus (par routeur et par service).
+
+        Returns:
+            str: Exposition des métriques
+        """
+        lines = [
+            '# HELP traefik_log_requests_total Requêtes lues dans le journal.',
+            '# TYPE traefik_log_requests_total counter',
+        ]
+        for (router, service), stats in sorted(self.routes.items()):
+            for code_class, count in sorted(stats.statuses.items()):
+                lines.append(
+                    f'traefik_log_requests_total{{router="{router}",'
+                    f'service="{service}",code_class="{code_class}"}} {count}')
+        lines += [
+            '# HELP traefik_log_duration_seconds Durée des requêtes.',
+            '# TYPE traefik_log_duration_seconds summary',
+        ]
+        for by in ('router', 'service'):
+            for name, stats in sorted(self.grouped(by).items()):
+                labels = f'{by}="{name}"'
+                for q in QUANTILES:
+                    lines.append(
+                        f'traefik_log_duration_seconds{{{labels},'
+                        f'quantile="{q}"}} {stats.sketch.quantile(q):.6f}')
+                lines.append(f'traefik_log_duration_seconds_sum{{{labels}}} '
+                             f'{stats.sketch.total:.6f}')
+                lines.append(f'traefik_log_duration_seconds_count{{{labels}}} '
+                             f'{stats.sketch.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def write_atomic(path: Path, content: str) -> None:
+    """Écrit un fichier de manière atomique"""
+    tmp_file = Path(f"{path}.tmp")
+    with open(tmp_file, 'w') as f:
+        f.write(content)
+    os.replace(tmp_file, path)
+
+
+def log_report(report: Dict[str, Dict], by: str) -> None:
+    """Journalise le résumé, les noms les plus sollicités en premier"""
+    logger.info(f"{by:<40} {'requêtes':>9} {'5xx':>6} {'p50':>9} "
+                f"{'p95':>9} {'p99':>9}")
+    for name, entry in sorted(report.items(), key=lambda item: -item[1]['count']):
+        logger.info(f"{name:<40} {entry['count']:9d} {entry['errors']:6d} "
+                    f"{entry['p50_ms']:7.1f}ms {entry['p95_ms']:7.1f}ms "
+                    f"{entry['p99_ms']:7.1f}ms")
+
+
+def benchmark(lines: int = 200000) -> float:
+    """
+    Mesure le débit d'analyse sur un journal synthétique.
+
+    Args:
+        lines (int, optional): Nombre de lignes générées
+
+    Returns:
+        float: Lignes par seconde
+    """
+    import random
+    import tempfile
+    routers = [f"router{i}@docker" for i in range(20)]
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        log_file = Path(directory) / 'access.log'
+        with open(log_file, 'w') as f:
+            for _ in range(lines):
+                router = rng.choice(routers)
+                f.write(json.dumps({
+                    'ClientHost': '172.18.0.1',
+                    'DownstreamContentSize': 1234,
+                    'DownstreamStatus': rng.choice((200, 200, 200, 304, 502)),
+                    'Duration': int(rng.lognormvariate(16, 1)),
+                    'RequestHost': 'api.iaproject.fr',
+                    'RequestMethod': 'GET',
+                    'RequestPath': '/health',
+                    'RouterName': router,
+                    'ServiceName': router.replace('router', 'service'),
+                    'StartUTC': '2024-05-01T08:00:00.123456789Z',
+                    'entryPointName': 'websecure',
+                    'level': 'info',
+                    'time': '2024-05-01T10:00:00+02:00',
+                }, separators=(',', ':')) + '\n')
+        analyzer = AccessLogAnalyzer(log_file, Path(directory) / 'state.json')
+        started = time.perf_counter()
+        analyzer.update()
+        return lines / (time.perf_counter() - started)
+
+
+def main():
+    """Point d'entrée : analyse du journal ou mesure du débit"""
+    parser = argparse.ArgumentParser(
+        description="Latences par routeur/service du journal d'accès Traefik")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    analyze = subparsers.add_parser('analyze', help="Analyse les nouvelles lignes")
+    analyze.add_argument('file', nargs='?', help="Journal d'accès JSON")
+    analyze.add_argument('--by', choices=['router', 'service'], default='router')
+    analyze.add_argument('--reset',
+                         action='store_true',
+                         help="Repart de zéro (position et agrégats)")
+    analyze.add_argument('--json', action='store_true', help="Rapport JSON")
+    analyze.add_argument('--prometheus',
+                         type=Path,
+                         help="Fichier de métriques Prometheus")
+    analyze.add_argument('--follow',
+                         action='store_true',
+                         help="Relit le journal en continu")
+    analyze.add_argument('--interval', type=float, default=10.0)
+    bench = subparsers.add_parser('bench', help="Débit d'analyse (lignes/s)")
+    bench.add_argument('--lines', type=int, default=200000)
+    args = parser.parse_args()
+
+    if args.command == 'bench':
+        logger.info(f"{benchmark(args.lines):,.0f} lignes/s".replace(',', ' '))
+        return
+
+    path = Path(args.file or config.get('TRAEFIK_ACCESS_LOG')
+                or DEFAULT_ACCESS_LOG)
+    analyzer = AccessLogAnalyzer(path)
+    if not args.reset:
+        analyzer.load()
+    while True:
+        started = time.perf_counter()
+        count = analyzer.update()
+        elapsed = time.perf_counter() - started
+        analyzer.save()
+        logger.info(f"{count} ligne(s) lue(s) en {elapsed:.2f}s "
+                    f"({analyzer.lines} depuis "
+                    f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(analyzer.since))}, "
+                    f"{analyzer.invalid} ignorée(s))")
+        if args.prometheus:
+            write_atomic(args.prometheus, analyzer.prometheus())
+        if args.json:
+            print(json.dumps(analyzer.report(args.by), indent=2))
+        elif not args.follow or count:
+            log_report(analyzer.report(args.by), args.by)
+        if not args.follow:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pondération des réplicas Traefik selon leur latence mesurée.
+
+Pour chaque service routé à plusieurs serveurs (label
+hebergement.traefik.servers, voir traefik_generate.py), chaque serveur est
+sondé en parallèle à débit fixe (sonde de charge de network_diagnostic.py,
+sur le chemin de test de santé du service). Sa part de trafic cible est
+inversement proportionnelle à sa latence p90, pénalisée par son taux
+d'erreur (erreurs du serveur seulement : 5xx, délai dépassé, serveur
+injoignable) ; un serveur en échec sur plus de la moitié des requêtes ne
+reçoit plus de trafic.
+
+Pour éviter les oscillations :
+- la part publiée ne rejoint la cible que progressivement (moyenne
+  exponentielle de coefficient alpha) ; un serveur en échec est en
+  revanche retiré immédiatement ;
+- les poids ne sont republiés que si l'un d'eux bouge d'au moins
+  deadband points (sur 100) ou qu'un serveur est retiré ou réintégré.
+
+Les poids sont écrits dans le fichier généré du service
+(<service>.generated.yml) sous la forme d'un service « weighted » de
+services à un serveur ; le fichier n'est réécrit que si son contenu change.
+Les parts et poids publiés sont conservés dans le répertoire d'état
+(traefik_weights.json), réutilisés par traefik_generate.py.
+
+Utilisation:
+    python3 traefik_weights.py --once
+    python3 traefik_weights.py --interval 30 --alpha 0.3 --deadband 5
+
+Auteur: Franck DESMEDT
+Date: 2024
+Version: 1.0
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import config
+from logger import setup_logger
+from traefik_generate import (RouteSpec, inventory, output_path, render,
+                              write_if_changed)
+
+# Configuration du logger
+logger = setup_logger(__name__)
+
+REPO_DIR = Path(__file__).parent.parent
+
+# Latence plancher (ms) : évite des rapports extrêmes entre serveurs rapides
+LATENCY_FLOOR_MS = 1.0
+
+# Au-delà de ce taux d'erreur, le serveur ne reçoit plus de trafic
+MAX_ERROR_RATE = 0.5
+
+# Classes d'erreur de la sonde (LoadReport.error_classes) imputables au
+# serveur : réponse 5xx, délai dépassé, serveur injoignable. Les autres
+# (4xx, connexion interrompue côté client) ne pénalisent pas le serveur.
+SERVER_ERRORS = ('http_5xx', 'timeout', 'ConnectionRefusedError', 'OSError',
+                 'gaierror')
+
+TOTAL_WEIGHT = 100
+
+
+def _state_file() -> Path:
+    return config.get_state_dir() / 'traefik_weights.json'
+
+
+def load_state() -> Dict[str, Dict]:
+    """
+    État du contrôleur par service.
+
+    Returns:
+        Dict[str, Dict]: {'shares': {url: part}, 'weights': {url: poids},
+            'updatedAt'} par service
+    """
+    try:
+        with open(_state_file(), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def save_state(state: Dict[str, Dict]) -> None:
+    """Écrit l'état du contrôleur de manière atomique"""
+    path = _state_file()
+    tmp_file = path.with_suffix('.tmp')
+    with open(tmp_file, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_file, path)
+
+
+def saved_weights() -> Dict[str, Dict[str, int]]:
+    """
+    Poids publiés par service (vide si le contrôleur n'a jamais tourné).
+
+    Returns:
+        Dict[str, Dict[str, int]]: Poids par URL de serveur, par service
+    """
+    try:
+        state = load_state()
+    except Exception:
+        return {}
+    return {
+        service: entry['weights']
+        for service, entry in state.items() if entry.get('weights')
+    }
+
+
+def target_shares(measures: Dict[str, Dict]) -> Dict[str, float]:
+    """
+    Parts de trafic visées d'après les mesures des serveurs.
+
+    Args:
+        measures (Dict[str, Dict]): {'p90_ms', 'error_rate'} par URL
+
+    Returns:
+        Dict[str, float]: Parts (somme 1) ; parts égales si aucun serveur
+            n'est sain
+    """
+    scores = {}
+    for url, measure in measures.items():
+        if measure['p90_ms'] is None or measure['error_rate'] >= MAX_ERROR_RATE:
+            scores[url] = 0.0
+        else:
+            scores[url] = (1 - measure['error_rate'])**2 / max(
+                measure['p90_ms'], LATENCY_FLOOR_MS)
+    total = sum(scores.values())
+    if not total:
+        return {url: 1 / len(measures) for url in measures}
+    return {url: score / total for url, score in scores.items()}
+
+
+def damp(previous: Dict[str, float], target: Dict[str, float],
+         alpha: float) -> Dict[str, float]:
+    """
+    Rapproche les parts précédentes de la cible (moyenne exponentielle).
+
+    L'amortissement ne lisse que les écarts de latence : un serveur que la
+    cible retire (en échec ou injoignable) perd sa part immédiatement. Un
+    serveur sans part précédente part de la part égale.
+
+    Returns:
+        Dict[str, float]: Nouvelles parts (somme 1)
+    """
+    equal = 1 / len(target)
+    shares = {}
+    for url, goal in target.items():
+        if goal == 0:
+            shares[url] = 0.0
+            continue
+        share = previous.get(url, equal)
+        shares[url] = share + alpha * (goal - share)
+    total = sum(shares.values()) or 1
+    return {url: share / total for url, share in shares.items()}
+
+
+def to_weights(shares: Dict[str, float]) -> Dict[str, int]:
+    """Poids entiers (sur TOTAL_WEIGHT), au moins 1 pour une part non nulle"""
+    return {
+        url: max(1, round(share * TOTAL_WEIGHT)) if share > 0 else 0
+        for url, share in shares.items()
+    }
+
+
+def should_publish(previous: Dict[str, int], weights: Dict[str, int],
+                   deadband: int) -> bool:
+    """Vrai si les poids ont assez changé pour être republiés"""
+    if set(previous) != set(weights):
+        return True
+    for url, weight in weights.items():
+        if (weight == 0) != (previous[url] == 0):
+            return True
+        if abs(weight - previous[url]) >= deadband:
+            return True
+    return False
+
+
+class WeightController:
+    """
+    Contrôleur des poids des services à plusieurs réplicas.
+
+    Attributes:
+        alpha (float): Coefficient d'amortissement (0 < alpha <= 1)
+        deadband (int): Écart minimal de poids pour republier
+        rate (float): Débit de la sonde par serveur (requêtes/s)
+        duration (float): Durée de la sonde (secondes)
+        directory (Path): Répertoire dynamique de Traefik
+    """
+
+    def __init__(self,
+                 alpha: float = 0.3,
+                 deadband: int = 5,
+                 rate: float = 5.0,
+                 duration: float = 2.0,
+                 directory: Optional[Path] = None,
+                 compose_files: Optional[List[Path]] = None):
+        if str(REPO_DIR) not in sys.path:
+            sys.path.append(str(REPO_DIR))
+        from network_diagnostic import ServiceDiagnostic
+        self.alpha = alpha
+        self.deadband = deadband
+        self.rate = rate
+        self.duration = duration
+        self.directory = directory
+        self.compose_files = compose_files
+        self.diagnostic = ServiceDiagnostic()
+
+    def measure(self, spec: RouteSpec) -> Dict[str, Dict]:
+        """
+        Sonde les serveurs d'un service en parallèle.
+
+        Returns:
+            Dict[str, Dict]: {'p90_ms', 'error_rate', 'requests'} par URL ;
+                error_rate ne compte que les erreurs du serveur
+                (SERVER_ERRORS)
+        """
+        path = spec.healthcheck or '/'
+
+        def probe(url: str) -> Dict:
+            report = self.diagnostic.load_probe(url.rstrip('/') + path,
+                                                rate=self.rate,
+                                                concurrency=2,
+                                                duration=self.duration,
+                                                timeout=2.0)
+            errors = sum(report.error_classes.get(error, 0)
+                         for error in SERVER_ERRORS)
+            return {
+                'p90_ms': report.latency_p90_ms,
+                'error_rate': errors /
+                report.requests if report.requests else 1.0,
+                'requests': report.requests,
+            }
+
+        with ThreadPoolExecutor(max_workers=len(spec.servers)) as executor:
+            return dict(zip(spec.servers, executor.map(probe, spec.servers)))
+
+    def run_once(self, dry_run: bool = False) -> Dict[str, Dict[str, int]]:
+        """
+        Mesure tous les services à plusieurs serveurs et publie leurs poids.
+
+        Returns:
+            Dict[str, Dict[str, int]]: Poids publiés par service
+        """
+        state = load_state()
+        published = {}
+        for spec in inventory(self.compose_files):
+            if len(spec.servers) < 2:
+                continue
+            measures = self.measure(spec)
+            entry = state.get(spec.service, {})
+            shares = damp(entry.get('shares', {}), target_shares(measures),
+                          self.alpha)
+            weights = to_weights(shares)
+            previous = entry.get('weights', {})
+            for url, measure in measures.items():
+                p90 = f"{measure['p90_ms']:.1f}ms" \
+                    if measure['p90_ms'] is not None else '-'
+                logger.info(f"{spec.service} {url} : p90 {p90}, "
+                            f"erreurs {measure['error_rate']:.0%}, "
+                            f"poids {previous.get(url, '-')} -> {weights[url]}")
+            if should_publish(previous, weights, self.deadband):
+                entry['weights'] = weights
+                if not dry_run:
+                    path = output_path(spec, self.directory)
+                    if write_if_changed(path, render(spec, weights)):
+                        logger.info(f"{path.name} : poids publiés")
+            else:
+                weights = previous
+            entry['shares'] = shares
+            entry['updatedAt'] = time.time()
+            state[spec.service] = entry
+            published[spec.service] = weights
+        if not dry_run:
+            save_state(state)
+        return published
+
+    def run_forever(self, interval: float) -> None:
+        """Boucle de mesure et de publication"""
+        while True:
+            started = time.monotonic()
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Échec de la pondération : {e}")
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+
+def main():
+    """Point d'entrée : pondère les réplicas selon leur latence"""
+    parser = argparse.ArgumentParser(
+        description="Poids Traefik des réplicas selon leur latence")
+    parser.add_argument('--once', action='store_true', help="Un seul passage")
+    parser.add_argument('--interval', type=float, default=30.0)
+    parser.add_argument('--alpha',
+                        type=float,
+                        default=0.3,
+                        help="Amortissement (1 : pas d'amortissement)")
+    parser.add_argument('--deadband',
+                        type=int,
+                        default=5,
+                        help="Écart minimal de poids pour republier")
+    parser.add_argument('--rate', type=float, default=5.0,
+                        help="Requêtes/s de la sonde par serveur")
+    parser.add_argument('--duration', type=float, default=2.0,
+                        help="Durée de la sonde (secondes)")
+    parser.add_argument('--compose', type=Path, action='append')
+    parser.add_argument('--dir', type=Path, help="Répertoire dynamique")
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    controller = WeightController(args.alpha, args.deadband, args.rate,
+                                  args.duration, args.dir, args.compose)
+    if args.once or args.dry_run:
+        for service, weights in controller.run_once(args.dry_run).items():
+            logger.info(f"{service} : {weights}")
+        return
+    try:
+        controller.run_forever(args.interval)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -6,19 +6,21 @@ Script de mise à jour DNS pour OVH.
 Ce script met à jour automatiquement les enregistrements DNS
 pour les sous-domaines configurés. Il :
 - Récupère l'IP publique actuelle
-- Met à jour les enregistrements DNS via l'API OVH
-- Rafraîchit la zone DNS
+- Met à jour les enregistrements DNS via dns_web.update_dns_record (un seul
+  écrivain par zone, voir leader.py)
 
 Auteur: Franck DESMEDT
 Date: 2024
 Version: 1.0
 """
 
-import os
-import sys
+if __name__ == "__main__":
+    # Seulement en point d'entrée : un import ne profile jamais le
+    # processus appelant
+    import profiling
+    profiling.enable_from_argv()
+
 import logging
-import socket
-import requests
 from config import config
 from logger import setup_logger
 
@@ -66,64 +68,21 @@ def update_dns_record():
     Met à jour l'enregistrement DNS avec l'IP publique actuelle.
 
     Cette fonction :
-    1. Vérifie les variables d'environnement requises
-    2. Récupère l'IP publique actuelle
-    3. Met à jour l'enregistrement DNS via l'API OVH
-    4. Rafraîchit la zone DNS
+    1. Récupère l'IP publique actuelle
+    2. Délègue la mise à jour à dns_web.update_dns_record : écriture par le
+       seul leader de la zone (ZoneLease), TTL adaptatif, mode DynHost et
+       rafraîchissement regroupé de la zone
 
     Returns:
         bool: True si la mise à jour a réussi, False sinon
-
-    Raises:
-        Exception: En cas d'erreur lors de la mise à jour
     """
-    try:
-        # Vérification des variables d'environnement requises
-        required_vars = [
-            'OVH_APPLICATION_KEY', 'OVH_APPLICATION_SECRET',
-            'OVH_CONSUMER_KEY', 'OVH_DNS_ZONE', 'OVH_DNS_SUBDOMAIN',
-            'OVH_DNS_RECORD_ID'
-        ]
-
-        missing_vars = [var for var in required_vars if not os.getenv(var)]
-        if missing_vars:
-            logger.error(
-                f"Variables d'environnement manquantes: {', '.join(missing_vars)}"
-            )
-            return False
-
-        # Configuration du client OVH
-        logger.info("Configuration du client OVH...")
-        client = ovh.Client(
-            endpoint='ovh-eu',
-            application_key=os.getenv('OVH_APPLICATION_KEY'),
-            application_secret=os.getenv('OVH_APPLICATION_SECRET'),
-            consumer_key=os.getenv('OVH_CONSUMER_KEY'))
-        logger.info("Client OVH configuré avec succès")
-
-        # Récupération de l'IP publique
-        logger.info("Récupération de l'IP publique...")
-        new_ip = get_public_ip()
-        if not new_ip:
-            logger.error("Impossible de récupérer l'IP publique")
-            return False
-
-        logger.info(f"Nouvelle IP publique: {new_ip[:5]}***")
-
-        # Mise à jour de l'enregistrement DNS
-        logger.info("Mise à jour de l'enregistrement DNS...")
-        result = client.put(
-            f'/domain/zone/{os.getenv("OVH_DNS_ZONE")}/record/{os.getenv("OVH_DNS_RECORD_ID")}',
-            subDomain=os.getenv('OVH_DNS_SUBDOMAIN'),
-            target=new_ip,
-            ttl=60)
-
-        logger.info("Enregistrement DNS mis à jour avec succès")
-        return True
+    from dns_web import update_dns_record as update_as_zone_leader
 
-    except Exception as e:
-        logger.error(f"Erreur lors de la mise à jour DNS: {str(e)}")
+    new_ip = get_public_ip()
+    if not new_ip:
+        logger.error("Impossible de récupérer l'IP publique")
         return False
+    return update_as_zone_leader(new_ip=new_ip)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Coordinateur de rafraîchissement des zones DNS OVH.
+
+Les scripts qui modifient une zone (dns_web.py, check_and_fix_dns.py, ...)
+ne déclenchent plus directement POST /domain/zone/{zone}/refresh : ils
+notifient ce coordinateur, qui regroupe toutes les notifications reçues
+dans une fenêtre configurable en un seul rafraîchissement.
+
+Le regroupement fonctionne entre processus grâce à :
+- un verrou fcntl (refresh_<zone>.lock) dans le répertoire d'état
+- un fichier d'horodatage JSON (refresh_<zone>.json) qui mémorise la
+  première et la dernière notification en attente ainsi que le dernier
+  rafraîchissement effectué
+
+Le rafraîchissement a lieu dès que la zone est restée calme pendant
+OVH_REFRESH_WINDOW secondes, et au plus tard OVH_REFRESH_MAX_DELAY secondes
+après la première notification en attente (borne supérieure garantie).
+
+Utilisation:
+    python3 zone_refresh.py            # Force le traitement des notifications en attente
+    python3 zone_refresh.py --status   # Affiche l'état du coordinateur
+    python3 zone_refresh.py --wait     # Rafraîchit à l'échéance de la fenêtre
+
+Auteur: Franck DESMEDT
+Date: 2024
+Version: 1.0
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+from config import config
+from logger import setup_logger
+
+# Configuration du logger
+logger = setup_logger(__name__)
+
+# Valeurs par défaut (en secondes)
+DEFAULT_WINDOW = 5.0
+DEFAULT_MAX_DELAY = 30.0
+POLL_INTERVAL = 0.5
+
+
+class ZoneRefreshCoordinator:
+    """
+    Regroupe les demandes de rafraîchissement d'une zone DNS.
+
+    Attributes:
+        client: Client OVH utilisé pour le rafraîchissement
+        zone (str): Nom de la zone DNS
+        window (float): Durée de calme avant rafraîchissement
+        max_delay (float): Délai maximal entre la première notification
+            et le rafraîchissement
+    """
+
+    def __init__(self,
+                 client,
+                 zone: str,
+                 window: Optional[float] = None,
+                 max_delay: Optional[float] = None,
+                 state_dir: Optional[Path] = None):
+        """
+        Initialise le coordinateur pour une zone.
+
+        Args:
+            client: Client OVH (ovh.Client ou compatible)
+            zone (str): Nom de la zone DNS
+            window (float, optional): Fenêtre de regroupement. Par défaut
+                OVH_REFRESH_WINDOW ou 5 secondes.
+            max_delay (float, optional): Borne supérieure du délai. Par défaut
+                OVH_REFRESH_MAX_DELAY ou 30 secondes.
+            state_dir (Path, optional): Répertoire d'état. Par défaut celui
+                de la configuration.
+        """
+        self.client = client
+        self.zone = zone
+        self.window = window if window is not None else config.get_float(
+            'OVH_REFRESH_WINDOW', DEFAULT_WINDOW)
+        self.max_delay = max_delay if max_delay is not None else config.get_float(
+            'OVH_REFRESH_MAX_DELAY', DEFAULT_MAX_DELAY)
+        # La borne supérieure ne peut pas être inférieure à la fenêtre
+        self.max_delay = max(self.max_delay, self.window)
+        state_dir = Path(state_dir or config.get_state_dir())
+        self.lock_file = state_dir / f"refresh_{zone}.lock"
+        self.state_file = state_dir / f"refresh_{zone}.json"
+
+    @contextmanager
+    def _locked(self) -> Iterator[Dict[str, Optional[float]]]:
+        """
+        Verrouille le fichier d'état et fournit son contenu.
+
+        Le contenu modifié dans le bloc est réécrit avant libération du verrou.
+
+        Yields:
+            Dict[str, Optional[float]]: État courant du coordinateur
+        """
+        with open(self.lock_file, 'a+') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                state = self._read_state()
+                snapshot = dict(state)
+                yield state
+                if state != snapshot:
+                    self._write_state(state)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_state(self) -> Dict[str, Optional[float]]:
+        """Lit le fichier d'horodatage (état vide s'il est absent ou corrompu)"""
+        state = {'first_pending': None, 'last_notify': None, 'last_refresh': 0.0}
+        try:
+            with open(self.state_file, 'r') as f:
+                state.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+        return state
+
+    def _write_state(self, state: Dict[str, Optional[float]]) -> None:
+        """Écrit le fichier d'horodatage de manière atomique"""
+        tmp_file = self.state_file.with_suffix('.tmp')
+        with open(tmp_file, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_file, self.state_file)
+
+    def notify(self) -> float:
+        """
+        Signale qu'une écriture a été faite dans la zone.
+
+        Returns:
+            float: Horodatage de la notification, à passer à flush()
+        """
+        now = time.time()
+        with self._locked() as state:
+            if state['first_pending'] is None:
+                state['first_pending'] = now
+            state['last_notify'] = now
+        logger.debug(f"Rafraîchissement de {self.zone} demandé")
+        return now
+
+    def pending(self) -> bool:
+        """
+        Indique si des notifications sont en attente de rafraîchissement.
+
+        Returns:
+            bool: True si un rafraîchissement est en attente
+        """
+        with self._locked() as state:
+            return state['first_pending'] is not None
+
+    def _due_time(self, state: Dict[str, Optional[float]]) -> float:
+        """Calcule l'instant où le rafraîchissement doit avoir lieu"""
+        return min(state['last_notify'] + self.window,
+                   state['first_pending'] + self.max_delay)
+
+    def flush(self, since: Optional[float] = None, force: bool = False) -> bool:
+        """
+        Attend qu'un rafraîchissement couvrant la notification ait eu lieu.
+
+        Si aucun autre processus ne s'en charge, le rafraîchissement est
+        effectué par l'appelant dès qu'il est dû.
+
+        Args:
+            since (float, optional): Horodatage renvoyé par notify(). Par défaut
+                toute notification en attente.
+            force (bool, optional): Rafraîchit immédiatement sans attendre la
+                fin de la fenêtre. Defaults to False.
+
+        Returns:
+            bool: True si la zone est à jour, False si le rafraîchissement a échoué
+        """
+        while True:
+            with self._locked() as state:
+                if state['first_pending'] is None:
+                    return True
+                if since is not None and state['last_refresh'] >= since:
+                    return True
+                now = time.time()
+                due = self._due_time(state)
+                if force or now >= due:
+                    return self._refresh(state, now)
+            time.sleep(max(0.0, min(due - now, POLL_INTERVAL)))
+
+    def _refresh(self, state: Dict[str, Optional[float]], now: float) -> bool:
+        """
+        Effectue le rafraîchissement (appelé verrou tenu).
+
+        Les notifications arrivées pendant l'appel attendent la libération
+        du verrou et sont donc postérieures à last_refresh.
+        """
+        waited = now - state['first_pending']
+        try:
+            self.client.post(f'/domain/zone/{self.zone}/refresh')
+        except Exception as e:
+            logger.error(
+                f"Erreur lors du rafraîchissement de la zone {self.zone} : {e}")
+            return False
+        state['last_refresh'] = now
+        state['first_pending'] = None
+        state['last_notify'] = None
+        logger.info(
+            f"Zone {self.zone} rafraîchie ({waited:.1f}s après la première demande)"
+        )
+        return True
+
+
+def request_zone_refresh(client, zone: str, wait: bool = True) -> bool:
+    """
+    Notifie le coordinateur d'une écriture et attend le rafraîchissement.
+
+    Args:
+        client: Client OVH
+        zone (str): Nom de la zone DNS
+        wait (bool, optional): Attend le rafraîchissement. Si False, la
+            notification reste en attente pour un autre processus ou pour
+            un appel ultérieur à flush(). Defaults to True.
+
+    Returns:
+        bool: True si la zone est (ou sera) rafraîchie, False en cas d'échec
+    """
+    coordinator = ZoneRefreshCoordinator(client, zone)
+    since = coordinator.notify()
+    if not wait:
+        return True
+    return coordinator.flush(since)
+
+
+def main():
+    """Point d'entrée : traite les notifications en attente de la zone configurée"""
+    parser = argparse.ArgumentParser(
+        description="Coordinateur de rafraîchissement de zone DNS OVH")
+    parser.add_argument('--zone', help="Zone DNS (par défaut OVH_DNS_ZONE)")
+    parser.add_argument('--status',
+                        action='store_true',
+                        help="Affiche l'état sans rafraîchir")
+    parser.add_argument('--wait',
+                        action='store_true',
+                        help="Attend la fin de la fenêtre de regroupement")
+    args = parser.parse_args()
+
+    zone = args.zone or config.get_required('OVH_DNS_ZONE')
+    if args.status:
+        coordinator = ZoneRefreshCoordinator(None, zone)
+        with coordinator._locked() as state:
+            logger.info(f"État du coordinateur pour {zone} : {state}")
+        return
+
+    coordinator = ZoneRefreshCoordinator(config.get_ovh_client(), zone)
+    if not coordinator.pending():
+        logger.info("Aucun rafraîchissement en attente")
+    elif not coordinator.flush(force=not args.wait):
+        logger.error("Échec du rafraîchissement")
+
+
+if __name__ == "__main__":
+    main()